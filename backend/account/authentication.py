@@ -0,0 +1,111 @@
+import math
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+
+
+def revoked_key(user_id) -> str:
+    return f'account:revoked:{user_id}'
+
+
+def user_cache_key(user_id) -> str:
+    return f'account:user:{user_id}'
+
+
+def revoke_tokens(user_id):
+    """
+    Reject every token issued to the user before now.
+
+    Stored on the user row, so it holds whichever process revokes; the
+    cached copy read by `is_revoked` is dropped once the write commits.
+    Workers that don't share the cache see it within
+    `AUTH_USER_CACHE_TIMEOUT` seconds.
+    """
+    User.objects.filter(pk=user_id).update(tokens_valid_after=now())
+    transaction.on_commit(lambda: cache.delete(revoked_key(user_id)))
+    forget_user(user_id)
+
+
+def tokens_valid_after(user_id) -> float:
+    """
+    Unix time before which the user's tokens are rejected: 0 if never
+    revoked, infinity if the user is inactive or deleted.
+    """
+    key = revoked_key(user_id)
+    valid_after = cache.get(key)
+    if valid_after is None:
+        row = User.objects.filter(pk=user_id).values_list(
+            'tokens_valid_after', 'is_active').first()
+        if row is None or not row[1]:
+            valid_after = math.inf
+        else:
+            # Fractional, so a token issued within the same second as the
+            # revocation (`iat` is whole seconds) is rejected too.
+            valid_after = row[0].timestamp() if row[0] else 0
+        cache.set(key, valid_after, settings.AUTH_USER_CACHE_TIMEOUT)
+    return valid_after
+
+
+def is_revoked(token) -> bool:
+    return token.get('iat', 0) < tokens_valid_after(token[api_settings.USER_ID_CLAIM])
+
+
+def forget_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication that trusts the token's claims instead of loading
+    the user row.
+
+    `request.user` is a `TokenUser` carrying the user id, which is all the
+    expense views need. Revocation, deactivation and deletion are checked
+    with a single cache lookup, which reads the user row on a miss.
+    """
+
+    def authenticate(self, request):
+        # View query budgets don't cover reading the revocation state on a
+        # cache miss.
+        metrics = getattr(request, 'metrics', None)
+        queries = metrics.queries if metrics is not None else 0
+        try:
+            return super().authenticate(request)
+        finally:
+            if metrics is not None:
+                metrics.allowance += metrics.queries - queries
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if is_revoked(validated_token):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        return user
+
+
+class CachedUserJWTAuthentication(StatelessJWTAuthentication):
+    """
+    Like `StatelessJWTAuthentication`, but `request.user` is the full
+    `User`, cached for `AUTH_USER_CACHE_TIMEOUT` seconds.
+
+    Views that change the user must call `forget_user`.
+    """
+
+    def get_user(self, validated_token):
+        user_id = super().get_user(validated_token).id
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
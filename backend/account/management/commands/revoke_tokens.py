@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from account.models import User
+from account.authentication import revoke_tokens
+
+
+class Command(BaseCommand):
+    help = "Invalidate every access and refresh token issued to a user so far."
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+        revoke_tokens(user.id)
+        self.stdout.write(self.style.SUCCESS(f"Revoked tokens of {user.email}"))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_alter_user_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+    ]
@@ -4,6 +4,9 @@ from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
 
 
+DEFAULT_CURRENCY = 'USD'
+
+
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password, **extra_fields):
         if not email:
@@ -23,6 +26,10 @@ class CustomUserManager(BaseUserManager):
 class User(AbstractUser):
     username = None
     email = models.EmailField(max_length=100, unique=True)
+    # ISO 4217 code that analytics and budgets are expressed in.
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
+    # Tokens issued before this are rejected; see account.authentication.
+    tokens_valid_after = models.DateTimeField(null=True, blank=True, editable=False)
     objects = CustomUserManager()
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
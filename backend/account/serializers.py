@@ -1,9 +1,13 @@
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from django.contrib.auth import authenticate
 from .models import User
-from utils.validators import validate_password, validate_alpha
+from utils.validators import validate_password, validate_alpha, validate_currency
+from expense.currencies import change_base_currency
 from .tokens import create_jwt_pair
+from .authentication import is_revoked
 
 
 class CreateUserSerializer(serializers.ModelSerializer):
@@ -66,9 +70,30 @@ class UserLoginSerializer(serializers.Serializer):
 class UserProfileSerializer(serializers.ModelSerializer):
     first_name = serializers.CharField(validators=[validate_alpha])
     last_name = serializers.CharField(validators=[validate_alpha])
+    currency = serializers.CharField(validators=[validate_currency])
 
     class Meta:
         model = User
         fields = ['email', 'first_name',
-                  'last_name', 'date_joined', 'last_login']
+                  'last_name', 'currency', 'date_joined', 'last_login']
         read_only_fields = ['email', 'date_joined', 'last_login']
+
+    def update(self, instance, validated_data):
+        currency = validated_data.pop('currency', instance.currency)
+        if currency != instance.currency:
+            # Converts the user's expenses, so it is not a plain field update.
+            try:
+                change_base_currency(instance.id, currency)
+            except ValueError as exc:
+                raise serializers.ValidationError({'currency': [str(exc)]})
+            instance.currency = currency
+        return super().update(instance, validated_data)
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuse to refresh tokens issued before the user's tokens were revoked."""
+
+    def validate(self, attrs):
+        if is_revoked(self.token_class(attrs['refresh'])):
+            raise InvalidToken("Token has been revoked")
+        return super().validate(attrs)
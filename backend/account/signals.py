@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from .authentication import revoke_tokens
+from .models import User
+
+
+@receiver(pre_save, sender=User)
+def check_credentials_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Note whether this save changes the password or deactivates the user."""
+    instance._credentials_changed = False
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not {'password', 'is_active'} & set(update_fields):
+        return
+    previous = User.objects.filter(pk=instance.pk).values('password', 'is_active').first()
+    instance._credentials_changed = previous is not None and (
+        previous['password'] != instance.password
+        or previous['is_active'] and not instance.is_active)
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_credentials_change(sender, instance, raw=False, **kwargs):
+    """Tokens issued before a password change or deactivation stop working."""
+    if getattr(instance, '_credentials_changed', False):
+        revoke_tokens(instance.pk)
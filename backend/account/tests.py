@@ -1,3 +1,82 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils.timezone import now
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .models import User
 
-# Create your tests here.
+
+class TokenRevocationTest(TestCase):
+    """Tokens stop working once the user's credentials change."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='jane@example.com', password='Secret-pass-1', first_name='Jane')
+        self.refresh = self.issue(RefreshToken, -120)
+        self.access = self.issue(AccessToken, -120)
+
+    def issue(self, token_class, seconds):
+        """A token for the user issued `seconds` from now."""
+        token = token_class.for_user(self.user)
+        token.set_iat(at_time=now() + timedelta(seconds=seconds))
+        return token
+
+    def get_categories(self, token=None):
+        token = token or self.access
+        return self.client.get(
+            '/api/expenses/categories/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def refresh_token(self):
+        return self.client.post('/api/auth/jwt/refresh', {'refresh': str(self.refresh)})
+
+    def test_token_is_accepted(self):
+        self.assertEqual(self.get_categories().status_code, 200)
+
+    def test_password_change_revokes_tokens(self):
+        self.get_categories()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('Other-pass-2')
+            self.user.save()
+        self.assertEqual(self.get_categories().status_code, 401)
+        self.assertEqual(self.refresh_token().status_code, 401)
+
+    def test_deactivation_revokes_tokens(self):
+        self.get_categories()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get_categories().status_code, 401)
+
+        # Tokens from before the deactivation stay revoked afterwards.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = True
+            self.user.save()
+        self.assertEqual(self.get_categories().status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        self.user.delete()
+        self.assertEqual(self.get_categories().status_code, 401)
+
+    def test_other_saves_keep_tokens(self):
+        self.get_categories()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Janet'
+            self.user.save()
+        self.assertEqual(self.get_categories().status_code, 200)
+
+    def test_revoke_tokens_command(self):
+        self.get_categories()
+        # Revoked a minute ago, after the tokens were issued.
+        revoked_at = now() - timedelta(seconds=60)
+        with self.captureOnCommitCallbacks(execute=True), \
+                mock.patch('account.authentication.now', return_value=revoked_at):
+            call_command('revoke_tokens', self.user.email, stdout=StringIO())
+        self.assertEqual(self.get_categories().status_code, 401)
+        self.assertEqual(self.refresh_token().status_code, 401)
+
+        # Tokens issued since then work.
+        self.assertEqual(self.get_categories(self.issue(AccessToken, 0)).status_code, 200)
@@ -5,6 +5,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from .models import User
 from .serializers import CreateUserSerializer, UserProfileSerializer, UserLoginSerializer
 from .permissions import IsOwner
+from .authentication import CachedUserJWTAuthentication, forget_user
 
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -27,6 +28,7 @@ class UserRegistrationView(generics.CreateAPIView):
 class UserLoginView(generics.GenericAPIView):
     serializer_class = UserLoginSerializer
     permission_classes = [AllowAny]
+    query_budget = 2
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -43,6 +45,8 @@ class UserProfileView(
     queryset = User.objects.all()
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated, IsOwner]
+    authentication_classes = [CachedUserJWTAuthentication]
+    query_budget = {'get': 1}
 
     def get_queryset(self):
         queryset = User.objects.filter(id=self.request.user.id)
@@ -59,4 +63,5 @@ class UserProfileView(
             instance=user, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        forget_user(user.id)
         return Response(data=serializer.data, status=status.HTTP_200_OK)
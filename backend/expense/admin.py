@@ -1,14 +1,100 @@
+from django import forms
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import Count
 from .models import Category, Expense
+from .derived import ExpenseDeltas, apply_deltas
+from .currencies import to_base
+from .caches import get_base_currency, invalidate_categories
+from .sync import record_deletions
+
+
+class ExpenseAdminForm(forms.ModelForm):
+
+    class Meta:
+        model = Expense
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        user, amount, currency, date = (
+            cleaned_data.get(field) for field in ('user', 'amount', 'currency', 'date'))
+        if None not in (user, amount, currency, date):
+            try:
+                self.instance.base_amount = to_base(
+                    amount, currency, get_base_currency(user.id), date)
+            except ValueError as exc:
+                self.add_error('currency', str(exc))
+        return cleaned_data
 
 
 class ExpenseAdmin(admin.ModelAdmin):
-    pass
+    form = ExpenseAdminForm
+
+    def save_model(self, request, obj, form, change):
+        deltas = ExpenseDeltas()
+        if change:
+            deltas.add_queryset(Expense.objects.filter(pk=obj.pk), sign=-1)
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            deltas.add_expense(obj)
+            apply_deltas(deltas)
+
+    def delete_model(self, request, obj):
+        deltas = ExpenseDeltas()
+        deltas.add_expense(obj, sign=-1)
+        with transaction.atomic():
+            record_deletions(Expense.objects.filter(pk=obj.pk))
+            super().delete_model(request, obj)
+            apply_deltas(deltas)
+
+    def delete_queryset(self, request, queryset):
+        deltas = ExpenseDeltas()
+        with transaction.atomic():
+            deltas.add_queryset(queryset, sign=-1)
+            record_deletions(queryset)
+            super().delete_queryset(request, queryset)
+            apply_deltas(deltas)
 
 
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name']
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            # The owner may have been changed in the form.
+            previous = Category.objects.get(pk=obj.pk)
+            invalidate_categories(previous.user_id)
+        super().save_model(request, obj, form, change)
+        invalidate_categories(obj.user_id)
+
+    def get_deleted_objects(self, objs, request):
+        """
+        Refuse to delete categories that still have expenses, like the
+        API does; deleting would move them to the default category behind
+        the rollups' back. Merge such categories instead.
+        """
+        deleted, model_count, perms_needed, protected = super().get_deleted_objects(objs, request)
+        in_use = Category.objects.filter(pk__in=[obj.pk for obj in objs]).annotate(
+            expense_count=Count('expenses')).filter(expense_count__gt=0)
+        protected = [*protected, *(
+            f"{category}: {category.expense_count} expenses" for category in in_use)]
+        return deleted, model_count, perms_needed, protected
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            record_deletions(Category.objects.filter(pk=obj.pk))
+            super().delete_model(request, obj)
+        invalidate_categories(obj.user_id)
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        with transaction.atomic():
+            record_deletions(queryset)
+            super().delete_queryset(request, queryset)
+        for user_id in user_ids:
+            invalidate_categories(user_id)
+
 
 admin.site.register(Category, CategoryAdmin)
-admin.site.register(Expense)
+admin.site.register(Expense, ExpenseAdmin)
@@ -0,0 +1,212 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from django.utils.dateparse import parse_date
+from django.utils.timezone import localdate
+from .models import Category, DailyExpenseRollup
+from .caches import get_categories
+
+
+def month_window(date_param=None) -> tuple[date, date]:
+    """
+    First and last day of the month of a YYYY-MM or YYYY-MM-DD value, or
+    of the current month.
+
+    :raises ValueError: If the value is in neither format
+    """
+    if date_param:
+        try:
+            day = parse_date(date_param) or \
+                datetime.strptime(date_param, '%Y-%m').date()
+        except ValueError:
+            raise ValueError("Invalid date format. Use YYYY-MM or YYYY-MM-DD")
+    else:
+        day = localdate()
+    start = day.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start, end
+
+
+def year_window(year_param=None) -> tuple[date, date]:
+    """
+    First and last day of the given year, or of the current year.
+
+    :raises ValueError: If the value is not a valid year
+    """
+    try:
+        year = int(year_param) if year_param else localdate().year
+        return date(year, 1, 1), date(year, 12, 31)
+    except ValueError:
+        raise ValueError("Invalid year format. Use YYYY")
+
+
+def date_range(start_param, end_param) -> tuple[date, date]:
+    """
+    Parse an inclusive YYYY-MM-DD date range.
+
+    :raises ValueError: If either bound is missing or malformed
+    """
+    if not start_param or not end_param:
+        raise ValueError("Please provide start_date and end_date")
+    try:
+        return (datetime.strptime(start_param, '%Y-%m-%d').date(),
+                datetime.strptime(end_param, '%Y-%m-%d').date())
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+
+
+def summarize_categories(category_data) -> dict:
+    """
+    Build the `ExpenseData` summary from per-category rows holding
+    all-time (`expenses`, `amount`) and current-month (`expenses_month`,
+    `amount_month`) totals, ordered by `category__name`.
+    """
+    total_expenses = 0
+    total_amount = Decimal('0.0')
+    total_expenses_month = 0
+    total_amount_month = Decimal('0.0')
+    category_data_month = []
+    for category in category_data:
+        total_expenses += category['expenses']
+        total_amount += category['amount']
+        if category['expenses_month']:
+            total_expenses_month += category['expenses_month']
+            total_amount_month += category['amount_month']
+            category_data_month.append({
+                'category_name': category['category__name'],
+                'total_expenses': category['expenses_month'],
+                'total_amount': category['amount_month']
+            })
+
+    return {
+        'total_expenses': total_expenses,
+        'total_amount': total_amount,
+        'total_expenses_month': total_expenses_month,
+        'total_amount_month': total_amount_month,
+        'total_expenses_by_category': category_data_month,
+    }
+
+
+class Dashboard:
+    """
+    Several analytics panels computed from one scan of the rollups.
+
+    Each panel returns exactly what its standalone endpoint returns:
+
+    - summary: `data`
+    - daily: `data/daily` for the `date` parameter
+    - monthly: `data/monthly` for the `year` parameter
+    - by_date: `data/by-date` for `start_date` and `end_date`
+    - by_category: `data/by-category`
+
+    The scan covers the union of the panels' date windows and reads
+    (category, day) rollup rows only; category names come from the
+    category cache.
+    """
+
+    panels = ('summary', 'daily', 'monthly', 'by_date', 'by_category')
+    default_panels = ('summary', 'daily', 'monthly', 'by_category')
+    all_time_panels = ('summary', 'by_category')
+
+    def __init__(self, user_id, panels, params):
+        """
+        :raises ValueError: On an unknown panel or an invalid parameter
+        """
+        unknown = [panel for panel in panels if panel not in self.panels]
+        if unknown:
+            raise ValueError(
+                f"Unknown panels: {', '.join(unknown)}. "
+                f"Choose from {', '.join(self.panels)}")
+        self.user_id = user_id
+        self.requested = list(dict.fromkeys(panels or self.default_panels))
+        self.windows = {}
+        if 'daily' in self.requested:
+            self.windows['daily'] = month_window(params.get('date'))
+        if 'monthly' in self.requested:
+            self.windows['monthly'] = year_window(params.get('year'))
+        if 'by_date' in self.requested:
+            self.windows['by_date'] = date_range(
+                params.get('start_date'), params.get('end_date'))
+
+    def get_rollups(self):
+        """The single base scan shared by every requested panel."""
+        rollups = DailyExpenseRollup.objects.filter(user_id=self.user_id)
+        if not any(panel in self.all_time_panels for panel in self.requested):
+            rollups = rollups.filter(
+                date__gte=min(start for start, _ in self.windows.values()),
+                date__lte=max(end for _, end in self.windows.values()))
+        return rollups.order_by().values_list(
+            'category_id', 'date', 'total_expenses', 'total_amount')
+
+    def build(self, rows, categories) -> dict:
+        """
+        :param rows: Rows of `get_rollups`
+        :param categories: Mapping of category id to name, from
+            `get_category_names`. Rows of categories it lacks, deleted since
+            the rollups were read, are left out of the per-category panels.
+        """
+        builders = {
+            'summary': self.build_summary,
+            'daily': self.build_daily,
+            'monthly': self.build_monthly,
+            'by_date': self.build_by_date,
+            'by_category': self.build_by_category,
+        }
+        return {panel: builders[panel](rows, categories) for panel in self.requested}
+
+    @staticmethod
+    def totals(rows, key, name, start=None, end=None):
+        grouped = defaultdict(lambda: [0, Decimal('0')])
+        for row in rows:
+            if (start is None or row[1] >= start) and (end is None or row[1] <= end):
+                totals = grouped[key(row)]
+                totals[0] += row[2]
+                totals[1] += row[3]
+        return [
+            {name: value, 'total_expenses': count, 'total_amount': amount}
+            for value, (count, amount) in sorted(grouped.items())
+        ]
+
+    def build_summary(self, rows, categories):
+        start_of_month = localdate().replace(day=1)
+        by_name = defaultdict(lambda: {
+            'expenses': 0, 'amount': Decimal('0'),
+            'expenses_month': None, 'amount_month': None})
+        for category_id, day, count, amount in rows:
+            if category_id not in categories:
+                continue
+            totals = by_name[categories[category_id]]
+            totals['expenses'] += count
+            totals['amount'] += amount
+            if day >= start_of_month:
+                totals['expenses_month'] = (totals['expenses_month'] or 0) + count
+                totals['amount_month'] = (totals['amount_month'] or 0) + amount
+        return summarize_categories(
+            {'category__name': name, **totals} for name, totals in sorted(by_name.items()))
+
+    def build_daily(self, rows, categories):
+        return self.totals(rows, lambda row: row[1], 'day', *self.windows['daily'])
+
+    def build_monthly(self, rows, categories):
+        return self.totals(rows, lambda row: row[1].replace(day=1), 'month',
+                           *self.windows['monthly'])
+
+    def build_by_date(self, rows, categories):
+        return self.totals(rows, lambda row: row[1], 'date', *self.windows['by_date'])
+
+    def build_by_category(self, rows, categories):
+        rows = [row for row in rows if row[0] in categories]
+        return self.totals(rows, lambda row: categories[row[0]], 'category__name')
+
+
+def get_category_names(user_id, category_ids, request=None) -> dict[int, str]:
+    """
+    Category names by id from the cache, querying only unknown ids. Ids of
+    categories deleted meanwhile, or of another user, are left out.
+    """
+    names = dict(get_categories(user_id, request))
+    missing = set(category_ids) - names.keys()
+    if missing:
+        names.update(Category.objects.filter(
+            user_id=user_id, id__in=missing).values_list('id', 'name'))
+    return names
@@ -0,0 +1,79 @@
+"""
+Async variants of the read-heavy expense views, wired in by `ASYNC_API`.
+
+Each class reuses the queries of its sync counterpart and only awaits them
+through the async ORM, so an ASGI worker doesn't hold a thread while the
+database works.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.response import Response
+from utils.views import AsyncViewMixin
+from .caches import cached_response
+from .analytics import get_category_names, summarize_categories
+from .views import (
+    ExpenseViewSet,
+    ExpenseData,
+    ExpenseDashboard,
+    DailyExpenseSummary,
+    MonthlyExpenseTrend,
+    ExpenseByDateRange,
+    CategoryWiseExpenseDistribution
+)
+
+
+class AsyncExpenseViewSet(AsyncViewMixin, ExpenseViewSet):
+
+    async def list(self, request, *args, **kwargs):
+        page = await self.paginator.apaginate_queryset(
+            self.get_row_queryset(), request, view=self)
+        categories = await sync_to_async(get_category_names)(
+            request.user.id, {row.category_id for row in page}, request)
+        serializer = self.get_row_serializer(page, categories)
+        return self.get_paginated_response(serializer.data)
+
+
+class AsyncExpenseData(AsyncViewMixin, ExpenseData):
+
+    @cached_response
+    async def get(self, request):
+        # Already a single aggregate over the rollups, nothing to fan out.
+        category_data = [row async for row in self.get_category_totals(request)]
+        return Response(summarize_categories(category_data), status=status.HTTP_200_OK)
+
+
+class AsyncExpenseDashboard(AsyncViewMixin, ExpenseDashboard):
+
+    @cached_response
+    async def get(self, request):
+        dashboard = self.get_dashboard(request)
+        rows = [row async for row in dashboard.get_rollups()]
+        categories = await sync_to_async(get_category_names)(
+            request.user.id, {row[0] for row in rows}, request)
+        return Response(dashboard.build(rows, categories), status=status.HTTP_200_OK)
+
+
+class AsyncRollupViewMixin(AsyncViewMixin):
+
+    @cached_response
+    async def get(self, request):
+        rollups = self.get_rollups(request)
+        if isinstance(rollups, Response):
+            return rollups
+        return Response([row async for row in rollups], status=status.HTTP_200_OK)
+
+
+class AsyncDailyExpenseSummary(AsyncRollupViewMixin, DailyExpenseSummary):
+    pass
+
+
+class AsyncMonthlyExpenseTrend(AsyncRollupViewMixin, MonthlyExpenseTrend):
+    pass
+
+
+class AsyncExpenseByDateRange(AsyncRollupViewMixin, ExpenseByDateRange):
+    pass
+
+
+class AsyncCategoryWiseExpenseDistribution(AsyncRollupViewMixin, CategoryWiseExpenseDistribution):
+    pass
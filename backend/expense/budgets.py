@@ -0,0 +1,177 @@
+"""
+Budget counters and alerts.
+
+Each budget keeps a `BudgetSpend` row for its current period holding what
+was spent in it, so checking a budget reads one row instead of summing the
+period. `apply_deltas` adjusts the row in the transaction that writes the
+expenses, and queues a `BudgetAlert` when it crosses the budget's
+threshold or its amount. The row is created from the rollups the first
+time the period is written, so changes to past periods need no counter
+work at all; until then reads sum the rollups.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.utils.timezone import localdate
+from .models import Budget, BudgetAlert, BudgetSpend, DailyExpenseRollup
+
+
+BATCH_SIZE = 500
+
+
+def period_bounds(period: str, day: date) -> tuple[date, date]:
+    """First and last day of the week (from Monday) or month containing `day`."""
+    if period == 'weekly':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def period_totals(budgets, starts: dict[int, date]) -> dict[int, Decimal]:
+    """
+    Sum the rollups of each budget's period starting at `starts[budget.id]`,
+    in one query over the days those periods cover.
+    """
+    bounds = {budget.id: period_bounds(budget.period, starts[budget.id]) for budget in budgets}
+    rows = DailyExpenseRollup.objects.filter(
+        user_id__in={budget.user_id for budget in budgets},
+        date__gte=min(start for start, _ in bounds.values()),
+        date__lte=max(end for _, end in bounds.values()),
+    ).order_by().values_list('user_id', 'category_id', 'date', 'total_amount')
+
+    by_user = defaultdict(list)
+    for budget in budgets:
+        by_user[budget.user_id].append(budget)
+    totals = dict.fromkeys(bounds, Decimal('0'))
+    for user_id, category_id, day, amount in rows:
+        for budget in by_user[user_id]:
+            start, end = bounds[budget.id]
+            if start <= day <= end and budget.category_id in (None, category_id):
+                totals[budget.id] += amount
+    return totals
+
+
+def get_spends(budgets) -> dict[int, Decimal]:
+    """
+    What was spent in each budget's current period. Reads the counters in
+    one query; periods without one yet are summed from the rollups, and
+    left for the next write to create.
+    """
+    today = localdate()
+    starts = {budget.id: period_bounds(budget.period, today)[0] for budget in budgets}
+    if not starts:
+        return {}
+    spends = {
+        budget_id: spent for budget_id, period_start, spent in BudgetSpend.objects.filter(
+            budget_id__in=starts, period_start__in=set(starts.values())
+        ).values_list('budget_id', 'period_start', 'spent')
+        if starts[budget_id] == period_start
+    }
+    missing = [budget for budget in budgets if budget.id not in spends]
+    if missing:
+        spends.update(period_totals(missing, starts))
+    return spends
+
+
+def crossed_alerts(budget: Budget, period_start: date, before: Decimal, after: Decimal):
+    """An unsaved alert for each threshold crossed going from `before` to `after`."""
+    return [
+        BudgetAlert(budget=budget, period_start=period_start, threshold=threshold, spent=after)
+        for threshold in sorted({budget.threshold, 100})
+        if before < budget.amount * threshold / 100 <= after
+    ]
+
+
+def add_spend(budget: Budget, period_start: date, amount: Decimal) -> list[BudgetAlert]:
+    """
+    Add `amount` to one budget period's counter under a row lock, and
+    return the alerts it crossed.
+    """
+    spends = BudgetSpend.objects.select_for_update().filter(
+        budget=budget, period_start=period_start)
+    spend = spends.first()
+    if spend is None:
+        try:
+            with transaction.atomic():
+                # The rollups include this change already.
+                spent = period_totals([budget], {budget.id: period_start})[budget.id]
+                BudgetSpend.objects.create(budget=budget, period_start=period_start, spent=spent)
+        except IntegrityError:
+            spend = spends.get()
+        else:
+            return crossed_alerts(budget, period_start, spent - amount, spent)
+    before = spend.spent
+    spend.spent = before + amount
+    spend.save(update_fields=['spent'])
+    return crossed_alerts(budget, period_start, before, spend.spent)
+
+
+def apply_budget_deltas(deltas, user_ids):
+    """
+    Fold the amounts of `ExpenseDeltas` items into the users' current
+    budget periods and queue the alerts they cross. Must run in the
+    transaction that already applied the same changes to the rollups.
+
+    The counters are locked, read and written with a fixed number of
+    queries per `BATCH_SIZE` budgets. Counters a concurrent writer created
+    first are retried one by one with `add_spend`.
+    """
+    user_ids = sorted(user_ids)
+    by_user = defaultdict(list)
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        for budget in Budget.objects.filter(user_id__in=user_ids[start:start + BATCH_SIZE]):
+            by_user[budget.user_id].append(budget)
+    if not by_user:
+        return
+
+    today = localdate()
+    changes = defaultdict(Decimal)
+    for (user_id, category_id, day), (_, amount) in deltas:
+        for budget in by_user.get(user_id, ()):
+            start, end = period_bounds(budget.period, today)
+            if start <= day <= end and budget.category_id in (None, category_id):
+                changes[(budget.id, start)] += amount
+    # Sorted so concurrent writers lock counters in the same order.
+    keys = sorted(key for key, amount in changes.items() if amount)
+    budgets = {budget.id: budget for user_budgets in by_user.values() for budget in user_budgets}
+
+    spends = {}
+    for start in range(0, len(keys), BATCH_SIZE):
+        batch = keys[start:start + BATCH_SIZE]
+        for spend in BudgetSpend.objects.select_for_update().filter(
+                budget_id__in=[budget_id for budget_id, _ in batch],
+                period_start__in={period_start for _, period_start in batch}).order_by('budget_id'):
+            key = (spend.budget_id, spend.period_start)
+            if key in changes:
+                spends[key] = spend
+
+    alerts = []
+    for (budget_id, period_start), spend in spends.items():
+        before = spend.spent
+        spend.spent = before + changes[(budget_id, period_start)]
+        alerts += crossed_alerts(budgets[budget_id], period_start, before, spend.spent)
+    BudgetSpend.objects.bulk_update(spends.values(), ['spent'], batch_size=BATCH_SIZE)
+
+    missing = [key for key in keys if key not in spends]
+    if missing:
+        # The rollups include these changes already.
+        totals = period_totals([budgets[budget_id] for budget_id, _ in missing], dict(missing))
+        try:
+            with transaction.atomic():
+                BudgetSpend.objects.bulk_create([
+                    BudgetSpend(budget_id=budget_id, period_start=period_start, spent=totals[budget_id])
+                    for budget_id, period_start in missing
+                ], batch_size=BATCH_SIZE)
+        except IntegrityError:
+            for key in missing:
+                alerts += add_spend(budgets[key[0]], key[1], changes[key])
+        else:
+            for key in missing:
+                spent = totals[key[0]]
+                alerts += crossed_alerts(budgets[key[0]], key[1], spent - changes[key], spent)
+
+    if alerts:
+        # One alert per threshold and period, however often it is re-crossed.
+        BudgetAlert.objects.bulk_create(alerts, ignore_conflicts=True, batch_size=BATCH_SIZE)
@@ -0,0 +1,226 @@
+import hashlib
+import uuid
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils.http import parse_etags
+from django.utils.timezone import localdate
+from rest_framework import status
+from rest_framework.response import Response
+from account.models import User
+from .models import Category
+
+
+CATEGORY_CACHE_TIMEOUT = 60 * 60
+
+
+def category_cache_key(user_id: int) -> str:
+    return f'expense:categories:{user_id}'
+
+
+def get_categories(user_id: int, request=None) -> list[tuple[int, str]]:
+    """
+    Return the user's categories as (id, name) pairs ordered by name.
+
+    Lookups go through a request-local copy, then the shared cache
+    (Redis in production via CACHE_URL), and only then the database.
+    Without a shared cache another process's invalidation would go
+    unseen, so only the request-local copy is kept. Every category write
+    must call `invalidate_categories`.
+    """
+    local = getattr(request, '_expense_categories', None)
+    if local is not None:
+        return local
+
+    key = category_cache_key(user_id)
+    categories = cache.get(key) if settings.CACHE_IS_SHARED else None
+    if categories is None:
+        categories = list(Category.objects.filter(
+            user_id=user_id).values_list('id', 'name'))
+        if settings.CACHE_IS_SHARED:
+            cache.set(key, categories, CATEGORY_CACHE_TIMEOUT)
+    if request is not None:
+        request._expense_categories = categories
+    return categories
+
+
+def get_category_ids(user_id: int, request=None) -> dict[str, int]:
+    """Map category names to ids for the given user."""
+    return {name: id for id, name in get_categories(user_id, request)}
+
+
+def invalidate_categories(user_id: int, request=None):
+    cache.delete(category_cache_key(user_id))
+    if request is not None:
+        request._expense_categories = None
+    bump_data_version(user_id)
+
+
+def currency_cache_key(user_id: int) -> str:
+    return f'expense:currency:{user_id}'
+
+
+def get_base_currency(user_id: int, request=None) -> str:
+    """
+    Return the currency the user's totals are kept in, through the same
+    request-local copy and shared cache as `get_categories`. Changing it
+    must call `invalidate_base_currency`.
+    """
+    local = getattr(request, '_expense_currency', None)
+    if local is not None:
+        return local
+
+    key = currency_cache_key(user_id)
+    currency = cache.get(key) if settings.CACHE_IS_SHARED else None
+    if currency is None:
+        currency = User.objects.values_list('currency', flat=True).get(pk=user_id)
+        if settings.CACHE_IS_SHARED:
+            cache.set(key, currency, CATEGORY_CACHE_TIMEOUT)
+    if request is not None:
+        request._expense_currency = currency
+    return currency
+
+
+def invalidate_base_currency(user_id: int):
+    transaction.on_commit(lambda: cache.delete(currency_cache_key(user_id)))
+
+
+DATA_VERSION_TIMEOUT = None
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def data_version_key(user_id: int) -> str:
+    return f'expense:version:{user_id}'
+
+
+def history_version_key(user_id: int) -> str:
+    return f'expense:history:{user_id}'
+
+
+RATES_VERSION_KEY = 'expense:rates'
+
+
+def _get_version(key: str) -> str:
+    if not settings.CACHE_IS_SHARED:
+        # Another process may have bumped it unseen; nothing keyed on
+        # this version may be reused.
+        return uuid.uuid4().hex
+    # Tokens are random rather than counters so an evicted key can never
+    # bring back an old version.
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, DATA_VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key: str):
+    transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex, DATA_VERSION_TIMEOUT))
+
+
+def get_data_version(user_id: int) -> str:
+    """
+    Return an opaque token that changes whenever the user's expenses or
+    categories change.
+    """
+    return _get_version(data_version_key(user_id))
+
+
+def bump_data_version(user_id: int):
+    """Invalidate the user's cached responses once the write commits."""
+    _bump_version(data_version_key(user_id))
+
+
+def get_history_version(user_id: int) -> str:
+    """
+    Return an opaque token that changes only when the user's totals of
+    months before the current one change, e.g. a backdated expense or a
+    category merge.
+    """
+    return _get_version(history_version_key(user_id))
+
+
+def bump_history_version(user_id: int):
+    """Invalidate state fitted on past months once the write commits."""
+    _bump_version(history_version_key(user_id))
+
+
+def get_rates_version() -> str:
+    """Return an opaque token that changes whenever exchange rates are imported."""
+    return _get_version(RATES_VERSION_KEY)
+
+
+def bump_rates_version():
+    """Make every process reload its rate table once the import commits."""
+    _bump_version(RATES_VERSION_KEY)
+
+
+def cached_response(view_method):
+    """
+    Cache a GET handler's response data per user, view, query parameters
+    and data version, and answer matching `If-None-Match` requests with
+    304 before any aggregation runs. Works on sync and async handlers.
+    Does nothing unless `CACHE_IS_SHARED`.
+    """
+    def lookup(view, request):
+        params = sorted(
+            (key, sorted(values)) for key, values in request.query_params.lists())
+        # Views default to the current month or year, so the day is part
+        # of the key too.
+        fingerprint = repr((
+            type(view).__name__, params, localdate().isoformat(),
+            get_data_version(request.user.id),
+        ))
+        digest = hashlib.md5(fingerprint.encode()).hexdigest()
+        etag = f'"{digest}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            return headers, None, Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return headers, f'expense:response:{request.user.id}:{digest}', None
+
+    def cacheable(response):
+        if response.status_code != status.HTTP_200_OK:
+            return None
+        data = response.data
+        return list(data) if isinstance(data, QuerySet) else data
+
+    if iscoroutinefunction(view_method):
+        @wraps(view_method)
+        async def async_wrapper(self, request, *args, **kwargs):
+            if not settings.CACHE_IS_SHARED:
+                return await view_method(self, request, *args, **kwargs)
+            headers, key, not_modified = await sync_to_async(lookup)(self, request)
+            if not_modified is not None:
+                return not_modified
+            data = await cache.aget(key)
+            if data is None:
+                response = await view_method(self, request, *args, **kwargs)
+                data = cacheable(response)
+                if data is None:
+                    return response
+                await cache.aset(key, data, RESPONSE_CACHE_TIMEOUT)
+            return Response(data, status=status.HTTP_200_OK, headers=headers)
+        return async_wrapper
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if not settings.CACHE_IS_SHARED:
+            return view_method(self, request, *args, **kwargs)
+        headers, key, not_modified = lookup(self, request)
+        if not_modified is not None:
+            return not_modified
+        data = cache.get(key)
+        if data is None:
+            response = view_method(self, request, *args, **kwargs)
+            data = cacheable(response)
+            if data is None:
+                return response
+            cache.set(key, data, RESPONSE_CACHE_TIMEOUT)
+        return Response(data, status=status.HTTP_200_OK, headers=headers)
+    return wrapper
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn production deploys running without a cache every worker shares."""
+    if settings.DEBUG or settings.CACHE_IS_SHARED:
+        return []
+    return [Warning(
+        "CACHE_URL is not shared by all workers, so analytics responses are "
+        "not cached and category and currency lookups hit the database.",
+        hint="Point CACHE_URL at a shared cache such as Redis or Memcached "
+             "and install its client package.",
+        id='expense.W001',
+    )]
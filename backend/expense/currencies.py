@@ -0,0 +1,213 @@
+"""
+Currency conversion with the local exchange rate table.
+
+Rates are quoted per unit of one reference currency, so converting between
+two currencies divides their rates. The rate on a day is the currency's
+latest one on or before it, which covers weekends and holidays; days
+before a currency's first rate have none.
+
+Every expense keeps its amount in the user's base currency as
+`base_amount`, converted at its date when it is written, and every total
+(rollups, budgets, forecasts, statistics) sums that column. Single writes
+convert with the in-process `RateTable`; set-based writes and
+reconversions after a base currency change or a rate import convert in
+the UPDATE itself, joining the rates with `converted`.
+"""
+import time
+from bisect import bisect_right
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case, DateField, DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Value, When
+)
+from django.db.models.functions import Now, Round
+from django.utils.timezone import localdate
+from account.models import User
+from .models import Budget, BudgetSpend, ExchangeRate, Expense, RecurringExpense
+from .derived import ExpenseDeltas, apply_deltas
+from .caches import bump_rates_version, get_rates_version, invalidate_base_currency
+
+
+CENT = Decimal('0.01')
+
+# Seconds a process keeps its rate table when no shared cache tells it
+# about imports.
+RATE_TABLE_TIMEOUT = 60
+
+
+class RateTable:
+    """Every loaded rate by currency and date, for conversions without queries."""
+
+    def __init__(self, rows):
+        """
+        :param rows: (currency, date, rate) tuples ordered by currency and date
+        """
+        self.dates = {}
+        self.rates = {}
+        for currency, day, rate in rows:
+            self.dates.setdefault(currency, []).append(day)
+            self.rates.setdefault(currency, []).append(rate)
+
+    def rate(self, currency: str, day: date) -> Decimal | None:
+        dates = self.dates.get(currency, ())
+        index = bisect_right(dates, day) - 1
+        return self.rates[currency][index] if index >= 0 else None
+
+    def convert(self, amount: Decimal, currency: str, base: str, day: date) -> Decimal:
+        """
+        Convert `amount` from `currency` to `base` at the rates of `day`.
+
+        :raises ValueError: If either currency has no rate on `day`
+        """
+        if currency == base:
+            return amount
+        for code in (currency, base):
+            if self.rate(code, day) is None:
+                raise ValueError(f"No exchange rate for {code} on {day}")
+        return (amount * self.rate(base, day) / self.rate(currency, day)).quantize(
+            CENT, ROUND_HALF_UP)
+
+
+_rate_table = (None, None)
+
+
+def get_rate_table() -> RateTable:
+    """
+    This process's rate table, reloaded in one query after a rate import
+    bumps the rates version. Without a shared cache the bump can't be
+    seen, so the table is reloaded every `RATE_TABLE_TIMEOUT` seconds.
+    """
+    global _rate_table
+    if settings.CACHE_IS_SHARED:
+        version = get_rates_version()
+    else:
+        version = int(time.monotonic() // RATE_TABLE_TIMEOUT)
+    if _rate_table[0] != version:
+        rows = ExchangeRate.objects.order_by('currency', 'date').values_list(
+            'currency', 'date', 'rate')
+        _rate_table = (version, RateTable(rows.iterator()))
+    return _rate_table[1]
+
+
+def forget_rate_table():
+    global _rate_table
+    _rate_table = (None, None)
+
+
+def to_base(amount: Decimal, currency: str, base: str, day: date) -> Decimal:
+    """
+    `RateTable.convert` with this process's table, which is not even
+    looked up for amounts already in `base`.
+    """
+    if currency == base:
+        return amount
+    return get_rate_table().convert(amount, currency, base, day)
+
+
+def _rate_at(currency, day):
+    return Subquery(ExchangeRate.objects.filter(
+        currency=currency, date__lte=day).order_by('-date').values('rate')[:1])
+
+
+def converted(base: str, days: int = 0):
+    """
+    SQL for an expense's `amount` in `base` at the rates of its date, or
+    of `days` after it. NULL when a rate is missing.
+    """
+    day = OuterRef('date')
+    if days:
+        day = ExpressionWrapper(day + timedelta(days=days), output_field=DateField())
+    amount = F('amount') * _rate_at(Value(base), day) / _rate_at(OuterRef('currency'), day)
+    return Case(
+        When(currency=base, then=F('amount')),
+        default=Round(amount, 2),
+        output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def reconvert(expenses, base: str) -> int:
+    """
+    Convert expenses of users whose base currency is `base` again at the
+    current rates, folding the differences into the rollups and budget
+    counters. Takes one GROUP BY and one UPDATE over the expenses whose
+    amount changes; expenses without a rate keep theirs. Must run in a
+    transaction.
+
+    :return: Number of expenses whose `base_amount` changed
+    """
+    changed = expenses.exclude(base_amount=converted(base))
+    deltas = ExpenseDeltas()
+    deltas.move_queryset(changed, base_amount=converted(base))
+    updated = changed.update(base_amount=converted(base), updated_at=Now())
+    apply_deltas(deltas)
+    return updated
+
+
+def change_base_currency(user_id: int, currency: str):
+    """
+    Make `currency` the user's base currency and convert their expenses to
+    it, and their budgets at today's rates. The current periods' budget
+    counters are recounted from the converted rollups.
+
+    :raises ValueError: If an expense, the next occurrence of a recurring
+        expense, or a budget has no rate to convert it with
+    """
+    expenses = Expense.objects.filter(user_id=user_id)
+    missing = expenses.annotate(new_amount=converted(currency)).filter(
+        new_amount__isnull=True).order_by('date').values_list('currency', 'date').first()
+    if missing is not None:
+        raise ValueError(
+            f"No exchange rate between {missing[0]} and {currency} on {missing[1]}")
+    table = get_rate_table()
+    for schedule_currency, next_date in RecurringExpense.objects.filter(
+            user_id=user_id, next_date__isnull=False).values_list('currency', 'next_date'):
+        table.convert(Decimal('0'), schedule_currency, currency, next_date)
+    previous = User.objects.values_list('currency', flat=True).get(pk=user_id)
+    budgets = list(Budget.objects.filter(user_id=user_id))
+    today = localdate()
+    for budget in budgets:
+        budget.amount = max(table.convert(budget.amount, previous, currency, today), CENT)
+
+    with transaction.atomic():
+        User.objects.filter(pk=user_id).update(currency=currency)
+        Budget.objects.bulk_update(budgets, ['amount'])
+        # Recreated from the rollups by the next write, once in `currency`.
+        BudgetSpend.objects.filter(budget__user_id=user_id).delete()
+        reconvert(expenses, currency)
+        invalidate_base_currency(user_id)
+
+
+def import_rates(rates, reference: str) -> tuple[int, int]:
+    """
+    Store rates quoted against `reference`, replacing those of the same
+    currency and day, and convert the expenses they apply to again. The
+    reference currency gets a rate of 1 on every imported day.
+
+    :param rates: (currency, date, rate) tuples
+    :return: Number of rates stored and of expenses converted again
+    """
+    rows = {(currency, day): rate for currency, day, rate in rates}
+    if not rows:
+        return 0, 0
+    for _, day in list(rows):
+        rows[(reference, day)] = Decimal('1')
+    changed = {currency for currency, _ in rows} - {reference}
+    # A rate applies until the currency's next one, so every later
+    # expense in either currency may convert differently.
+    expenses = Expense.objects.filter(date__gte=min(day for _, day in rows)).filter(
+        Q(currency__in=changed) | Q(user__currency__in=changed))
+
+    reconverted = 0
+    with transaction.atomic():
+        ExchangeRate.objects.bulk_create(
+            [ExchangeRate(currency=currency, date=day, rate=rate)
+             for (currency, day), rate in rows.items()],
+            update_conflicts=True, unique_fields=['currency', 'date'],
+            update_fields=['rate'], batch_size=1000)
+        bump_rates_version()
+        # This process reloads at once, with or without a shared cache.
+        transaction.on_commit(forget_rate_table)
+        for base in User.objects.order_by().values_list('currency', flat=True).distinct():
+            reconverted += reconvert(expenses.filter(user__currency=base), base)
+    return len(rows), reconverted
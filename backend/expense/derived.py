@@ -0,0 +1,237 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.utils.timezone import localdate
+from .models import BudgetSpend, DailyExpenseRollup, Expense
+from .caches import bump_data_version, bump_history_version
+from .budgets import apply_budget_deltas
+
+
+class ExpenseDeltas:
+    """
+    Signed changes to per-user, per-category, per-day expense totals.
+
+    Write paths collect the expenses they add (sign=1) and remove (sign=-1)
+    and hand the result to `apply_deltas` inside the same transaction.
+    """
+
+    def __init__(self):
+        self._deltas = defaultdict(lambda: [0, Decimal('0')])
+
+    def __bool__(self):
+        return any(count or amount for count, amount in self._deltas.values())
+
+    def add(self, user_id, category_id, date, count, amount):
+        date = Expense._meta.get_field('date').to_python(date)
+        delta = self._deltas[(user_id, category_id, date)]
+        delta[0] += count
+        delta[1] += Decimal(amount)
+
+    def add_expense(self, expense: Expense, sign: int = 1):
+        self.add(expense.user_id, expense.category_id, expense.date,
+                 sign, sign * Decimal(expense.base_amount))
+
+    def add_queryset(self, queryset, sign: int = 1):
+        """Aggregate a queryset of expenses in one GROUP BY query."""
+        for row in self._group(queryset):
+            self.add(row['user_id'], row['category_id'], row['date'],
+                     sign * row['count'], sign * row['total'])
+
+    def move_queryset(self, queryset, category_id=None, days: int = 0, base_amount=None):
+        """
+        Record moving a queryset's expenses to another category and/or
+        `days` later, in one GROUP BY query run before the update.
+
+        :param base_amount: Expression the update sets `base_amount` to,
+            if it changes it
+        """
+        rows = self._group(queryset)
+        if base_amount is not None:
+            rows = rows.annotate(new_total=Sum(base_amount))
+        for row in rows:
+            self.add(row['user_id'], row['category_id'], row['date'],
+                     -row['count'], -row['total'])
+            self.add(row['user_id'], category_id or row['category_id'],
+                     row['date'] + timedelta(days=days), row['count'],
+                     row.get('new_total', row['total']))
+
+    @staticmethod
+    def _group(queryset):
+        return queryset.order_by().values(
+            'user_id', 'category_id', 'date'
+        ).annotate(count=Count('id'), total=Sum('base_amount'))
+
+    def items(self):
+        # Sorted so concurrent writers touch rollup rows in the same order.
+        return sorted(
+            (key, delta) for key, delta in self._deltas.items()
+            if delta[0] or delta[1]
+        )
+
+
+# Above this many (user, category, date) keys the rollups are read and
+# written with a few set-based queries instead of an UPDATE per key.
+BULK_DELTAS = 100
+BULK_BATCH_SIZE = 500
+
+
+def _apply_rollup_delta(user_id, category_id, date, count, amount):
+    rollups = DailyExpenseRollup.objects.filter(
+        user_id=user_id, category_id=category_id, date=date)
+    changes = {
+        'total_expenses': F('total_expenses') + count,
+        'total_amount': F('total_amount') + amount,
+    }
+    if rollups.update(**changes):
+        if count < 0:
+            rollups.filter(total_expenses__lte=0).delete()
+        return
+    if count <= 0:
+        # Nothing to subtract from; `rebuild_expense_rollups` repairs drift.
+        return
+    try:
+        with transaction.atomic():
+            DailyExpenseRollup.objects.create(
+                user_id=user_id, category_id=category_id, date=date,
+                total_expenses=count, total_amount=amount)
+    except IntegrityError:
+        rollups.update(**changes)
+
+
+def _apply_rollup_deltas_in_bulk(items):
+    """
+    Lock and read the rollup rows of the affected users and dates, then
+    write them back with bulk_update, one DELETE and bulk_create. New rows
+    that race with a concurrent writer fall back to `_apply_rollup_delta`.
+    """
+    changes = dict(items)
+    dates = [date for _, _, date in changes]
+    user_ids = sorted({user_id for user_id, _, _ in changes})
+    existing = {}
+    for start in range(0, len(user_ids), BULK_BATCH_SIZE):
+        rollups = DailyExpenseRollup.objects.select_for_update().filter(
+            user_id__in=user_ids[start:start + BULK_BATCH_SIZE],
+            date__gte=min(dates), date__lte=max(dates))
+        for rollup in rollups.order_by('id'):
+            key = (rollup.user_id, rollup.category_id, rollup.date)
+            if key in changes:
+                existing[key] = rollup
+
+    updated, emptied = [], []
+    for key, rollup in existing.items():
+        count, amount = changes[key]
+        rollup.total_expenses += count
+        rollup.total_amount += amount
+        (updated if rollup.total_expenses > 0 else emptied).append(rollup)
+    DailyExpenseRollup.objects.bulk_update(
+        updated, ['total_expenses', 'total_amount'], batch_size=BULK_BATCH_SIZE)
+    for start in range(0, len(emptied), BULK_BATCH_SIZE):
+        DailyExpenseRollup.objects.filter(
+            id__in=[rollup.id for rollup in emptied[start:start + BULK_BATCH_SIZE]]).delete()
+
+    # Keys without a row and a negative count have nothing to subtract from.
+    created = [(key, delta) for key, delta in items if key not in existing and delta[0] > 0]
+    try:
+        with transaction.atomic():
+            DailyExpenseRollup.objects.bulk_create([
+                DailyExpenseRollup(user_id=user_id, category_id=category_id, date=date,
+                                   total_expenses=count, total_amount=amount)
+                for (user_id, category_id, date), (count, amount) in created
+            ], batch_size=BULK_BATCH_SIZE)
+    except IntegrityError:
+        for key, delta in created:
+            _apply_rollup_delta(*key, *delta)
+
+
+def apply_deltas(deltas: ExpenseDeltas):
+    """
+    Fold expense deltas into `DailyExpenseRollup` rows and budget counters.
+
+    Must be called inside the transaction that wrote the expenses so the
+    rollup never disagrees with the `Expense` table. Cached responses of
+    the affected users are invalidated when that transaction commits, and
+    so are their forecasts if a month before the current one changed.
+    """
+    items = deltas.items()
+    start_of_month = localdate().replace(day=1)
+    user_ids = {user_id for (user_id, _, _), _ in items}
+    history_user_ids = {user_id for (user_id, _, date), _ in items if date < start_of_month}
+    if len(items) > BULK_DELTAS:
+        _apply_rollup_deltas_in_bulk(items)
+    else:
+        for key, delta in items:
+            _apply_rollup_delta(*key, *delta)
+    apply_budget_deltas(items, user_ids)
+
+    for user_id in user_ids:
+        bump_data_version(user_id)
+    for user_id in history_user_ids:
+        bump_history_version(user_id)
+
+
+def merge_rollups(user_id: int, source_ids, target_id: int):
+    """
+    Fold the rollup rows of categories `source_ids` into `target_id`.
+
+    Works day by day on the rollups rather than on the expenses, so the
+    cost depends on the number of days covered, not on how many expenses
+    moved. Must run in the transaction that moved the expenses.
+    """
+    rollups = DailyExpenseRollup.objects.filter(user_id=user_id)
+    sources = rollups.filter(category_id__in=source_ids)
+    target = rollups.filter(category_id=target_id)
+    days = sources.order_by().values('date').annotate(
+        count=Sum('total_expenses'), amount=Sum('total_amount'))
+    same_day = days.filter(date=OuterRef('date'))
+
+    new_days = [
+        DailyExpenseRollup(user_id=user_id, category_id=target_id, date=row['date'],
+                           total_expenses=row['count'], total_amount=row['amount'])
+        for row in days.exclude(date__in=target.values('date'))
+    ]
+    target.filter(date__in=sources.values('date')).update(
+        total_expenses=F('total_expenses') + Subquery(same_day.values('count')),
+        total_amount=F('total_amount') + Subquery(same_day.values('amount')))
+    DailyExpenseRollup.objects.bulk_create(new_days, batch_size=5000)
+    sources.delete()
+    # The target's budgets now cover the moved expenses; recount them.
+    BudgetSpend.objects.filter(budget__category_id=target_id).delete()
+    bump_data_version(user_id)
+    bump_history_version(user_id)
+
+
+def rebuild_rollups(user_ids=None, batch_size: int = 5000) -> int:
+    """
+    Recompute rollup rows from the `Expense` table.
+
+    :param user_ids: Restrict the rebuild to these users, or all users if None
+    :param batch_size: Number of rollup rows inserted per query
+    :return: Number of rollup rows written
+    """
+    expenses = Expense.objects.all()
+    rollups = DailyExpenseRollup.objects.all()
+    if user_ids is not None:
+        expenses = expenses.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    rows = expenses.order_by().values(
+        'user_id', 'category_id', 'date'
+    ).annotate(total_expenses=Count('id'), total_amount=Sum('base_amount'))
+    objs = (DailyExpenseRollup(**row) for row in rows.iterator())
+
+    written = 0
+    with transaction.atomic():
+        rebuilt_user_ids = set(rollups.values_list('user_id', flat=True).distinct())
+        rollups.delete()
+        while batch := list(islice(objs, batch_size)):
+            DailyExpenseRollup.objects.bulk_create(batch)
+            rebuilt_user_ids.update(obj.user_id for obj in batch)
+            written += len(batch)
+        BudgetSpend.objects.filter(budget__user_id__in=rebuilt_user_ids).delete()
+        for user_id in rebuilt_user_ids:
+            bump_data_version(user_id)
+            bump_history_version(user_id)
+    return written
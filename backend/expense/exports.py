@@ -0,0 +1,105 @@
+import csv
+import io
+from itertools import islice
+from utils.renderers import dumps
+
+
+EXPORT_FIELDS = ('id', 'date', 'category__name', 'amount', 'currency', 'description')
+EXPORT_HEADER = ('id', 'date', 'category', 'amount', 'currency', 'description')
+
+
+def chunked(rows, size):
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def export_csv(rows, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    for chunk in chunked(rows, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_ndjson(rows, chunk_size):
+    for chunk in chunked(rows, chunk_size):
+        yield b''.join(
+            dumps({
+                'id': id,
+                'date': date,
+                'category': category,
+                'amount': str(amount),
+                'currency': currency,
+                'description': description,
+            }) + b'\n'
+            for id, date, category, amount, currency, description in chunk
+        )
+
+
+class _ParquetSink(io.RawIOBase):
+    """Write-only file that hands buffered bytes back to the generator."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def export_parquet(rows, chunk_size):
+    """Write one Parquet row group per chunk so memory stays bounded."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('date', pa.date32()),
+        ('category', pa.string()),
+        ('amount', pa.decimal128(10, 2)),
+        ('currency', pa.string()),
+        ('description', pa.string()),
+    ])
+    sink = _ParquetSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in chunked(rows, chunk_size):
+            columns = [list(column) for column in zip(*chunk)]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type)
+                 for values, field in zip(columns, schema)],
+                schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+EXPORTERS = {
+    'csv': (export_csv, 'text/csv'),
+    'ndjson': (export_ndjson, 'application/x-ndjson'),
+    'parquet': (export_parquet, 'application/vnd.apache.parquet'),
+}
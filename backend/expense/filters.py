@@ -1,4 +1,11 @@
+import re
+from decimal import Decimal
 import django_filters
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Greatest
+from rest_framework.filters import SearchFilter
 from .models import Expense
 
 
@@ -16,3 +23,100 @@ class ExpenseFilter(django_filters.FilterSet):
     class Meta:
         model = Expense
         fields = ['date', 'category', 'amount']
+
+
+class ExpenseSearchFilter(SearchFilter):
+    """
+    Ranked search over expense descriptions, category names and amounts.
+
+    Numeric terms match amounts by decimal prefix ("12" matches 12.00-12.99,
+    "12.5" matches 12.50-12.59) through the (user, amount) index. Text
+    terms use the trigram indexes on PostgreSQL and the `expense_search`
+    FTS5 table on SQLite, both maintained by migration 0007. Results are
+    ranked by relevance unless the client asks for an explicit ordering.
+    """
+
+    amount_pattern = re.compile(r'^\d{1,8}(\.\d{0,2})?$')
+
+    def get_amount_range(self, term):
+        if not self.amount_pattern.match(term):
+            return None
+        low = Decimal(term.rstrip('.'))
+        decimals = len(term.partition('.')[2])
+        return low, low + Decimal(10) ** -decimals
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        vendor = connections[queryset.db].vendor
+        if vendor == 'postgresql':
+            match_text, rank = self.get_trigram_search(terms)
+        elif vendor == 'sqlite':
+            match_text, rank = self.get_fts5_search(terms)
+        else:
+            match_text, rank = self.get_icontains_search(terms)
+
+        for term in terms:
+            condition = match_text(term)
+            amount_range = self.get_amount_range(term)
+            if amount_range:
+                low, high = amount_range
+                condition |= Q(amount__gte=low, amount__lt=high)
+            queryset = queryset.filter(condition)
+
+        if rank is not None:
+            queryset = queryset.annotate(search_rank=rank)
+            if self.ordering_requested(request, view):
+                return queryset
+            return queryset.order_by(
+                F('search_rank').desc(nulls_last=True), '-date', '-id')
+        return queryset
+
+    def ordering_requested(self, request, view):
+        return any(
+            getattr(backend, 'ordering_param', None) in request.query_params
+            for backend in getattr(view, 'filter_backends', [])
+        )
+
+    def get_trigram_search(self, terms):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        def match_text(term):
+            return Q(description__icontains=term) | Q(category__name__icontains=term)
+
+        text = ' '.join(terms)
+        rank = Greatest(
+            TrigramWordSimilarity(text, Coalesce('description', Value(''))),
+            TrigramWordSimilarity(text, 'category__name'),
+        )
+        return match_text, rank
+
+    def get_fts5_search(self, terms):
+        def fts5_query(term):
+            return '"{}"*'.format(term.replace('"', '""'))
+
+        def match_text(term):
+            return Q(id__in=RawSQL(
+                'SELECT rowid FROM expense_search WHERE expense_search MATCH %s',
+                (fts5_query(term),)))
+
+        # bm25() would need a correlated MATCH per candidate row, which
+        # SQLite re-evaluates from scratch each time. Score the already
+        # matched rows by where each term hits instead.
+        rank = sum(
+            Case(
+                When(description__istartswith=term, then=Value(2.0)),
+                When(category__name__istartswith=term, then=Value(1.0)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+            for term in terms
+        )
+        return match_text, rank
+
+    def get_icontains_search(self, terms):
+        def match_text(term):
+            return Q(description__icontains=term) | Q(category__name__icontains=term)
+        return match_text, None
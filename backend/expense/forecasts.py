@@ -0,0 +1,222 @@
+"""
+Per-category spending forecasts from monthly totals.
+
+Each of a user's categories gets a `MonthlyModel` fitted on the totals of
+its complete months. The fitted models are cached per user and brought
+forward a month at a time as months complete, so a forecast request reads
+the cache instead of scanning the history and refitting. Changes to past
+months (backdated expenses, merges, rebuilds) bump the user's history
+version, which discards the cached models.
+"""
+import math
+from datetime import date
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils.timezone import localdate
+from .models import DailyExpenseRollup
+from .caches import get_history_version
+
+
+FORECAST_CACHE_TIMEOUT = None
+# Refit the smoothing parameters after this many incrementally added months
+# at most, sooner while the history is shorter than that.
+REFIT_MONTHS = 12
+SEASON = 12
+ALPHAS = tuple(step / 20 for step in range(1, 21))
+# For categories that first appear between refits.
+DEFAULT_ALPHA = 0.3
+INTERVALS = {80: 1.2816, 90: 1.6449, 95: 1.9600}
+
+
+def add_months(month: date, months: int) -> date:
+    years, month_index = divmod(month.month - 1 + months, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+class MonthlyModel:
+    """
+    Simple exponential smoothing of one category's monthly totals, with
+    seasonal naive (the same month a year earlier) used instead once two
+    years of history show it predicts better. Both are scored on their
+    one-step-ahead errors, which also size the prediction intervals.
+    """
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.level = None
+        self.months = 0
+        self.recent = []
+        self.smoothing_sse = 0.0
+        self.smoothing_n = 0
+        self.seasonal_sse = 0.0
+        self.seasonal_n = 0
+
+    @staticmethod
+    def smoothing_error(alpha: float, amounts) -> float:
+        level, sse = amounts[0], 0.0
+        for amount in amounts[1:]:
+            error = amount - level
+            sse += error * error
+            level += alpha * error
+        return sse
+
+    @classmethod
+    def fit(cls, amounts: list[float]) -> 'MonthlyModel':
+        """Choose the smoothing factor with the least one-step error."""
+        model = cls(min(ALPHAS, key=lambda alpha: cls.smoothing_error(alpha, amounts)))
+        for amount in amounts:
+            model.add(amount)
+        return model
+
+    def add(self, amount: float):
+        """Fold in the total of the next month without refitting."""
+        if self.level is None:
+            self.level = amount
+        else:
+            error = amount - self.level
+            self.smoothing_sse += error * error
+            self.smoothing_n += 1
+            self.level += self.alpha * error
+        if len(self.recent) == SEASON:
+            error = amount - self.recent[0]
+            self.seasonal_sse += error * error
+            self.seasonal_n += 1
+        self.recent = [*self.recent, amount][-SEASON:]
+        self.months += 1
+
+    @property
+    def seasonal(self) -> bool:
+        return self.seasonal_n >= SEASON and \
+            self.seasonal_sse / self.seasonal_n < self.smoothing_sse / self.smoothing_n
+
+    def forecast(self, horizon: int) -> list[tuple[float, float | None]]:
+        """Mean and standard deviation for each of the next `horizon` months."""
+        if self.seasonal:
+            sigma = math.sqrt(self.seasonal_sse / self.seasonal_n)
+            return [(self.recent[(h - 1) % SEASON], sigma * math.sqrt((h - 1) // SEASON + 1))
+                    for h in range(1, horizon + 1)]
+        sigma = math.sqrt(self.smoothing_sse / self.smoothing_n) if self.smoothing_n > 1 else None
+        return [(self.level, None if sigma is None else sigma * math.sqrt(1 + (h - 1) * self.alpha ** 2))
+                for h in range(1, horizon + 1)]
+
+
+def forecast_cache_key(user_id: int) -> str:
+    return f'expense:forecast:{user_id}'
+
+
+def monthly_totals(user_id: int, start: date | None, end: date) -> dict[date, dict[int, float]]:
+    """Totals per month and category of the months from `start` to `end`."""
+    rollups = DailyExpenseRollup.objects.filter(
+        user_id=user_id, date__lt=add_months(end, 1))
+    if start is not None:
+        rollups = rollups.filter(date__gte=start)
+    rows = rollups.annotate(month=TruncMonth('date')).order_by().values_list(
+        'month', 'category_id').annotate(amount=Sum('total_amount'))
+    totals = {}
+    for month, category_id, amount in rows:
+        totals.setdefault(month, {})[category_id] = float(amount)
+    return totals
+
+
+def fit_models(totals: dict[date, dict[int, float]], end: date) -> dict[int, MonthlyModel]:
+    """Fit every category on its months from its first expense to `end`."""
+    series = {}
+    for month in sorted(totals):
+        for category_id in totals[month]:
+            series.setdefault(category_id, month)
+    models = {}
+    for category_id, month in series.items():
+        amounts = []
+        while month <= end:
+            amounts.append(totals.get(month, {}).get(category_id, 0.0))
+            month = add_months(month, 1)
+        models[category_id] = MonthlyModel.fit(amounts)
+    return models
+
+
+def get_models(user_id: int) -> tuple[date, dict[int, MonthlyModel]]:
+    """
+    Return the month forecasts start from (the current one) and the
+    user's models, fitted on every month before it.
+
+    A cache hit costs no query. A month that completed since the models
+    were cached costs one query over that month's rollups; only a change
+    to the history, or `REFIT_MONTHS`, brings a full scan and refit.
+    """
+    history = get_history_version(user_id)
+    start = localdate().replace(day=1)
+    end = add_months(start, -1)
+    key = forecast_cache_key(user_id)
+    state = cache.get(key)
+    if state is not None and state['history'] == history and state['through'] == end:
+        return start, state['models']
+
+    if state is None or state['history'] != history or \
+            add_months(state['fitted'], min(max(state['span'], 1), REFIT_MONTHS)) <= end:
+        totals = monthly_totals(user_id, None, end)
+        state = {
+            'history': history,
+            'fitted': end,
+            'through': end,
+            'span': len(totals),
+            'models': fit_models(totals, end),
+        }
+    else:
+        month = add_months(state['through'], 1)
+        totals = monthly_totals(user_id, month, end)
+        models = state['models']
+        while month <= end:
+            amounts = totals.get(month, {})
+            for category_id in amounts.keys() - models.keys():
+                models[category_id] = MonthlyModel(DEFAULT_ALPHA)
+            for category_id, model in models.items():
+                model.add(amounts.get(category_id, 0.0))
+            month = add_months(month, 1)
+        state['through'] = end
+
+    cache.set(key, state, FORECAST_CACHE_TIMEOUT)
+    return start, state['models']
+
+
+def _point(month: date, mean: float, std: float | None, z: float) -> dict:
+    lower = upper = None
+    if std is not None:
+        lower, upper = round(max(mean - z * std, 0.0), 2), round(mean + z * std, 2)
+    return {'month': month, 'amount': round(mean, 2), 'lower': lower, 'upper': upper}
+
+
+def build_forecast(start: date, models: dict[int, MonthlyModel], names: dict,
+                   horizon: int, interval: int) -> dict:
+    """
+    :param start: First month to forecast
+    :param models: Fitted models by category id
+    :param names: Mapping of category id to name; other categories are skipped
+    :param horizon: Number of months to forecast
+    :param interval: Coverage of the prediction intervals, a key of `INTERVALS`
+    """
+    z = INTERVALS[interval]
+    months = [add_months(start, h) for h in range(horizon)]
+    categories = []
+    means = [0.0] * horizon
+    variances = [0.0] * horizon
+    for category_id, model in models.items():
+        if category_id not in names:
+            continue
+        points = model.forecast(horizon)
+        for h, (mean, std) in enumerate(points):
+            means[h] += mean
+            variances[h] = None if std is None or variances[h] is None \
+                else variances[h] + std * std
+        categories.append({
+            'category_name': names[category_id],
+            'model': 'seasonal_naive' if model.seasonal else 'exponential_smoothing',
+            'alpha': None if model.seasonal else model.alpha,
+            'history_months': model.months,
+            'forecast': [_point(month, mean, std, z)
+                         for month, (mean, std) in zip(months, points)],
+        })
+    categories.sort(key=lambda row: row['category_name'])
+    total = [_point(month, mean, None if variance is None else math.sqrt(variance), z)
+             for month, mean, variance in zip(months, means, variances)] if categories else []
+    return {'interval': interval, 'categories': categories, 'total': total}
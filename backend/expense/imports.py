@@ -0,0 +1,143 @@
+import csv
+import io
+import json
+from itertools import islice
+from django.db import transaction
+from django.utils.timezone import localdate
+from rest_framework import serializers
+from .models import Expense
+from .derived import ExpenseDeltas, apply_deltas
+from .currencies import get_rate_table
+from .caches import get_base_currency, get_category_ids
+from utils.validators import validate_currency
+
+
+class ExpenseImportRowSerializer(serializers.Serializer):
+    """Validates one imported row without touching the database."""
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    currency = serializers.CharField(required=False, validators=[validate_currency])
+    category = serializers.CharField(max_length=100)
+    description = serializers.CharField(
+        max_length=200, required=False, allow_null=True, allow_blank=True)
+    date = serializers.DateField(required=False)
+
+
+def read_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    if reader.fieldnames is None:
+        return
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        yield reader.line_num, row, None
+
+
+def read_ndjson(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig')
+    for line_num, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_num, None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield line_num, None, "Expected a JSON object"
+            continue
+        yield line_num, {str(key).lower(): value for key, value in row.items()}, None
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+    'jsonl': read_ndjson,
+}
+
+
+class ExpenseImporter:
+    """
+    Streams rows from an uploaded file into `Expense` in chunks.
+
+    Category names are resolved from the cached per-user mapping, amounts
+    are converted to the user's base currency with the cached rate table,
+    and each chunk is written with `bulk_create` plus the matching rollup deltas in
+    one transaction. Invalid rows are skipped and counted, and the first
+    `max_errors` of them reported; valid rows are still imported.
+    """
+
+    chunk_size = 1000
+    max_errors = 100
+
+    def __init__(self, user_id, chunk_size=None):
+        self.user_id = user_id
+        self.chunk_size = chunk_size or self.chunk_size
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.category_ids = get_category_ids(user_id)
+        self.base_currency = get_base_currency(user_id)
+
+    def run(self, rows):
+        while chunk := list(islice(rows, self.chunk_size)):
+            self.import_chunk(chunk)
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def import_chunk(self, chunk):
+        valid = []
+        for line, row, error in chunk:
+            if error:
+                self.add_error(line, {'error': [error]})
+                continue
+            data = {key: value for key, value in row.items()
+                    if key in ExpenseImportRowSerializer._declared_fields
+                    and value not in ('', None)}
+            serializer = ExpenseImportRowSerializer(data=data)
+            if serializer.is_valid():
+                valid.append((line, serializer.validated_data))
+            else:
+                self.add_error(line, serializer.errors)
+
+        today = localdate()
+        rates = get_rate_table()
+        expenses = []
+        for line, data in valid:
+            category_id = self.category_ids.get(data['category'])
+            if category_id is None:
+                self.add_error(line, {'category': ["Category doesn't exist"]})
+                continue
+            currency = data.get('currency', self.base_currency)
+            day = data.get('date', today)
+            try:
+                base_amount = rates.convert(data['amount'], currency, self.base_currency, day)
+            except ValueError as exc:
+                self.add_error(line, {'currency': [str(exc)]})
+                continue
+            expenses.append(Expense(
+                user_id=self.user_id,
+                category_id=category_id,
+                amount=data['amount'],
+                currency=currency,
+                base_amount=base_amount,
+                description=data.get('description') or None,
+                date=day,
+            ))
+        if not expenses:
+            return
+
+        deltas = ExpenseDeltas()
+        for expense in expenses:
+            deltas.add_expense(expense)
+        with transaction.atomic():
+            Expense.objects.bulk_create(expenses, batch_size=self.chunk_size)
+            apply_deltas(deltas)
+        self.imported += len(expenses)
@@ -0,0 +1,181 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from account.models import User
+from account.tokens import create_jwt_pair
+from expense.models import Category, Expense
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the REST API in-process against seeded data and report "
+        "p50/p95/p99 latency, queries per request and throughput per "
+        "endpoint as JSON. Seed data first with seed_expenses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help="Requests per endpoint.")
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help="Worker threads issuing requests.")
+        parser.add_argument('--email', default=None,
+                            help="Benchmark as this user (defaults to the seeded user with most expenses).")
+        parser.add_argument('--password', default='Bench@123')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help="Only run endpoints whose name starts with this (repeatable).")
+        parser.add_argument('--cold-cache', action='store_true',
+                            help="Clear the cache before every request.")
+        parser.add_argument('--output', default=None,
+                            help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--compare', default=None,
+                            help="Baseline JSON report; fail if p95 regresses beyond --tolerance.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Allowed relative p95 regression when comparing (0.2 = 20%%).")
+
+    def get_user(self, email):
+        if email:
+            return User.objects.get(email=email)
+        busiest = Expense.objects.order_by().values('user_id').annotate(
+            n=Count('id')).order_by('-n').first()
+        if busiest is None:
+            raise CommandError("No expenses found; run seed_expenses first.")
+        return User.objects.get(pk=busiest['user_id'])
+
+    def get_endpoints(self, user, password):
+        category = Category.objects.filter(user=user).first()
+        latest = Expense.objects.filter(user=user).values_list('date', flat=True).first() or date.today()
+        pages = max(Expense.objects.filter(user=user).count() // 25, 1)
+        refresh = create_jwt_pair(user)['refresh']
+        credentials = {'email': user.email, 'password': password}
+        return [
+            ('expenses.list', 'get', '/api/expenses/', None),
+            ('expenses.list_deep_page', 'get', f'/api/expenses/?page_size=25&page={pages}', None),
+            ('expenses.list_cursor', 'get', '/api/expenses/?pagination=cursor&page_size=25', None),
+            ('expenses.search', 'get', '/api/expenses/?search=coffee', None),
+            ('expenses.search_amount', 'get', '/api/expenses/?search=12', None),
+            ('expenses.filter_category', 'get', f'/api/expenses/?category={category.name if category else ""}', None),
+            ('expenses.filter_amount', 'get', '/api/expenses/?min_amount=100&max_amount=150', None),
+            ('expenses.filter_dates', 'get',
+             f'/api/expenses/?start_date={latest.replace(day=1)}&stop_date={latest}', None),
+            ('expenses.order_amount', 'get', '/api/expenses/?ordering=-amount', None),
+            ('data.summary', 'get', '/api/expenses/data', None),
+            ('data.daily', 'get', f'/api/expenses/data/daily?date={latest:%Y-%m}', None),
+            ('data.monthly', 'get', f'/api/expenses/data/monthly?year={latest.year}', None),
+            ('data.by_date', 'get',
+             f'/api/expenses/data/by-date?start_date={latest.replace(month=1, day=1)}&end_date={latest}', None),
+            ('data.by_category', 'get', '/api/expenses/data/by-category', None),
+            ('data.dashboard', 'get',
+             f'/api/expenses/data/dashboard?panels=summary,daily,monthly,by_category'
+             f'&date={latest:%Y-%m}&year={latest.year}', None),
+            ('categories.list', 'get', '/api/expenses/categories/', None),
+            ('auth.login', 'post', '/api/auth/login/', credentials),
+            ('auth.jwt_create', 'post', '/api/auth/jwt/create', credentials),
+            ('auth.jwt_refresh', 'post', '/api/auth/jwt/refresh', {'refresh': refresh}),
+            ('auth.profile', 'get', '/api/auth/profile/', None),
+        ]
+
+    def run_endpoint(self, endpoint, token, options):
+        name, method, path, payload = endpoint
+
+        def request(_):
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+            if options['cold_cache']:
+                cache.clear()
+            with CaptureQueriesContext(connections['default']) as queries:
+                started = time.perf_counter()
+                if method == 'post':
+                    response = client.post(path, payload, content_type='application/json')
+                else:
+                    response = client.get(path)
+                elapsed = (time.perf_counter() - started) * 1000
+            return elapsed, len(queries), response.status_code
+
+        # One untimed request warms caches and imports.
+        request(None)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            samples = list(pool.map(request, range(options['requests'])))
+        wall = time.perf_counter() - started
+
+        latencies = sorted(sample[0] for sample in samples)
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive') \
+            if len(latencies) > 1 else latencies * 99
+        return {
+            'name': name,
+            'method': method.upper(),
+            'path': path,
+            'requests': len(samples),
+            'errors': sum(1 for sample in samples if sample[2] >= 400),
+            'p50_ms': round(cuts[49], 3),
+            'p95_ms': round(cuts[94], 3),
+            'p99_ms': round(cuts[98], 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'queries_per_request': round(statistics.fmean(s[1] for s in samples), 2),
+            'throughput_rps': round(len(samples) / wall, 2),
+        }
+
+    def compare(self, report, baseline_path, tolerance):
+        with open(baseline_path) as file:
+            baseline = {r['name']: r for r in json.load(file)['results']}
+        regressions = []
+        for result in report['results']:
+            before = baseline.get(result['name'])
+            if before and result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                regressions.append(
+                    f"{result['name']}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+            if before and result['queries_per_request'] > before['queries_per_request']:
+                regressions.append(
+                    f"{result['name']}: queries {before['queries_per_request']} -> "
+                    f"{result['queries_per_request']}")
+        return regressions
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['email'])
+        token = create_jwt_pair(user)['access']
+        endpoints = self.get_endpoints(user, options['password'])
+        if options['endpoints']:
+            endpoints = [e for e in endpoints
+                         if any(e[0].startswith(prefix) for prefix in options['endpoints'])]
+
+        results = []
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for endpoint in endpoints:
+                results.append(self.run_endpoint(endpoint, token, options))
+                if options['output']:
+                    self.stderr.write(
+                        f"{endpoint[0]}: p50 {results[-1]['p50_ms']} ms, "
+                        f"{results[-1]['queries_per_request']} queries")
+
+        report = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'vendor': connection.vendor,
+                'user_id': user.id,
+                'user_expenses': Expense.objects.filter(user=user).count(),
+                'total_expenses': Expense.objects.count(),
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'cold_cache': options['cold_cache'],
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            regressions = self.compare(report, options['compare'], options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions found:\n" + "\n".join(regressions))
@@ -0,0 +1,217 @@
+import asyncio
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from account.tokens import create_jwt_pair
+from .benchmark_api import Command as BenchmarkApiCommand
+
+
+def wsgi_get(app, path, token):
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': 'localhost',
+        'HTTP_AUTHORIZATION': f'Bearer {token}',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+    }
+    status = []
+    body = app(environ, lambda status_line, headers: status.append(status_line))
+    try:
+        b''.join(body)
+    finally:
+        body.close()
+    return int(status[0].split()[0])
+
+
+async def asgi_get(app, path, token):
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost'),
+                    (b'authorization', f'Bearer {token}'.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+class Command(BenchmarkApiCommand):
+    help = (
+        "Compare throughput of the sync views under WSGI with the async "
+        "views under ASGI at high concurrency. Each mode runs in its own "
+        "process through the real handler, without a network server."
+    )
+    endpoint_prefixes = ('expenses.list', 'data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Requests per endpoint and mode.")
+        parser.add_argument('--concurrency', type=int, default=64,
+                            help="Requests in flight at once.")
+        parser.add_argument('--threads', type=int, default=8,
+                            help="WSGI worker threads serving those requests.")
+        parser.add_argument('--email', default=None)
+        parser.add_argument('--password', default='Bench@123')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help="Only run endpoints whose name starts with this (repeatable).")
+        parser.add_argument('--cold-cache', action='store_true',
+                            help="Run with a dummy cache so every request hits the database.")
+        parser.add_argument('--output', default=None)
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'], default=None,
+                            help="Run a single mode in this process (used internally).")
+
+    def get_endpoints(self, user, password):
+        return [
+            endpoint for endpoint in super().get_endpoints(user, password)
+            if endpoint[1] == 'get' and endpoint[0].startswith(self.endpoint_prefixes)
+        ]
+
+    def summarize(self, samples, wall):
+        latencies = sorted(sample[0] for sample in samples)
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive') \
+            if len(latencies) > 1 else latencies * 99
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for sample in samples if sample[1] >= 400),
+            'p50_ms': round(cuts[49], 3),
+            'p95_ms': round(cuts[94], 3),
+            'throughput_rps': round(len(samples) / wall, 2),
+        }
+
+    async def drive(self, call, path, options):
+        """Issue the requests with `concurrency` in flight at once."""
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                status = await call(path)
+                return (time.perf_counter() - started) * 1000, status
+
+        await one()  # warm up
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(one() for _ in range(options['requests'])))
+        return self.summarize(samples, time.perf_counter() - started)
+
+    def run_mode(self, options):
+        if options['mode'] == 'asgi' and not settings.ASYNC_API:
+            raise CommandError("The asgi mode needs ASYNC_API=True")
+        user = self.get_user(options['email'])
+        token = create_jwt_pair(user)['access']
+        endpoints = self.get_endpoints(user, options['password'])
+        if options['endpoints']:
+            endpoints = [e for e in endpoints
+                         if any(e[0].startswith(prefix) for prefix in options['endpoints'])]
+
+        if options['mode'] == 'asgi':
+            app = get_asgi_application()
+
+            async def call(path):
+                return await asgi_get(app, path, token)
+        else:
+            app = get_wsgi_application()
+            pool = ThreadPoolExecutor(max_workers=options['threads'])
+
+            async def call(path):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(pool, wsgi_get, app, path, token)
+
+        results = {}
+        for name, _, path, _ in endpoints:
+            results[name] = asyncio.run(self.drive(call, path, options))
+            results[name]['path'] = path
+            self.stderr.write(f"{options['mode']} {name}: "
+                              f"{results[name]['throughput_rps']} req/s")
+        return results
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            self.stdout.write(json.dumps(self.run_mode(options)))
+            return
+
+        runs = {}
+        for mode in ('wsgi', 'asgi'):
+            argv = [sys.executable, '-m', 'django', 'benchmark_asgi', '--mode', mode,
+                    '--requests', str(options['requests']),
+                    '--concurrency', str(options['concurrency']),
+                    '--threads', str(options['threads']),
+                    '--password', options['password']]
+            if options['email']:
+                argv += ['--email', options['email']]
+            for prefix in options['endpoints'] or []:
+                argv += ['--endpoint', prefix]
+            env = {**os.environ, 'ASYNC_API': str(mode == 'asgi')}
+            if options['cold_cache']:
+                env['CACHE_URL'] = 'dummycache://'
+            process = subprocess.run(argv, env=env, cwd=settings.BASE_DIR,
+                                     stdout=subprocess.PIPE, text=True)
+            if process.returncode:
+                raise CommandError(f"The {mode} run failed")
+            runs[mode] = json.loads(process.stdout)
+
+        results = []
+        for name, wsgi in runs['wsgi'].items():
+            asgi = runs['asgi'].get(name)
+            results.append({
+                'name': name,
+                'path': wsgi.pop('path'),
+                'wsgi': wsgi,
+                'asgi': asgi and {k: v for k, v in asgi.items() if k != 'path'},
+                'throughput_ratio': asgi and round(
+                    asgi['throughput_rps'] / wsgi['throughput_rps'], 2),
+            })
+        report = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'vendor': connection.vendor,
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'wsgi_threads': options['threads'],
+                'cold_cache': options['cold_cache'],
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
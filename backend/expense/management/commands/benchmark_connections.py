@@ -0,0 +1,130 @@
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+from account.models import User
+from expense.models import Category
+
+
+# CONN_MAX_AGE and CONN_HEALTH_CHECKS of each compared setup.
+MODES = {
+    'per_request': (0, False),
+    'persistent': (600, False),
+    'persistent_checked': (600, True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a cheap endpoint through the full WSGI handler, opening a "
+        "connection per request and keeping it with and without health "
+        "checks, and report latency percentiles and connections opened. "
+        "Point DB_URL at the production database server for representative "
+        "numbers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', default=None,
+                            help="Authenticate as this user (defaults to the owner of the first category).")
+        parser.add_argument('--path', default=None,
+                            help="Endpoint to request (defaults to one of the user's categories).")
+        parser.add_argument('--requests', type=int, default=500,
+                            help="Timed requests per setup.")
+        parser.add_argument('--output', default=None,
+                            help="Write the JSON report to this file instead of stdout.")
+
+    def get_category(self, email):
+        categories = Category.objects.order_by('id')
+        if email:
+            categories = categories.filter(user__email=email)
+        category = categories.first()
+        if category is None:
+            raise CommandError("No category found; run seed_expenses first.")
+        return category
+
+    def run(self, handler, environ, requests):
+        def start_response(status, headers):
+            if not status.startswith('200'):
+                raise CommandError(f"{environ['PATH_INFO']} answered {status}")
+
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            # Iterating and closing the response fires request_finished,
+            # where Django closes connections past their CONN_MAX_AGE.
+            response = handler(environ, start_response)
+            b''.join(response)
+            response.close()
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def measure(self, handler, environ, requests, max_age, health_checks):
+        connections.close_all()
+        for alias in connections:
+            connections[alias].settings_dict.update(
+                CONN_MAX_AGE=max_age, CONN_HEALTH_CHECKS=health_checks)
+        self.run(handler, environ, 10)
+
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(count)
+        try:
+            timings = self.run(handler, environ, requests)
+        finally:
+            connection_created.disconnect(count)
+        cuts = statistics.quantiles(timings, n=100, method='inclusive')
+        return {
+            'conn_max_age': max_age,
+            'conn_health_checks': health_checks,
+            'connections_opened': len(opened),
+            'p50_ms': round(cuts[49] * 1000, 3),
+            'p95_ms': round(cuts[94] * 1000, 3),
+            'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        }
+
+    def handle(self, *args, **options):
+        category = self.get_category(options['email'])
+        user = User(pk=category.user_id)
+        path = options['path'] or f'/api/expenses/categories/{category.id}/'
+        environ = RequestFactory().get(
+            path, HTTP_HOST='localhost',
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}').environ
+        handler = WSGIHandler()
+
+        configured = {alias: dict(connections[alias].settings_dict) for alias in connections}
+        try:
+            results = {
+                name: self.measure(handler, environ, options['requests'], max_age, health_checks)
+                for name, (max_age, health_checks) in MODES.items()
+            }
+        finally:
+            connections.close_all()
+            for alias, settings_dict in configured.items():
+                connections[alias].settings_dict.update(settings_dict)
+        results['p50_saved_ms'] = round(
+            results['per_request']['p50_ms'] - results['persistent_checked']['p50_ms'], 3)
+
+        report = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'vendor': connection.vendor,
+                'path': path,
+                'requests': options['requests'],
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
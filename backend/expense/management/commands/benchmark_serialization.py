@@ -0,0 +1,148 @@
+import json
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from utils.renderers import ORJSONRenderer, orjson
+from expense.exports import chunked, export_ndjson
+from expense.models import Category, Expense
+from expense.serializers import ExpenseRowSerializer, ExpenseSerializer
+
+
+def legacy_export_ndjson(rows, chunk_size):
+    """NDJSON export as written before the orjson-backed `dumps`."""
+    for chunk in chunked(rows, chunk_size):
+        yield ''.join(
+            json.dumps({
+                'id': id,
+                'date': date.isoformat(),
+                'category': category,
+                'amount': str(amount),
+                'currency': currency,
+                'description': description,
+            }) + '\n'
+            for id, date, category, amount, currency, description in chunk
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure rows per second serialized for list pages and NDJSON "
+        "exports, comparing ExpenseSerializer with JSONRenderer against "
+        "ExpenseRowSerializer with ORJSONRenderer. Uses in-memory rows, so "
+        "no database time is included."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=25)
+        parser.add_argument('--pages', type=int, default=2000,
+                            help="Pages rendered per variant.")
+        parser.add_argument('--export-rows', type=int, default=100_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default=None,
+                            help="Write the JSON report to this file instead of stdout.")
+
+    def make_rows(self, count, seed):
+        rng = random.Random(seed)
+        names = ['Groceries', 'Transport', 'Rent', 'Dining', 'Shopping', 'Health']
+        categories = {id: name for id, name in enumerate(names, start=1)}
+        today = date.today()
+        rows = [
+            (id, rng.randint(1, len(names)),
+             Decimal(rng.randint(50, 200_000)).scaleb(-2),
+             rng.choice(['weekly shop', 'fuel', 'pharmacy', None, 'café ☕']),
+             today - timedelta(days=rng.randint(0, 1500)), 1)
+            for id in range(1, count + 1)
+        ]
+        # Shaped like `ExpenseRowSerializer.fields`, in the base currency.
+        rows = [
+            (id, category_id, amount, 'USD', amount, description, day, user_id)
+            for id, category_id, amount, description, day, user_id in rows
+        ]
+        return rows, categories
+
+    def measure(self, rows, repeat, run):
+        run()  # warm up
+        started = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        elapsed = time.perf_counter() - started
+        return {
+            'rows': rows * repeat,
+            'seconds': round(elapsed, 4),
+            'rows_per_second': round(rows * repeat / elapsed),
+        }
+
+    def bench_page(self, rows, categories, pages):
+        instances = [
+            Expense(id=id, amount=amount, currency=currency, base_amount=base_amount,
+                    description=description, date=day, user_id=user_id,
+                    category=Category(id=category_id, name=categories[category_id]))
+            for id, category_id, amount, currency, base_amount, description, day, user_id in rows
+        ]
+        model_renderer = JSONRenderer()
+        row_renderer = ORJSONRenderer()
+
+        def model_page():
+            return model_renderer.render(ExpenseSerializer(instances, many=True).data)
+
+        def row_page():
+            return row_renderer.render(ExpenseRowSerializer(
+                rows, many=True, context={'categories': categories}).data)
+
+        if json.loads(model_page()) != json.loads(row_page()):
+            raise CommandError("The serializers' output differs")
+        return {
+            'model_serializer_json': self.measure(len(rows), pages, model_page),
+            'row_serializer_orjson': self.measure(len(rows), pages, row_page),
+        }
+
+    def bench_export(self, rows, categories):
+        export_rows = [
+            (id, day, categories[category_id], amount, currency, description)
+            for id, category_id, amount, currency, _, description, day, _ in rows
+        ]
+
+        def legacy():
+            for _ in legacy_export_ndjson(iter(export_rows), 2000):
+                pass
+
+        def current():
+            for _ in export_ndjson(iter(export_rows), 2000):
+                pass
+
+        return {
+            'ndjson_json': self.measure(len(export_rows), 1, legacy),
+            'ndjson_current': self.measure(len(export_rows), 1, current),
+        }
+
+    def handle(self, *args, **options):
+        page_rows, categories = self.make_rows(options['page_size'], options['seed'])
+        export_rows, _ = self.make_rows(options['export_rows'], options['seed'])
+        results = {
+            'page': self.bench_page(page_rows, categories, options['pages']),
+            'export': self.bench_export(export_rows, categories),
+        }
+        for variants in results.values():
+            baseline, candidate = variants.values()
+            variants['speedup'] = round(
+                candidate['rows_per_second'] / baseline['rows_per_second'], 2)
+
+        report = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'orjson': orjson.__version__ if orjson else None,
+                'page_size': options['page_size'],
+                'pages': options['pages'],
+                'export_rows': options['export_rows'],
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,173 @@
+import json
+import math
+import statistics
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from account.models import User
+from expense.analytics import get_category_names
+from expense.models import Expense
+from expense.stats import PERCENTILES, ROLLING_WINDOWS, load_columns, spending_stats
+
+
+def naive_stats(queryset, names, z_threshold=3.0, max_outliers=50):
+    """The statistics of `spending_stats` from model instances and Python loops."""
+    expenses = list(queryset.order_by())
+    if not expenses:
+        return {'categories': [], 'daily': [], 'monthly': [], 'outliers': []}
+    by_category = defaultdict(list)
+    by_day = defaultdict(float)
+    by_month = defaultdict(float)
+    for expense in expenses:
+        amount = float(expense.base_amount)
+        by_category[expense.category_id].append(amount)
+        by_day[expense.date] += amount
+        by_month[expense.date.replace(day=1)] += amount
+
+    categories = []
+    moments = {}
+    for category_id, amounts in by_category.items():
+        mean, std = statistics.fmean(amounts), statistics.pstdev(amounts)
+        moments[category_id] = mean, std
+        cuts = statistics.quantiles(amounts, n=100, method='inclusive') \
+            if len(amounts) > 1 else amounts * 99
+        categories.append({
+            'category_name': names[category_id], 'count': len(amounts),
+            'mean': round(mean, 2), 'std': round(std, 2),
+            **{f'p{q}': round(cuts[q - 1], 2) for q in PERCENTILES},
+        })
+    categories.sort(key=lambda row: row['category_name'])
+
+    daily = []
+    day, last = min(by_day), max(by_day)
+    totals = []
+    while day <= last:
+        totals.append(by_day.get(day, 0.0))
+        row = {'day': day, 'total': round(totals[-1], 2)}
+        for window in ROLLING_WINDOWS:
+            recent = totals[-window:]
+            row[f'avg_{window}'] = round(sum(recent) / len(recent), 2)
+        daily.append(row)
+        day += timedelta(days=1)
+
+    monthly = []
+    month, last = min(by_month), max(by_month)
+    previous = None
+    while month <= last:
+        total = by_month.get(month, 0.0)
+        change = None if previous is None else total - previous
+        monthly.append({
+            'month': month, 'total': round(total, 2),
+            'change': None if change is None else round(change, 2),
+            'change_pct': round(change * 100 / previous, 2) if previous else None,
+        })
+        previous = total
+        month = (month + timedelta(days=32)).replace(day=1)
+
+    flagged = []
+    for expense in expenses:
+        mean, std = moments[expense.category_id]
+        z_score = (float(expense.base_amount) - mean) / std if std else 0.0
+        if abs(z_score) > z_threshold:
+            flagged.append((abs(z_score), expense, z_score))
+    flagged.sort(key=lambda item: -item[0])
+    outliers = [
+        {'id': expense.id, 'date': expense.date,
+         'category_name': names[expense.category_id],
+         'amount': round(float(expense.base_amount), 2), 'z_score': round(z_score, 2)}
+        for _, expense, z_score in flagged[:max_outliers]
+    ]
+    return {'categories': categories, 'daily': daily, 'monthly': monthly, 'outliers': outliers}
+
+
+def same_stats(left, right):
+    """Equal up to a cent of float rounding."""
+    if isinstance(left, dict) and isinstance(right, dict):
+        return left.keys() == right.keys() and all(same_stats(left[k], right[k]) for k in left)
+    if isinstance(left, list) and isinstance(right, list):
+        return len(left) == len(right) and all(map(same_stats, left, right))
+    if isinstance(left, float) or isinstance(right, float):
+        return left is not None and right is not None and \
+            math.isclose(left, right, rel_tol=1e-9, abs_tol=0.011)
+    return left == right
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the NumPy statistics of /api/expenses/data/stats against the "
+        "same statistics computed from ORM instances in Python, for one "
+        "user's expenses. Seed data first, e.g. seed_expenses --users 1 "
+        "--expenses 1000000."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', default=None,
+                            help="Use this user's expenses (defaults to the user with most expenses).")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Runs per implementation; the fastest counts.")
+        parser.add_argument('--output', default=None,
+                            help="Write the JSON report to this file instead of stdout.")
+
+    def get_user(self, email):
+        if email:
+            return User.objects.get(email=email)
+        busiest = Expense.objects.order_by().values('user_id').annotate(
+            n=Count('id')).order_by('-n').first()
+        if busiest is None:
+            raise CommandError("No expenses found; run seed_expenses first.")
+        return User.objects.get(pk=busiest['user_id'])
+
+    def measure(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = run()
+            timings.append(time.perf_counter() - started)
+        return result, min(timings)
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['email'])
+        expenses = Expense.objects.filter(user_id=user.id)
+        names = get_category_names(user.id, ())
+        rows = expenses.count()
+
+        columns, load_seconds = self.measure(options['repeat'], lambda: load_columns(expenses))
+        vectorized, compute_seconds = self.measure(
+            options['repeat'], lambda: spending_stats(columns, names))
+        naive, naive_seconds = self.measure(
+            options['repeat'], lambda: naive_stats(expenses, names))
+        if not same_stats(vectorized, naive):
+            raise CommandError("The implementations disagree")
+
+        vectorized_seconds = load_seconds + compute_seconds
+        report = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'vendor': connection.vendor,
+                'user_id': user.id,
+                'rows': rows,
+                'repeat': options['repeat'],
+            },
+            'results': {
+                'numpy': {
+                    'seconds': round(vectorized_seconds, 4),
+                    'load_seconds': round(load_seconds, 4),
+                    'compute_seconds': round(compute_seconds, 4),
+                    'rows_per_second': round(rows / vectorized_seconds),
+                },
+                'naive': {
+                    'seconds': round(naive_seconds, 4),
+                    'rows_per_second': round(rows / naive_seconds),
+                },
+                'speedup': round(naive_seconds / vectorized_seconds, 2),
+            },
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
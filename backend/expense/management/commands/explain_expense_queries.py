@@ -0,0 +1,83 @@
+import json
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+from expense.models import Category, Expense
+
+
+class Command(BaseCommand):
+    help = (
+        "Print query plans and timings for the per-user expense access paths. "
+        "Run it once with `migrate expense 0005` and once after "
+        "`migrate expense 0006` to compare plans without and with the "
+        "composite indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, default=None,
+                            help="User id to query (defaults to the user with most expenses).")
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--json', action='store_true',
+                            help="Print machine-readable results only.")
+
+    def get_user_id(self, user_id):
+        if user_id is not None:
+            return user_id
+        busiest = Expense.objects.order_by().values('user_id').annotate(
+            n=Count('id')).order_by('-n').first()
+        if busiest is None:
+            raise CommandError("No expenses found; run seed_expenses first.")
+        return busiest['user_id']
+
+    def get_queries(self, user_id):
+        expenses = Expense.objects.filter(user_id=user_id)
+        category = Category.objects.filter(user_id=user_id).first()
+        latest = expenses.values_list('date', flat=True).first()
+        return {
+            'list_first_page': expenses[:25],
+            'list_deep_page': expenses[10_000:10_025],
+            'filter_category': expenses.filter(
+                category__name__iexact=category.name if category else '')[:25],
+            'filter_amount_range': expenses.filter(
+                amount__gte=100, amount__lte=150)[:25],
+            'order_by_amount': expenses.order_by('-amount', '-id')[:25],
+            'filter_date_range': expenses.filter(
+                date__gte=latest.replace(day=1) if latest else None,
+                date__lte=latest)[:25],
+            'rollup_rebuild_group_by': expenses.order_by().values(
+                'category_id', 'date').annotate(n=Count('id'), total=Sum('base_amount')),
+        }
+
+    def handle(self, *args, **options):
+        user_id = self.get_user_id(options['user'])
+        explain_options = {'analyze': True} if connection.vendor == 'postgresql' else {}
+        results = []
+        for name, queryset in self.get_queries(user_id).items():
+            timings = []
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                list(queryset._chain())
+                timings.append((time.perf_counter() - started) * 1000)
+            results.append({
+                'query': name,
+                'median_ms': round(statistics.median(timings), 3),
+                'min_ms': round(min(timings), 3),
+                'plan': queryset.explain(**explain_options),
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'vendor': connection.vendor,
+                'user_id': user_id,
+                'rows': Expense.objects.filter(user_id=user_id).count(),
+                'results': results,
+            }, indent=2))
+            return
+
+        for result in results:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{result['query']}: median {result['median_ms']} ms, "
+                f"min {result['min_ms']} ms"))
+            self.stdout.write(result['plan'] + '\n')
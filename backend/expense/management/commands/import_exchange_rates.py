@@ -0,0 +1,56 @@
+import csv
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from expense.currencies import import_rates
+from utils.validators import validate_currency
+
+
+class Command(BaseCommand):
+    help = (
+        "Load exchange rates from a CSV file with date (YYYY-MM-DD), "
+        "currency and rate columns, the rate being units of the currency "
+        "per unit of the reference currency. Every file must use the same "
+        "reference. Replaces stored rates of the same currency and day and "
+        "converts the expenses they apply to again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to load.")
+        parser.add_argument('--reference', default='EUR',
+                            help="Currency the rates are quoted against.")
+
+    def read_rates(self, path):
+        rates = []
+        with open(path, encoding='utf-8-sig', newline='') as file:
+            reader = csv.DictReader(file)
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+            if not {'date', 'currency', 'rate'} <= set(reader.fieldnames):
+                raise CommandError("The file needs date, currency and rate columns")
+            for row in reader:
+                try:
+                    currency = row['currency'].strip().upper()
+                    validate_currency(currency)
+                    day = datetime.strptime(row['date'].strip(), '%Y-%m-%d').date()
+                    rate = Decimal(row['rate'].strip())
+                except (AttributeError, ValueError, InvalidOperation, ValidationError):
+                    raise CommandError(f"Invalid row on line {reader.line_num}")
+                if not rate > 0:
+                    raise CommandError(f"Invalid rate on line {reader.line_num}")
+                rates.append((currency, day, rate))
+        return rates
+
+    def handle(self, *args, **options):
+        reference = options['reference'].upper()
+        try:
+            validate_currency(reference)
+        except ValidationError:
+            raise CommandError("The reference must be a currency code such as EUR")
+
+        started = time.perf_counter()
+        stored, reconverted = import_rates(self.read_rates(options['path']), reference)
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stored} rates and converted {reconverted} expenses again "
+            f"in {time.perf_counter() - started:.1f}s"))
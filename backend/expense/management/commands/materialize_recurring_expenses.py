@@ -0,0 +1,147 @@
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import localdate
+from account.models import User
+from expense.currencies import get_rate_table
+from expense.derived import ExpenseDeltas, apply_deltas
+from expense.models import Expense, RecurringExpense
+from expense.recurring import due_dates
+
+
+MAX_WATERMARK_UPDATES = 100
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the expenses of every recurring expense due up to today, "
+        "for all users. Works through the due schedules in batches, each "
+        "committed with its expenses, rollups and the schedules' next "
+        "dates, so a run can be interrupted and re-run at any time. Run "
+        "it at least daily. Schedules in a currency without an exchange "
+        "rate are logged and skipped until the rate is imported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', default=None,
+                            help="Create occurrences up to this YYYY-MM-DD date instead of today.")
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help="Schedules per batch and transaction.")
+
+    def save_watermarks(self, schedules):
+        """
+        Store the schedules' new `last_date` and `next_date`. Schedules due
+        together mostly share them, so one UPDATE per distinct pair beats
+        bulk_update's CASE per row; spread-out batches still use it.
+        """
+        groups = defaultdict(list)
+        for schedule in schedules:
+            groups[(schedule.last_date, schedule.next_date)].append(schedule.id)
+        if len(groups) > MAX_WATERMARK_UPDATES:
+            RecurringExpense.objects.bulk_update(
+                schedules, ['last_date', 'next_date'], batch_size=500)
+            return
+        for (last_date, next_date), ids in groups.items():
+            RecurringExpense.objects.filter(id__in=ids).update(
+                last_date=last_date, next_date=next_date)
+
+    def occurrences(self, schedule, dates, rates, base):
+        """
+        The unsaved expenses of `schedule` on `dates`.
+
+        :raises ValueError: If an amount cannot be converted to `base`
+        """
+        return [
+            Expense(user_id=schedule.user_id, category_id=schedule.category_id,
+                    amount=schedule.amount, currency=schedule.currency,
+                    base_amount=rates.convert(schedule.amount, schedule.currency, base, day),
+                    description=schedule.description, date=day)
+            for day in dates
+        ]
+
+    def materialize(self, through, batch_size, after, skipped):
+        """
+        Create the occurrences of one batch of due schedules, the first
+        ones after the `(next_date, id)` key `after`. Returns the key of the
+        batch's last schedule (None when none was due), how many schedules
+        were materialized, how many expenses were created and how many of
+        those schedules are still due. Schedules that cannot be converted
+        are added to `skipped` and left due.
+        """
+        due = RecurringExpense.objects.filter(next_date__lte=through)
+        if after is not None:
+            due = due.filter(Q(next_date__gt=after[0]) | Q(next_date=after[0], id__gt=after[1]))
+        with transaction.atomic():
+            # Concurrent runs on PostgreSQL take different batches.
+            schedules = list(due.select_for_update(skip_locked=True).order_by(
+                'next_date', 'id')[:batch_size])
+            if not schedules:
+                return None, 0, 0, 0
+            last = (schedules[-1].next_date, schedules[-1].id)
+            bases = dict(User.objects.filter(
+                id__in={schedule.user_id for schedule in schedules}).values_list('id', 'currency'))
+            rates = get_rate_table()
+            expenses = []
+            deltas = ExpenseDeltas()
+            materialized = []
+            for schedule in schedules:
+                dates, next_date = due_dates(schedule, through)
+                try:
+                    created = self.occurrences(schedule, dates, rates, bases[schedule.user_id])
+                except ValueError as exc:
+                    logger.warning("Skipping recurring expense %s: %s", schedule.id, exc)
+                    skipped.add(schedule.id)
+                    continue
+                for expense in created:
+                    deltas.add_expense(expense)
+                expenses += created
+                schedule.next_date = next_date
+                if dates:
+                    schedule.last_date = dates[-1]
+                materialized.append(schedule)
+            Expense.objects.bulk_create(expenses, batch_size=batch_size)
+            self.save_watermarks(materialized)
+            apply_deltas(deltas)
+        behind = sum(schedule.next_date is not None and schedule.next_date <= through
+                     for schedule in materialized)
+        return last, len(materialized), len(expenses), behind
+
+    def handle(self, *args, **options):
+        through = localdate()
+        if options['date']:
+            try:
+                through = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Invalid date format. Use YYYY-MM-DD")
+
+        started = time.perf_counter()
+        total_schedules = total_expenses = 0
+        skipped = set()
+        behind = True
+        # Each pass walks the due schedules once. Schedules still behind
+        # after their batch are caught up by the next pass.
+        while behind:
+            after, behind = None, 0
+            while True:
+                after, schedules, expenses, still_due = self.materialize(
+                    through, options['batch_size'], after, skipped)
+                if after is None:
+                    break
+                behind += still_due
+                total_schedules += schedules
+                total_expenses += expenses
+                self.stdout.write(
+                    f"Created {total_expenses} expenses from {total_schedules} schedules")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {total_expenses} expenses from {total_schedules} schedules "
+            f"due by {through} in {time.perf_counter() - started:.1f}s"))
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped {len(skipped)} schedules without an exchange rate"))
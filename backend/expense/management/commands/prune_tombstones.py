@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from expense.models import Tombstone
+from expense.sync import tombstone_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete tombstones older than SYNC_TOMBSTONE_DAYS. Sync tokens "
+        "issued before then already expire, so nothing reads them."
+    )
+
+    def handle(self, *args, **options):
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=tombstone_cutoff()).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} tombstones"))
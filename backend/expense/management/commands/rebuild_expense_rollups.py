@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from expense.derived import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily expense rollups from the expense table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help="Only rebuild rollups for this user id (repeatable).")
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="Number of rollup rows inserted per query.")
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(
+            user_ids=options['user_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} daily expense rollup rows."))
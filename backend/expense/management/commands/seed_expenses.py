@@ -0,0 +1,128 @@
+import math
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate, islice
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from account.models import User
+from expense.models import Category, Expense
+from expense.derived import rebuild_rollups
+
+
+# (name, relative frequency, median amount, log-normal sigma)
+CATEGORY_PROFILES = [
+    ('Groceries', 30, 45, 0.6),
+    ('Transport', 20, 12, 0.7),
+    ('Dining', 18, 25, 0.6),
+    ('Shopping', 10, 60, 1.0),
+    ('Entertainment', 8, 30, 0.8),
+    ('Utilities', 4, 90, 0.3),
+    ('Health', 3, 60, 1.0),
+    ('Rent', 2, 1200, 0.1),
+    ('Travel', 2, 350, 0.9),
+    ('Gifts', 2, 50, 0.9),
+    ('Insurance', 1, 200, 0.3),
+    ('Education', 1, 150, 0.8),
+]
+
+DESCRIPTIONS = [
+    'weekly shop', 'coffee', 'lunch with team', 'taxi home', 'monthly bill',
+    'online order', 'pharmacy', 'cinema tickets', 'train pass', 'birthday gift',
+    'subscription', 'fuel', 'dinner out', 'books', None,
+]
+
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic users, categories and expenses for benchmarking. "
+        "Amounts are log-normal per category, user activity follows a "
+        "Pareto distribution and recent dates and weekends are busier."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--categories', type=int, default=8,
+                            help="Categories per user.")
+        parser.add_argument('--expenses', type=int, default=100_000,
+                            help="Total expenses spread across all users.")
+        parser.add_argument('--days', type=int, default=3 * 365,
+                            help="Spread expense dates over this many past days.")
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--password', default='Bench@123')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        password = make_password(options['password'])
+        offset = User.objects.count()
+
+        users = User.objects.bulk_create([
+            User(email=f"bench{offset + n}@example.com", password=password)
+            for n in range(options['users'])
+        ])
+        profiles = []
+        categories = []
+        for user in users:
+            for n in range(options['categories']):
+                name, *profile = CATEGORY_PROFILES[n % len(CATEGORY_PROFILES)]
+                if n >= len(CATEGORY_PROFILES):
+                    name = f"{name} {n}"
+                categories.append(Category(name=name, user=user))
+                profiles.append(profile)
+        categories = Category.objects.bulk_create(categories)
+
+        # Per user: category ids with cumulative frequency weights.
+        user_categories = {}
+        for category, (weight, median, sigma) in zip(categories, profiles):
+            entry = user_categories.setdefault(category.user_id, ([], [], []))
+            entry[0].append(category.id)
+            entry[1].append(weight)
+            entry[2].append((math.log(median), sigma))
+        for entry in user_categories.values():
+            entry[1][:] = accumulate(entry[1])
+
+        user_ids = list(user_categories)
+        user_weights = list(accumulate(
+            rng.paretovariate(1.2) for _ in user_ids))
+
+        today = date.today()
+        days = options['days']
+
+        def random_date():
+            while True:
+                # Skewed towards recent days; weekends twice as likely.
+                day = today - timedelta(days=int(days * rng.random() ** 1.5))
+                if day.weekday() >= 5 or rng.random() < 0.5:
+                    return day
+
+        def generate():
+            for _ in range(options['expenses']):
+                user_id = rng.choices(user_ids, cum_weights=user_weights)[0]
+                ids, weights, params = user_categories[user_id]
+                index = rng.choices(range(len(ids)), cum_weights=weights)[0]
+                mu, sigma = params[index]
+                amount = Decimal(str(round(rng.lognormvariate(mu, sigma), 2)))
+                amount = min(max(amount, Decimal('0.01')), MAX_AMOUNT)
+                yield Expense(
+                    user_id=user_id,
+                    category_id=ids[index],
+                    amount=amount,
+                    base_amount=amount,
+                    description=rng.choice(DESCRIPTIONS),
+                    date=random_date(),
+                )
+
+        expenses = generate()
+        written = 0
+        while batch := list(islice(expenses, options['batch_size'])):
+            Expense.objects.bulk_create(batch)
+            written += len(batch)
+            self.stdout.write(f"Inserted {written} expenses", ending='\r')
+
+        rollups = rebuild_rollups(user_ids=user_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"\nSeeded {len(users)} users, {len(categories)} categories, "
+            f"{written} expenses and {rollups} rollup rows."))
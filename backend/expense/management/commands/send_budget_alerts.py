@@ -0,0 +1,42 @@
+from django.core.mail import get_connection, EmailMessage
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+from expense.models import BudgetAlert
+
+
+class Command(BaseCommand):
+    help = (
+        "Email users about queued budget alerts and mark them notified. "
+        "Expense writes only queue the alerts; run this every few minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500,
+                            help="Send at most this many alerts per run.")
+
+    def format(self, alert):
+        budget = alert.budget
+        scope = budget.category.name if budget.category else "all categories"
+        if alert.threshold >= 100:
+            subject = f"You are over your {budget.period} budget for {scope}"
+        else:
+            subject = f"You have used {alert.threshold}% of your {budget.period} budget for {scope}"
+        body = (
+            f"You have spent {alert.spent} of your {budget.amount} {budget.period} "
+            f"budget for {scope} in the period starting {alert.period_start}."
+        )
+        return subject, body
+
+    def handle(self, *args, **options):
+        alerts = list(BudgetAlert.objects.filter(notified_at__isnull=True).select_related(
+            'budget__user', 'budget__category').order_by('created_at')[:options['limit']])
+        if not alerts:
+            self.stdout.write("No alerts queued")
+            return
+
+        messages = [EmailMessage(*self.format(alert), to=[alert.budget.user.email])
+                    for alert in alerts]
+        with get_connection() as connection:
+            connection.send_messages(messages)
+        BudgetAlert.objects.filter(id__in=[alert.id for alert in alerts]).update(notified_at=now())
+        self.stdout.write(self.style.SUCCESS(f"Sent {len(alerts)} alerts"))
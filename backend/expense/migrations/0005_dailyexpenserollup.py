@@ -0,0 +1,47 @@
+# Generated by Django 4.2.6 on 2026-10-18 15:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    Expense = apps.get_model('expense', 'Expense')
+    DailyExpenseRollup = apps.get_model('expense', 'DailyExpenseRollup')
+    rows = Expense.objects.order_by().values(
+        'user_id', 'category_id', 'date'
+    ).annotate(
+        total_expenses=models.Count('id'), total_amount=models.Sum('amount'))
+    DailyExpenseRollup.objects.bulk_create(
+        [DailyExpenseRollup(**row) for row in rows], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expense', '0004_alter_expense_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyExpenseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_expenses', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='expense.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['user', 'date'], name='expense_rollup_user_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyexpenserollup',
+            constraint=models.UniqueConstraint(fields=('user', 'category', 'date'), name='unique_daily_expense_rollup'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 4.2.6 on 2026-10-18 15:22
+
+from django.db import migrations
+
+
+POSTGRESQL_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS expense_description_trgm_idx '
+    'ON expense_expense USING gin (description gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS expense_category_name_trgm_idx '
+    'ON expense_category USING gin (name gin_trgm_ops)',
+]
+
+POSTGRESQL_REVERSE = [
+    'DROP INDEX IF EXISTS expense_description_trgm_idx',
+    'DROP INDEX IF EXISTS expense_category_name_trgm_idx',
+]
+
+# Contentful FTS5 table keyed by expense id, kept in step by triggers so
+# bulk inserts, set-based updates and category renames are all covered.
+SQLITE_FORWARD = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS expense_search '
+    'USING fts5(description, category_name)',
+    '''
+    CREATE TRIGGER IF NOT EXISTS expense_search_insert
+    AFTER INSERT ON expense_expense BEGIN
+        INSERT INTO expense_search (rowid, description, category_name)
+        VALUES (new.id, coalesce(new.description, ''),
+                (SELECT name FROM expense_category WHERE id = new.category_id));
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS expense_search_update
+    AFTER UPDATE OF description, category_id ON expense_expense BEGIN
+        UPDATE expense_search
+        SET description = coalesce(new.description, ''),
+            category_name = (SELECT name FROM expense_category WHERE id = new.category_id)
+        WHERE rowid = new.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS expense_search_delete
+    AFTER DELETE ON expense_expense BEGIN
+        DELETE FROM expense_search WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS expense_search_category_rename
+    AFTER UPDATE OF name ON expense_category BEGIN
+        UPDATE expense_search SET category_name = new.name
+        WHERE rowid IN (SELECT id FROM expense_expense WHERE category_id = new.id);
+    END
+    ''',
+    '''
+    INSERT INTO expense_search (rowid, description, category_name)
+    SELECT e.id, coalesce(e.description, ''), c.name
+    FROM expense_expense e JOIN expense_category c ON c.id = e.category_id
+    ''',
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS expense_search_insert',
+    'DROP TRIGGER IF EXISTS expense_search_update',
+    'DROP TRIGGER IF EXISTS expense_search_delete',
+    'DROP TRIGGER IF EXISTS expense_search_category_rename',
+    'DROP TABLE IF EXISTS expense_search',
+]
+
+
+def run_statements(statements):
+    def run(apps, schema_editor):
+        vendor_statements = statements.get(schema_editor.connection.vendor, [])
+        for statement in vendor_statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0006_expense_user_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements({
+                'postgresql': POSTGRESQL_FORWARD,
+                'sqlite': SQLITE_FORWARD,
+            }),
+            run_statements({
+                'postgresql': POSTGRESQL_REVERSE,
+                'sqlite': SQLITE_REVERSE,
+            }),
+        ),
+    ]
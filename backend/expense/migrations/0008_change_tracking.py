@@ -0,0 +1,64 @@
+# Generated by Django 4.2.6 on 2026-10-18 16:09
+
+from importlib import import_module
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+search = import_module('expense.migrations.0007_expense_search')
+
+# Adding a column makes SQLite rebuild the table, which fails while the
+# search triggers reference it and would drop the triggers on it anyway.
+SQLITE_TRIGGERS = search.SQLITE_FORWARD[1:5]
+SQLITE_DROP_TRIGGERS = search.SQLITE_REVERSE[:4]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expense', '0007_expense_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            search.run_statements({'sqlite': SQLITE_DROP_TRIGGERS}),
+            search.run_statements({'sqlite': SQLITE_TRIGGERS}),
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('expense', 'Expense'), ('category', 'Category')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'updated_at'], name='expense_user_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ),
+        migrations.RunPython(
+            search.run_statements({'sqlite': SQLITE_TRIGGERS}),
+            search.run_statements({'sqlite': SQLITE_DROP_TRIGGERS}),
+        ),
+    ]
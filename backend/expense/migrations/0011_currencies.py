@@ -0,0 +1,73 @@
+# Generated by Django 4.2.6 on 2026-10-18 16:44
+
+from importlib import import_module
+from django.db import migrations, models
+from django.db.models import F
+
+search = import_module('expense.migrations.0007_expense_search')
+
+# See 0008_change_tracking.
+SQLITE_TRIGGERS = search.SQLITE_FORWARD[1:5]
+SQLITE_DROP_TRIGGERS = search.SQLITE_REVERSE[:4]
+
+
+def copy_amounts(apps, schema_editor):
+    # Existing expenses are in the default currency, every user's base.
+    Expense = apps.get_model('expense', 'Expense')
+    Expense.objects.update(base_amount=F('amount'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0010_recurring_expense'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            search.run_statements({'sqlite': SQLITE_DROP_TRIGGERS}),
+            search.run_statements({'sqlite': SQLITE_TRIGGERS}),
+        ),
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='expense_user_category_date_idx',
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='base_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_amounts, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='expense',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='recurringexpense',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'category', 'date'], include=('base_amount',), name='expense_user_category_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='exchangerate',
+            constraint=models.UniqueConstraint(fields=('currency', 'date'), name='unique_exchange_rate'),
+        ),
+        migrations.RunPython(
+            search.run_statements({'sqlite': SQLITE_TRIGGERS}),
+            search.run_statements({'sqlite': SQLITE_DROP_TRIGGERS}),
+        ),
+    ]
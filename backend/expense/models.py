@@ -1,12 +1,17 @@
+from decimal import Decimal
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Q
 from django.utils.timezone import now
-from account.models import User
+from account.models import DEFAULT_CURRENCY, User
 
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='categories')
+    # `update()` calls must set this themselves; see expense/sync.py.
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = 'Categories'
@@ -20,13 +25,208 @@ class Expense(models.Model):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='expenses')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
+    # `amount` in the user's base currency on `date`, which every aggregate
+    # sums; see expense/currencies.py.
+    base_amount = models.DecimalField(max_digits=14, decimal_places=2, editable=False)
     category = models.ForeignKey(
         Category, on_delete=models.SET_DEFAULT, default=1, related_name='expenses')
     description = models.CharField(max_length=200, null=True, blank=True)
     date = models.DateField(default=now)
+    # `update()` calls must set this themselves; see expense/sync.py.
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.category} ({self.amount})"
 
     class Meta:
-        ordering = ['-date']
+        ordering = ['-date', '-id']
+        # Every expense query is scoped to one user, so each access path
+        # leads with `user`. INCLUDE columns only apply on PostgreSQL.
+        indexes = [
+            models.Index(
+                fields=['user', '-date', '-id'],
+                include=['category', 'amount'],
+                name='expense_user_date_id_idx'),
+            models.Index(
+                fields=['user', 'category', 'date'],
+                include=['base_amount'],
+                name='expense_user_category_date_idx'),
+            models.Index(
+                fields=['user', 'amount'],
+                include=['date'],
+                name='expense_user_amount_idx'),
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='expense_user_updated_idx'),
+        ]
+
+
+class DailyExpenseRollup(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='expense_rollups')
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name='rollups')
+    date = models.DateField()
+    total_expenses = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.category} on {self.date} ({self.total_amount})"
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'category', 'date'],
+                name='unique_daily_expense_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date'],
+                         name='expense_rollup_user_date_idx'),
+        ]
+
+
+class Tombstone(models.Model):
+    """A deleted expense or category, kept so clients can sync deletes."""
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='tombstones')
+    model = models.CharField(max_length=20, choices=[
+        ('expense', 'Expense'), ('category', 'Category')])
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted on {self.deleted_at}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'],
+                         name='tombstone_user_deleted_idx'),
+        ]
+
+
+class Budget(models.Model):
+    """A spending limit per week or month, for one category or overall."""
+    PERIODS = [('monthly', 'Monthly'), ('weekly', 'Weekly')]
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='budgets')
+    # None for a budget over all categories.
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, null=True, blank=True, related_name='budgets')
+    period = models.CharField(max_length=10, choices=PERIODS, default='monthly')
+    amount = models.DecimalField(
+        max_digits=12, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    # Percentage of `amount` at which a warning alert is queued, in addition
+    # to the alert at 100%.
+    threshold = models.PositiveSmallIntegerField(
+        default=80, validators=[MinValueValidator(1), MaxValueValidator(100)])
+
+    def __str__(self):
+        return f"{self.category or 'Overall'} {self.period} ({self.amount})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'category', 'period'],
+                name='unique_category_budget'),
+            models.UniqueConstraint(
+                fields=['user', 'period'], condition=Q(category__isnull=True),
+                name='unique_overall_budget'),
+        ]
+
+
+class BudgetSpend(models.Model):
+    """The running total of a budget's period, see expense/budgets.py."""
+    budget = models.ForeignKey(
+        Budget, on_delete=models.CASCADE, related_name='spends')
+    period_start = models.DateField()
+    spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.budget} from {self.period_start} ({self.spent})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['budget', 'period_start'], name='unique_budget_spend'),
+        ]
+
+
+class BudgetAlert(models.Model):
+    """
+    A budget period crossing `threshold` percent of its amount, queued until
+    `send_budget_alerts` notifies the user.
+    """
+    budget = models.ForeignKey(
+        Budget, on_delete=models.CASCADE, related_name='alerts')
+    period_start = models.DateField()
+    threshold = models.PositiveSmallIntegerField()
+    spent = models.DecimalField(max_digits=14, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.budget} at {self.threshold}% on {self.created_at}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['budget', 'period_start', 'threshold'],
+                name='unique_budget_alert'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], condition=Q(notified_at__isnull=True),
+                         name='budget_alert_pending_idx'),
+        ]
+
+
+class RecurringExpense(models.Model):
+    """
+    An expense repeated on an iCalendar RRULE schedule starting at
+    `start_date`, e.g. `FREQ=MONTHLY;BYMONTHDAY=1`. The occurrences are
+    created as they fall due by `materialize_recurring_expenses`.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='recurring_expenses')
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name='recurring_expenses')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
+    description = models.CharField(max_length=200, null=True, blank=True)
+    rule = models.CharField(max_length=255)
+    start_date = models.DateField()
+    # The last occurrence created, and the next one to create; None once
+    # the rule has no more. See expense/recurring.py.
+    last_date = models.DateField(null=True, blank=True)
+    next_date = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.category} ({self.amount}) {self.rule}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_date', 'id'], name='recurring_next_date_idx'),
+        ]
+
+
+class ExchangeRate(models.Model):
+    """
+    Units of `currency` per unit of the reference currency its file was
+    quoted against, from `date` until the currency's next rate. Loaded
+    with `import_exchange_rates`.
+    """
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+
+    def __str__(self):
+        return f"{self.currency} on {self.date} ({self.rate})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['currency', 'date'], name='unique_exchange_rate'),
+        ]
@@ -1,5 +1,16 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import math
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor, CursorPagination, PageNumberPagination, _reverse_ordering
+)
 from rest_framework.response import Response
+from .caches import get_data_version
 
 
 class CustomPagination(PageNumberPagination):
@@ -17,3 +28,155 @@ class CustomPagination(PageNumberPagination):
             'previous': self.get_previous_link(),
             'results': data,
         })
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` for async views, querying via the async ORM."""
+        self.request = request
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+        self.page.object_list = [row async for row in self.page.object_list]
+        return self.page.object_list
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination on the full ordering, e.g. (date, id).
+
+    Unlike the stock `CursorPagination`, the cursor stores the value of
+    every ordering field, so each page is a single indexed range scan with
+    no OFFSET however deep the client goes. The total count is cached per
+    user, filter set and data version so `total_pages` stays exact without
+    a `COUNT(*)` on every page.
+    """
+
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 25
+    ordering = ('-date', '-id')
+    count_cache_timeout = 60 * 60
+    ignored_count_params = ('cursor', 'page_size', 'pagination')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.setup(queryset, request, view)
+        self.count = self.get_count(queryset, request)
+        return self.set_page(list(self.get_page_queryset(queryset)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` for async views, querying via the async ORM."""
+        self.setup(queryset, request, view)
+        self.count = await sync_to_async(self.get_count)(queryset, request)
+        return self.set_page([row async for row in self.get_page_queryset(queryset)])
+
+    def setup(self, queryset, request, view):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+    def get_page_queryset(self, queryset):
+        """One row past the page, after the cursor position."""
+        ordering = self.ordering
+        if self.cursor is not None and self.cursor.reverse:
+            ordering = _reverse_ordering(ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(queryset.model, ordering, self.cursor.position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        reverse = self.cursor is not None and self.cursor.reverse
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        ordering = list(ordering or self.ordering)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            # Tiebreak on id in the direction of the leading key.
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return tuple(ordering)
+
+    def get_position_filter(self, model, ordering, position):
+        """Match rows strictly after `position` in the given ordering."""
+        values = position.split(',') if position else []
+        if len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            # Cursors come from the client; a tampered position must not
+            # reach the query.
+            model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            try:
+                value = model_field.to_python(value)
+            except (ValidationError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_position(self, instance):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(str(value))
+        return ','.join(values)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        cursor = Cursor(offset=0, reverse=False,
+                        position=self.get_position(self.page[-1]))
+        return self.encode_cursor(cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        cursor = Cursor(offset=0, reverse=True,
+                        position=self.get_position(self.page[0]))
+        return self.encode_cursor(cursor)
+
+    def get_count(self, queryset, request):
+        params = sorted(
+            (key, value) for key, values in request.query_params.lists()
+            if key not in self.ignored_count_params for value in values
+        )
+        version = get_data_version(request.user.id)
+        digest = hashlib.md5(repr((params, version)).encode()).hexdigest()
+        key = f'expense:count:{request.user.id}:{digest}'
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'total_pages': math.ceil(self.count / self.page_size) if self.page_size else 1,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
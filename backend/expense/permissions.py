@@ -4,4 +4,4 @@ from rest_framework.permissions import BasePermission
 class IsOwner(BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        return obj.user.id == request.user.id
+        return obj.user_id == request.user.id
@@ -0,0 +1,64 @@
+"""
+Recurring expense schedules.
+
+A schedule is an RRULE (RFC 5545) evaluated from its `start_date`. Its
+`next_date` is a persisted watermark: every occurrence before it has been
+created, so materializing is idempotent and an interrupted run resumes
+where it stopped.
+"""
+from datetime import date, datetime, time
+from dateutil.rrule import rrule, rrulestr
+
+
+# Occurrences created per schedule and batch; a schedule further behind
+# stays due and catches up in the following batches.
+MAX_OCCURRENCES = 1000
+
+FREQUENCIES = {'YEARLY', 'MONTHLY', 'WEEKLY', 'DAILY'}
+# Parts that repeat a rule within a day.
+TIME_PARTS = {'BYHOUR', 'BYMINUTE', 'BYSECOND'}
+
+
+def parse_rule(rule: str, start_date: date) -> rrule:
+    """
+    :raises ValueError: If `rule` is not a single daily or coarser RRULE
+    """
+    value = rule.strip().removeprefix('RRULE:')
+    if not value or ':' in value or '\n' in value:
+        raise ValueError("Provide a single RRULE such as FREQ=MONTHLY;BYMONTHDAY=1")
+    try:
+        parsed = rrulestr(value, dtstart=datetime.combine(start_date, time()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError(f"Invalid rule: {exc}")
+    parts = dict(part.partition('=')[::2] for part in value.upper().split(';'))
+    if parts.get('FREQ') not in FREQUENCIES or TIME_PARTS & parts.keys():
+        raise ValueError("Rules can repeat at most daily")
+    return parsed
+
+
+def first_date(rule: rrule, start_date: date, after: date | None) -> date | None:
+    """
+    The first occurrence after `after`, or the first one from `start_date`
+    if None.
+    """
+    if after is None:
+        occurrence = rule.after(datetime.combine(start_date, time()), inc=True)
+    else:
+        occurrence = rule.after(datetime.combine(after, time()))
+    return occurrence and occurrence.date()
+
+
+def due_dates(schedule, through: date) -> tuple[list[date], date | None]:
+    """
+    The schedule's occurrences from its `next_date` to `through`, at most
+    `MAX_OCCURRENCES`, and the occurrence after them.
+    """
+    rule = parse_rule(schedule.rule, schedule.start_date)
+    dates = []
+    for occurrence in rule.xafter(datetime.combine(schedule.next_date, time()), inc=True):
+        day = occurrence.date()
+        if day > through or len(dates) == MAX_OCCURRENCES:
+            return dates, day
+        dates.append(day)
+    # The rule ends before `through`.
+    return dates, None
@@ -1,50 +1,265 @@
+from decimal import Decimal
 from rest_framework import serializers
 from rest_framework.validators import ValidationError
-from .models import Category, Expense
+from django.db import transaction
+from django.utils.timezone import localdate
+from .models import Budget, Category, Expense, RecurringExpense
+from .derived import ExpenseDeltas, apply_deltas
+from .budgets import get_spends, period_bounds
+from .recurring import first_date, parse_rule
+from .currencies import to_base
+from .caches import get_base_currency, get_categories, get_category_ids
+from .filters import ExpenseFilter
+from utils.validators import validate_currency
 
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = '__all__'
+        exclude = ['updated_at']
         read_only_fields = ['id', 'user']
 
     def create(self, validated_data):
-        user = self.context['request'].user
+        request = self.context['request']
+        user_id = request.user.id
         category_name = validated_data['name']
-        if Category.objects.filter(name__iexact=category_name, user=user).exists():
+        existing = {name.lower() for _, name in get_categories(user_id, request)}
+        if category_name.lower() in existing:
             raise ValidationError("Category already exists")
-        return Category.objects.create(name=category_name, user=user)
+        return Category.objects.create(name=category_name, user_id=user_id)
+
+
+class CategoryMergeSerializer(serializers.Serializer):
+    """Categories whose expenses move to the target before they are deleted."""
+    categories = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False,
+        max_length=100)
 
 
 class ExpenseSerializer(serializers.ModelSerializer):
+    """
+    An expense in any currency, defaulting to the user's base currency,
+    with its amount converted to the base currency at its date.
+    """
     category = serializers.CharField()
+    currency = serializers.CharField(required=False, validators=[validate_currency])
 
     class Meta:
         model = Expense
-        fields = '__all__'
-        read_only_fields = ['id', 'user']
+        exclude = ['updated_at']
+        read_only_fields = ['id', 'user', 'base_amount']
 
     def validate(self, attrs):
         request = self.context.get('request')
         if 'category' in attrs:
-            try:
-                category = Category.objects.get(
-                    name=attrs['category'], user=request.user)
-                attrs['category'] = category
-            except Category.DoesNotExist:
+            name = attrs['category']
+            category_id = get_category_ids(request.user.id, request).get(name)
+            if category_id is None:
                 raise ValidationError("Category doesn't exist")
+            # Built from the cache; assigning it as the FK needs no query.
+            attrs['category'] = Category(
+                id=category_id, name=name, user_id=request.user.id)
+        base = get_base_currency(request.user.id, request)
+        if self.instance is None:
+            attrs.setdefault('currency', base)
+        try:
+            attrs['base_amount'] = to_base(
+                attrs.get('amount', getattr(self.instance, 'amount', None)),
+                attrs.get('currency', getattr(self.instance, 'currency', None)),
+                base,
+                attrs.get('date') or getattr(self.instance, 'date', None) or localdate())
+        except ValueError as exc:
+            raise ValidationError(str(exc))
         return super().validate(attrs)
 
     def create(self, validated_data):
-        validated_data['user'] = self.context['request'].user
-        return Expense.objects.create(**validated_data)
+        validated_data['user_id'] = self.context['request'].user.id
+        deltas = ExpenseDeltas()
+        with transaction.atomic():
+            expense = Expense.objects.create(**validated_data)
+            deltas.add_expense(expense)
+            apply_deltas(deltas)
+        return expense
 
     def update(self, instance, validated_data):
+        deltas = ExpenseDeltas()
+        deltas.add_expense(instance, sign=-1)
         instance.category = validated_data.get('category', instance.category)
         instance.amount = validated_data.get('amount', instance.amount)
+        instance.currency = validated_data.get('currency', instance.currency)
+        instance.base_amount = validated_data['base_amount']
         instance.description = validated_data.get(
             'description', instance.description)
         instance.date = validated_data.get('date', instance.date)
-        instance.save()
+        deltas.add_expense(instance)
+        with transaction.atomic():
+            instance.save()
+            apply_deltas(deltas)
+        return instance
+
+
+class RecurringExpenseSerializer(serializers.ModelSerializer):
+    """
+    An expense repeated on an RRULE schedule. Changing the rule or start
+    date reschedules it from after the last occurrence already created.
+    """
+    category = serializers.CharField()
+    currency = serializers.CharField(required=False, validators=[validate_currency])
+
+    class Meta:
+        model = RecurringExpense
+        fields = ['id', 'category', 'amount', 'currency', 'description', 'rule',
+                  'start_date', 'last_date', 'next_date', 'user']
+        read_only_fields = ['id', 'user', 'last_date', 'next_date']
+
+    def validate(self, attrs):
+        request = self.context['request']
+        if 'category' in attrs:
+            name = attrs['category']
+            category_id = get_category_ids(request.user.id, request).get(name)
+            if category_id is None:
+                raise ValidationError("Category doesn't exist")
+            attrs['category'] = Category(
+                id=category_id, name=name, user_id=request.user.id)
+        try:
+            start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+            rule = parse_rule(attrs.get('rule', getattr(self.instance, 'rule', None)), start_date)
+        except ValueError as exc:
+            raise ValidationError(str(exc))
+        attrs['next_date'] = first_date(rule, start_date, getattr(self.instance, 'last_date', None))
+        if self.instance is None and attrs['next_date'] is None:
+            raise ValidationError("The rule has no occurrences")
+        base = get_base_currency(request.user.id, request)
+        if self.instance is None:
+            attrs.setdefault('currency', base)
+        if attrs['next_date'] is not None:
+            # Rates are never removed, so later occurrences convert too.
+            try:
+                to_base(
+                    Decimal('0'), attrs.get('currency', getattr(self.instance, 'currency', None)),
+                    base, attrs['next_date'])
+            except ValueError as exc:
+                raise ValidationError(str(exc))
+        return attrs
+
+
+class ExpenseBulkSerializer(serializers.Serializer):
+    """
+    A bulk operation on the expenses selected by `ids`, by `filter`, a
+    mapping of `ExpenseFilter` parameters as accepted by the list, or on
+    every expense of the user with `"all": true`.
+    """
+    action = serializers.ChoiceField(
+        choices=['delete', 'recategorize', 'shift_dates'])
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False,
+        allow_empty=False, max_length=10000)
+    filter = serializers.DictField(
+        child=serializers.CharField(), required=False, allow_empty=False)
+    all = serializers.BooleanField(required=False, default=False)
+    category = serializers.CharField(required=False)
+    days = serializers.IntegerField(
+        required=False, min_value=-3650, max_value=3650)
+
+    def validate_filter(self, value):
+        # The filter set ignores keys it doesn't know, so a typo would
+        # select every expense.
+        unknown = sorted(set(value) - set(ExpenseFilter.base_filters))
+        if unknown:
+            raise ValidationError(f"Unknown filters: {', '.join(unknown)}")
+        return value
+
+    def validate(self, attrs):
+        request = self.context['request']
+        if ('ids' in attrs) + ('filter' in attrs) + attrs['all'] != 1:
+            raise ValidationError("Provide exactly one of ids, filter or all")
+        if attrs['action'] == 'recategorize':
+            if 'category' not in attrs:
+                raise ValidationError("Provide the category to move the expenses to")
+            category_id = get_category_ids(request.user.id, request).get(attrs['category'])
+            if category_id is None:
+                raise ValidationError("Category doesn't exist")
+            attrs['category_id'] = category_id
+        if attrs['action'] == 'shift_dates' and not attrs.get('days'):
+            raise ValidationError("Provide a non-zero number of days to shift by")
+        return attrs
+
+
+class BudgetSerializer(serializers.ModelSerializer):
+    """
+    A budget, for one category by name or overall (null), with what was
+    spent in its current period. The spent amounts come from the `spends`
+    context mapping built by `get_spends` when listing many budgets.
+    """
+    category = serializers.CharField(allow_null=True, required=False, default=None)
+
+    class Meta:
+        model = Budget
+        fields = ['id', 'category', 'period', 'amount', 'threshold', 'user']
+        read_only_fields = ['id', 'user']
+
+    def validate(self, attrs):
+        request = self.context['request']
+        if attrs.get('category') is not None:
+            category_id = get_category_ids(request.user.id, request).get(attrs['category'])
+            if category_id is None:
+                raise ValidationError("Category doesn't exist")
+            attrs['category'] = Category(
+                id=category_id, name=attrs['category'], user_id=request.user.id)
+        category = attrs['category'] if 'category' in attrs else self.instance.category
+        period = attrs.get('period') or (self.instance.period if self.instance else 'monthly')
+        budgets = Budget.objects.filter(user_id=request.user.id, category=category, period=period)
+        if self.instance is not None:
+            budgets = budgets.exclude(pk=self.instance.pk)
+        if budgets.exists():
+            raise ValidationError("Budget already exists")
+        return attrs
+
+    def update(self, instance, validated_data):
+        scope = (instance.category_id, instance.period)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if (instance.category_id, instance.period) != scope:
+                # The counters summed another category or period.
+                instance.spends.all().delete()
         return instance
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        spends = self.context.get('spends') or get_spends([instance])
+        spent = spends[instance.id]
+        period_start, period_end = period_bounds(instance.period, localdate())
+        data.update({
+            'period_start': period_start,
+            'period_end': period_end,
+            'spent': f'{spent:.2f}',
+            'remaining': f'{instance.amount - spent:.2f}',
+            'percent': round(float(spent * 100 / instance.amount), 1),
+        })
+        return data
+
+
+class ExpenseRowSerializer(serializers.BaseSerializer):
+    """
+    Read-only `ExpenseSerializer` output for `values_list(*fields)` rows.
+
+    Skips model instances and per-row field binding, and takes category
+    names from the `categories` context mapping (id to name) instead of
+    loading each row's category. Dates are left to the renderer.
+    """
+    fields = ('id', 'category_id', 'amount', 'currency', 'base_amount',
+              'description', 'date', 'user_id')
+
+    def to_representation(self, row):
+        id, category_id, amount, currency, base_amount, description, date, user_id = row
+        return {
+            'id': id,
+            # None if the category was deleted since the row was read.
+            'category': self.context['categories'].get(category_id),
+            'amount': f'{amount:f}',
+            'currency': currency,
+            'base_amount': f'{base_amount:f}',
+            'description': description,
+            'date': date,
+            'user': user_id,
+        }
@@ -0,0 +1,157 @@
+"""
+Spending statistics computed column-wise with NumPy.
+
+The user's expenses are read once as four arrays (id, category, day,
+amount in the base currency) and every statistic is derived from them with array operations,
+so the cost per row is a few machine operations rather than Python
+object work.
+"""
+from typing import NamedTuple
+import numpy as np
+from django.db import connections
+
+
+PERCENTILES = (25, 50, 75, 90, 95)
+ROLLING_WINDOWS = (7, 30)
+
+
+class ExpenseColumns(NamedTuple):
+    ids: np.ndarray
+    categories: np.ndarray
+    days: np.ndarray
+    amounts: np.ndarray
+
+
+def load_columns(queryset) -> ExpenseColumns:
+    """
+    Read an expense queryset as columns through a raw cursor, skipping
+    model instances and per-value field converters.
+    """
+    queryset = queryset.order_by().values_list('id', 'category_id', 'date', 'base_amount')
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    ids, categories, days, amounts = zip(*rows) if rows else ((), (), (), ())
+    return ExpenseColumns(
+        np.array(ids, dtype=np.int64),
+        np.array(categories, dtype=np.int64),
+        np.array(days, dtype='datetime64[D]'),
+        np.array(amounts, dtype=np.float64),
+    )
+
+
+def _floats(values) -> list:
+    """Round to cents for output; NaN (no value) becomes None."""
+    return [None if value != value else value for value in np.round(values, 2).tolist()]
+
+
+def _dates(values) -> list:
+    return values.astype('datetime64[D]').tolist()
+
+
+def _rows(table: dict) -> list[dict]:
+    """Turn a mapping of equally long columns into a list of rows."""
+    return [dict(zip(table, row)) for row in zip(*table.values())]
+
+
+def category_stats(columns: ExpenseColumns, names: dict, z_threshold: float, max_outliers: int):
+    """
+    Count, mean, standard deviation and percentiles of expense amounts per
+    category, and the expenses whose amount lies more than `z_threshold`
+    standard deviations from their category's mean, largest first.
+    """
+    category_ids, group = np.unique(columns.categories, return_inverse=True)
+    counts = np.bincount(group)
+    means = np.bincount(group, weights=columns.amounts) / counts
+    squares = np.bincount(group, weights=columns.amounts ** 2) / counts
+    stds = np.sqrt(np.maximum(squares - means ** 2, 0))
+
+    # Sorting by (category, amount) puts each category's amounts in one
+    # ascending run; percentiles interpolate linearly inside the run.
+    ordered = columns.amounts[np.lexsort((columns.amounts, group))]
+    starts = np.cumsum(counts) - counts
+    percentiles = {}
+    for q in PERCENTILES:
+        position = starts + (counts - 1) * q / 100
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        percentiles[f'p{q}'] = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+    spread = stds[group]
+    z_scores = np.divide(columns.amounts - means[group], spread,
+                         out=np.zeros_like(spread), where=spread > 0)
+    flagged = np.flatnonzero(np.abs(z_scores) > z_threshold)
+    flagged = flagged[np.argsort(-np.abs(z_scores[flagged]), kind='stable')][:max_outliers]
+
+    categories = _rows({
+        'category_name': [names[id] for id in category_ids.tolist()],
+        'count': counts.tolist(),
+        'mean': _floats(means),
+        'std': _floats(stds),
+        **{key: _floats(values) for key, values in percentiles.items()},
+    })
+    categories.sort(key=lambda row: row['category_name'])
+    outliers = _rows({
+        'id': columns.ids[flagged].tolist(),
+        'date': _dates(columns.days[flagged]),
+        'category_name': [names[id] for id in columns.categories[flagged].tolist()],
+        'amount': _floats(columns.amounts[flagged]),
+        'z_score': _floats(z_scores[flagged]),
+    })
+    return categories, outliers
+
+
+def daily_stats(columns: ExpenseColumns):
+    """
+    Total per calendar day from the first to the last expense, with
+    trailing averages over `ROLLING_WINDOWS` days. Days without expenses
+    count as zero; the first days average over the days available.
+    """
+    first = columns.days.min()
+    offsets = (columns.days - first).astype(np.int64)
+    totals = np.bincount(offsets, weights=columns.amounts)
+    running = np.concatenate(([0.0], np.cumsum(totals)))
+    ends = np.arange(1, len(totals) + 1)
+    daily = {'day': _dates(first + np.arange(len(totals))), 'total': _floats(totals)}
+    for window in ROLLING_WINDOWS:
+        starts = np.maximum(ends - window, 0)
+        daily[f'avg_{window}'] = _floats((running[ends] - running[starts]) / (ends - starts))
+    return _rows(daily)
+
+
+def monthly_stats(columns: ExpenseColumns):
+    """Total per month with the change from the month before."""
+    months = columns.days.astype('datetime64[M]')
+    first = months.min()
+    totals = np.bincount((months - first).astype(np.int64), weights=columns.amounts)
+    previous = np.concatenate(([np.nan], totals[:-1]))
+    change = totals - previous
+    change_pct = np.divide(change * 100, previous,
+                           out=np.full_like(totals, np.nan), where=previous > 0)
+    return _rows({
+        'month': _dates(first + np.arange(len(totals))),
+        'total': _floats(totals),
+        'change': _floats(change),
+        'change_pct': _floats(change_pct),
+    })
+
+
+def spending_stats(columns: ExpenseColumns, names: dict,
+                   z_threshold: float = 3.0, max_outliers: int = 50) -> dict:
+    """
+    :param columns: The expenses to describe
+    :param names: Mapping of category id to name
+    :param z_threshold: Flag amounts more than this many standard
+        deviations from their category's mean
+    :param max_outliers: Return at most this many flagged expenses
+    """
+    if not len(columns.ids):
+        return {'categories': [], 'daily': [], 'monthly': [], 'outliers': []}
+    categories, outliers = category_stats(columns, names, z_threshold, max_outliers)
+    return {
+        'categories': categories,
+        'daily': daily_stats(columns),
+        'monthly': monthly_stats(columns),
+        'outliers': outliers,
+    }
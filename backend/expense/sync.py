@@ -0,0 +1,65 @@
+"""
+Change tracking for incremental sync.
+
+`Expense` and `Category` rows carry an `updated_at` stamp. `save()` keeps
+it current through `auto_now`; write paths that use `update()` must set
+it themselves. Deleted rows leave a `Tombstone`, which every delete path
+records with `record_deletions` in its own transaction.
+
+A sync token is the server time at which a sync started. The next sync
+returns rows stamped within `SYNC_OVERLAP` before the token, because
+writes still in flight when the token was issued may commit with an
+earlier stamp. Applying a change twice is harmless on the client.
+"""
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .models import Tombstone
+
+
+SYNC_OVERLAP = timedelta(minutes=1)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "This sync token has expired. Fetch everything again."
+    default_code = 'sync_token_expired'
+
+
+def make_token(moment: datetime) -> str:
+    return str((moment - _EPOCH) // timedelta(microseconds=1))
+
+
+def parse_token(token: str) -> datetime:
+    """
+    The time a token was issued at.
+
+    :raises ValueError: If the token is malformed
+    :raises SyncTokenExpired: If tombstones since then may have been pruned
+    """
+    if not token.isdigit():
+        raise ValueError("Invalid sync token")
+    issued = _EPOCH + timedelta(microseconds=int(token))
+    if issued < tombstone_cutoff():
+        raise SyncTokenExpired()
+    return issued
+
+
+def tombstone_cutoff() -> datetime:
+    """Tombstones older than this may have been pruned."""
+    return now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+
+
+def record_deletions(queryset):
+    """
+    Leave a tombstone for each row of an `Expense` or `Category`
+    queryset. Call it before deleting the rows, in the same transaction.
+    """
+    model = queryset.model._meta.model_name
+    rows = queryset.order_by().values_list('user_id', 'id')
+    Tombstone.objects.bulk_create(
+        [Tombstone(user_id=user_id, model=model, object_id=id) for user_id, id in rows],
+        batch_size=5000)
@@ -1,3 +1,882 @@
-from django.test import TestCase
+import base64
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from urllib.parse import urlencode
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.models import Count, Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.timezone import localdate, now
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+from account.models import User
+from utils import renderers
+from utils.routers import ReplicaRouter, ReplicaRouting, start_routing, sticky_key, stop_routing
+from utils.testing import QueryBudgetMixin
+from . import async_views
+from .analytics import Dashboard, get_category_names
+from .budgets import period_bounds
+from .currencies import import_rates
+from .exports import parquet_available
+from .forecasts import add_months, get_models
+from .imports import ExpenseImporter
+from .models import (
+    Budget, BudgetAlert, BudgetSpend, Category, DailyExpenseRollup, Expense, RecurringExpense
+)
+from .views import ExpenseChanges, ExpenseExportView
 
-# Create your tests here.
+
+# Every process of the test run shares its in-memory cache.
+@override_settings(CACHE_IS_SHARED=True)
+class ExpenseTestCase(QueryBudgetMixin, TestCase):
+    """A user with the categories Food and Rent, and a client signed in as them."""
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='jane@example.com', password='Secret-pass-1', first_name='Jane')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.rent = Category.objects.create(user=self.user, name='Rent')
+
+    def request(self, method, path, data=None, **extra):
+        """Make a request and run the cache invalidations its commit queued."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(path, data, format='json', **extra)
+
+    def add_expense(self, amount, category='Food', day=None, **fields):
+        response = self.request('post', '/api/expenses/', {
+            'amount': amount, 'category': category,
+            'date': (day or localdate()).isoformat(), **fields})
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def bulk(self, **data):
+        return self.request('post', '/api/expenses/bulk', data)
+
+    def assertRollupsMatch(self):
+        """The rollups hold the same totals as summing the expenses."""
+        rollups = {
+            (row.category_id, row.date): (row.total_expenses, row.total_amount)
+            for row in DailyExpenseRollup.objects.filter(user=self.user)
+        }
+        expenses = {
+            (row['category_id'], row['date']): (row['count'], row['amount'])
+            for row in Expense.objects.filter(user=self.user).order_by().values(
+                'category_id', 'date').annotate(count=Count('id'), amount=Sum('base_amount'))
+        }
+        self.assertEqual(rollups, expenses)
+
+
+class RollupTest(ExpenseTestCase):
+    """Every write path keeps the daily rollups in step with the expenses."""
+
+    def test_create_update_delete(self):
+        lunch = self.add_expense('10.50')
+        self.add_expense('5', day=date(2024, 1, 3))
+        self.assertRollupsMatch()
+
+        response = self.request('put', f"/api/expenses/{lunch['id']}/", {
+            'amount': '20', 'category': 'Rent', 'date': '2024-01-03'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertRollupsMatch()
+
+        response = self.request('delete', f"/api/expenses/{lunch['id']}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertRollupsMatch()
+
+    def test_bulk_update(self):
+        ids = [self.add_expense(str(day), day=date(2024, 1, day))['id'] for day in range(1, 6)]
+
+        response = self.bulk(action='recategorize', ids=ids[:2], category='Rent')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertRollupsMatch()
+
+        response = self.bulk(action='shift_dates', filter={'min_amount': '3'}, days=30)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(Expense.objects.filter(date__month=2).count(), 3)
+        self.assertRollupsMatch()
+
+        response = self.bulk(action='delete', filter={'category': 'Rent'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(Expense.objects.count(), 3)
+        self.assertRollupsMatch()
+
+    def test_merge(self):
+        self.add_expense('10', day=date(2024, 1, 1))
+        self.add_expense('20', 'Rent', day=date(2024, 1, 1))
+        self.add_expense('30', 'Rent', day=date(2024, 1, 2))
+        budget = Budget.objects.create(user=self.user, category=self.rent, amount=100)
+
+        response = self.request(
+            'post', f'/api/expenses/categories/{self.food.id}/merge/', {'categories': [self.rent.id]})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['data']['moved_expenses'], 2)
+        self.assertFalse(Category.objects.filter(pk=self.rent.id).exists())
+        self.assertRollupsMatch()
+        # The budget follows its expenses.
+        budget.refresh_from_db()
+        self.assertEqual(budget.category_id, self.food.id)
+
+    def test_merge_rejects_clashing_budgets(self):
+        travel = Category.objects.create(user=self.user, name='Travel')
+        Budget.objects.create(user=self.user, category=self.food, amount=100)
+        Budget.objects.create(user=self.user, category=travel, amount=50)
+
+        response = self.request(
+            'post', f'/api/expenses/categories/{self.food.id}/merge/', {'categories': [travel.id]})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Category.objects.filter(pk=travel.id).exists())
+        self.assertEqual(Budget.objects.count(), 2)
+
+
+class QueryBudgetTest(ExpenseTestCase):
+    """Listing and analytics stay within their query budgets however much data there is."""
+
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 29):
+            self.add_expense(str(day), 'Food' if day % 2 else 'Rent', day=date(2024, 2, day))
+
+    def test_list(self):
+        for params in ('', '?pagination=cursor', '?ordering=amount&min_amount=5',
+                       '?search=Rent'):
+            response = self.client.get(f'/api/expenses/{params}')
+            self.assertEqual(response.status_code, 200)
+            self.assertQueryBudget(response, 3)
+
+    def get_analytics(self, path):
+        # The second request is answered from the response cache.
+        for _ in range(2):
+            response = self.client.get(f'/api/expenses/{path}')
+            self.assertEqual(response.status_code, 200, path)
+        return response.data
+
+    def test_analytics(self):
+        summary = self.get_analytics('data')
+        self.assertEqual((summary['total_expenses'], summary['total_amount']), (28, 406))
+        self.assertEqual((summary['total_expenses_month'], summary['total_expenses_by_category']), (0, []))
+
+        daily = self.get_analytics('data/daily?date=2024-02')
+        self.assertEqual(len(daily), 28)
+        self.assertEqual(daily[4], {'day': date(2024, 2, 5), 'total_expenses': 1, 'total_amount': 5})
+        self.assertEqual(self.get_analytics('data/daily?date=2024-03'), [])
+
+        self.assertEqual(self.get_analytics('data/monthly?year=2024'), [
+            {'month': date(2024, 2, 1), 'total_expenses': 28, 'total_amount': 406}])
+        self.assertEqual(self.get_analytics('data/by-category'), [
+            {'category__name': 'Food', 'total_expenses': 14, 'total_amount': 196},
+            {'category__name': 'Rent', 'total_expenses': 14, 'total_amount': 210}])
+
+        by_date = self.get_analytics('data/by-date?start_date=2024-02-10&end_date=2024-02-12')
+        self.assertEqual([(row['date'], row['total_amount']) for row in by_date], [
+            (date(2024, 2, 10), 10), (date(2024, 2, 11), 11), (date(2024, 2, 12), 12)])
+
+
+class AsyncViewTest(ExpenseTestCase):
+    """The async views `ASYNC_API` wires in answer like the sync views."""
+    views = {
+        '?ordering=date': async_views.AsyncExpenseViewSet.as_view({'get': 'list'}),
+        'data': async_views.AsyncExpenseData.as_view(),
+        'data/dashboard?panels=summary,monthly,by_category&year=2024': async_views.AsyncExpenseDashboard.as_view(),
+        'data/daily?date=2024-02': async_views.AsyncDailyExpenseSummary.as_view(),
+        'data/monthly?year=2024': async_views.AsyncMonthlyExpenseTrend.as_view(),
+        'data/by-date?start_date=2024-02-01&end_date=2024-02-10': async_views.AsyncExpenseByDateRange.as_view(),
+        'data/by-category': async_views.AsyncCategoryWiseExpenseDistribution.as_view(),
+    }
+
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 6):
+            self.add_expense(f'{day}.25', 'Food' if day % 2 else 'Rent', day=date(2024, 2, day))
+
+    def get_async(self, path, view, **extra):
+        request = APIRequestFactory().get(f'/api/expenses/{path}', **{
+            'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}', **extra})
+        return async_to_sync(view)(request)
+
+    def test_views(self):
+        for path, view in self.views.items():
+            expected = self.client.get(f'/api/expenses/{path}')
+            response = self.get_async(path, view)
+            self.assertEqual(response.status_code, 200, path)
+            data = response.data if isinstance(response.data, dict) else list(response.data)
+            self.assertEqual(data, expected.data if isinstance(expected.data, dict) else list(expected.data), path)
+
+    def test_errors(self):
+        view = self.views['data/daily?date=2024-02']
+        self.assertEqual(self.get_async('data/daily?date=Feb', view).status_code, 400)
+        self.assertEqual(self.get_async('data/daily', view, HTTP_AUTHORIZATION='').status_code, 401)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRoutingTest(ExpenseTestCase):
+    """Opted-in reads go to one replica per request, except for users who just wrote."""
+
+    def routing(self, read_replica=True):
+        request = mock.Mock(user=self.user)
+        routing = ReplicaRouting(request)
+        routing.read_replica = read_replica
+        return routing
+
+    def test_read_replica(self):
+        # Outside of the test's transaction.
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertIsNone(self.routing(read_replica=False).db_for_read())
+            routing = self.routing()
+            alias = routing.db_for_read()
+            self.assertIn(alias, ['replica1', 'replica2'])
+            self.assertEqual({routing.db_for_read() for _ in range(10)}, {alias})
+
+            anonymous = ReplicaRouting(mock.Mock(user=None))
+            anonymous.read_replica = True
+            self.assertIsNone(anonymous.db_for_read())
+        self.assertIsNone(self.routing().db_for_read())
+
+    def test_sticky_after_write(self):
+        routing = self.routing()
+        token = start_routing(routing)
+        try:
+            self.assertEqual(ReplicaRouter().db_for_write(Expense), DEFAULT_DB_ALIAS)
+        finally:
+            stop_routing(token)
+        self.assertTrue(routing.wrote)
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertIsNone(routing.db_for_read())
+            routing.finish()
+            self.assertEqual(self.routing().db_for_read(), DEFAULT_DB_ALIAS)
+            cache.delete(sticky_key(self.user.id))
+            self.assertIn(self.routing().db_for_read(), ['replica1', 'replica2'])
+
+    def test_middleware(self):
+        response = self.client.get('/api/expenses/')
+        self.assertTrue(response.wsgi_request.replica_routing.read_replica)
+        response = self.client.get('/api/expenses/budgets/')
+        self.assertFalse(response.wsgi_request.replica_routing.read_replica)
+        self.assertIsNone(cache.get(sticky_key(self.user.id)))
+
+        self.add_expense('5')
+        self.assertTrue(cache.get(sticky_key(self.user.id)))
+
+
+class ResponseCacheTest(ExpenseTestCase):
+    """Analytics responses are cached per data version and revalidated with their ETag."""
+
+    def setUp(self):
+        super().setUp()
+        self.add_expense('12.50')
+
+    def test_not_modified(self):
+        response = self.client.get('/api/expenses/data')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        etag = response['ETag']
+
+        response = self.client.get('/api/expenses/data', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.metrics.queries, 0)
+        other = self.client.get('/api/expenses/data/daily', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(other.status_code, 200)
+
+        # A write changes the user's data version, and with it the ETag.
+        self.add_expense('5')
+        response = self.client.get('/api/expenses/data', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['total_amount'], Decimal('17.50'))
+
+    def test_cache_hit(self):
+        first = self.client.get('/api/expenses/data/by-category')
+        second = self.client.get('/api/expenses/data/by-category')
+        self.assertEqual(second.metrics.queries, 0)
+        self.assertEqual(second.data, list(first.data))
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    @override_settings(CACHE_IS_SHARED=False)
+    def test_unshared_cache(self):
+        self.client.get('/api/expenses/data/by-category')
+        response = self.client.get('/api/expenses/data/by-category')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(response.metrics.queries, 1)
+
+
+class DashboardTest(ExpenseTestCase):
+    """The dashboard's panels match the standalone analytics endpoints."""
+
+    def setUp(self):
+        super().setUp()
+        today = localdate()
+        self.last_month = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+        self.add_expense('12.50', day=today)
+        self.add_expense('800', 'Rent', day=today)
+        self.add_expense('7.25', day=self.last_month)
+
+    def test_panels(self):
+        month = self.last_month.strftime('%Y-%m')
+        year = self.last_month.year
+        standalone = {
+            'summary': 'data',
+            'daily': f'data/daily?date={month}',
+            'monthly': f'data/monthly?year={year}',
+            'by_date': f'data/by-date?start_date={self.last_month}&end_date={localdate()}',
+            'by_category': 'data/by-category',
+        }
+        response = self.client.get(
+            f'/api/expenses/data/dashboard?panels={",".join(standalone)}&date={month}&year={year}'
+            f'&start_date={self.last_month}&end_date={localdate()}')
+        self.assertEqual(response.status_code, 200)
+        self.assertQueryBudget(response, 2)
+        for panel, path in standalone.items():
+            # Compared as data: SQLite sums come back without trailing zeros.
+            expected = self.client.get(f'/api/expenses/{path}').data
+            self.assertEqual(response.data[panel], expected if panel == 'summary' else list(expected),
+                             panel)
+
+    def test_default_panels(self):
+        response = self.client.get('/api/expenses/data/dashboard')
+        self.assertEqual(list(response.data), list(Dashboard.default_panels))
+        self.assertEqual(response.data['summary']['total_expenses'], 3)
+        self.assertEqual(response.data['summary']['total_expenses_month'], 2)
+
+    def test_unknown_panel(self):
+        response = self.client.get('/api/expenses/data/dashboard?panels=summary,weekly')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('weekly', response.data['message'])
+
+
+class StatsTest(ExpenseTestCase):
+    """Spending statistics over the user's expenses."""
+
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 10):
+            self.add_expense('10', day=date(2024, 1, day))
+        self.big = self.add_expense('100', day=date(2024, 1, 10))
+        self.add_expense('800', 'Rent', day=date(2024, 1, 1))
+        self.add_expense('900', 'Rent', day=date(2024, 2, 1))
+
+    def stats(self, **params):
+        response = self.client.get('/api/expenses/data/stats?' + urlencode(params))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_stats(self):
+        stats = self.stats(z=2)
+        food, rent = stats['categories']
+        self.assertEqual(
+            (food['category_name'], food['count'], food['mean'], food['std']), ('Food', 10, 19.0, 27.0))
+        self.assertEqual((food['p50'], food['p90']), (10.0, 19.0))
+        self.assertEqual((rent['count'], rent['mean'], rent['p25']), (2, 850.0, 825.0))
+
+        self.assertEqual(len(stats['daily']), 32)
+        self.assertEqual(stats['daily'][0], {'day': date(2024, 1, 1), 'total': 810.0,
+                                             'avg_7': 810.0, 'avg_30': 810.0})
+        self.assertEqual(stats['daily'][9]['avg_7'], 22.86)  # (6 * 10 + 100) / 7
+        self.assertEqual(stats['monthly'], [
+            {'month': date(2024, 1, 1), 'total': 990.0, 'change': None, 'change_pct': None},
+            {'month': date(2024, 2, 1), 'total': 900.0, 'change': -90.0, 'change_pct': -9.09},
+        ])
+        self.assertEqual(stats['outliers'], [{
+            'id': self.big['id'], 'date': date(2024, 1, 10), 'category_name': 'Food',
+            'amount': 100.0, 'z_score': 3.0}])
+        self.assertEqual(self.stats()['outliers'], [])
+
+    def test_date_range(self):
+        stats = self.stats(start_date='2024-02-01', end_date='2024-02-29')
+        self.assertEqual([row['category_name'] for row in stats['categories']], ['Rent'])
+        self.assertEqual(self.stats(start_date='2023-01-01', end_date='2023-01-31'),
+                         {'categories': [], 'daily': [], 'monthly': [], 'outliers': []})
+
+    def test_invalid_z(self):
+        for z in ('0', 'abc'):
+            response = self.client.get(f'/api/expenses/data/stats?z={z}')
+            self.assertEqual(response.status_code, 400)
+
+
+class ForecastTest(ExpenseTestCase):
+    """Forecasts project the complete months and keep their models cached."""
+
+    def setUp(self):
+        super().setUp()
+        self.start = localdate().replace(day=1)
+        for months in range(1, 7):
+            self.add_expense('100', day=add_months(self.start, -months))
+        # The current month is not complete and is left out.
+        self.add_expense('5000', day=localdate())
+
+    def forecast(self, **params):
+        return self.client.get('/api/expenses/data/forecast?' + urlencode(params))
+
+    def test_forecast(self):
+        response = self.forecast(months=3, interval=90)
+        self.assertEqual(response.status_code, 200)
+        [food] = response.data['categories']
+        self.assertEqual((food['category_name'], food['model'], food['history_months']),
+                         ('Food', 'exponential_smoothing', 6))
+        expected = [{'month': add_months(self.start, h), 'amount': 100.0, 'lower': 100.0, 'upper': 100.0}
+                    for h in range(3)]
+        self.assertEqual(food['forecast'], expected)
+        self.assertEqual(response.data['total'], expected)
+        self.assertEqual(response.data['interval'], 90)
+
+    def test_invalid_params(self):
+        for params in ({'months': 0}, {'months': 25}, {'months': 'x'}, {'interval': 85}):
+            self.assertEqual(self.forecast(**params).status_code, 400, params)
+
+    def test_cached_models(self):
+        get_models(self.user.id)
+        with self.assertNumQueries(0):
+            get_models(self.user.id)
+
+        # A completed month is folded into the cached models with one query.
+        next_month = add_months(self.start, 1)
+        with mock.patch('expense.forecasts.localdate', return_value=next_month), \
+                self.assertNumQueries(1):
+            start, models = get_models(self.user.id)
+        self.assertEqual(start, next_month)
+        self.assertEqual(models[self.food.id].months, 7)
+
+    def test_backdated_expense(self):
+        get_models(self.user.id)
+        self.add_expense('700', day=add_months(self.start, -1))
+        _, models = get_models(self.user.id)
+        self.assertGreater(models[self.food.id].level, 100)
+
+
+class BudgetTest(ExpenseTestCase):
+    """Budget counters follow the expense writes and queue alerts once per threshold."""
+
+    def setUp(self):
+        super().setUp()
+        self.budget = Budget.objects.create(user=self.user, amount=100, threshold=80)
+
+    def get_budget(self):
+        response = self.client.get(f'/api/expenses/budgets/{self.budget.id}/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_spend(self):
+        self.add_expense('30')
+        self.add_expense('15', 'Rent')
+        # Outside the current period.
+        self.add_expense('500', day=localdate() - timedelta(days=62))
+        self.assertEqual(self.get_budget()['spent'], '45.00')
+
+        category_budget = Budget.objects.create(user=self.user, category=self.rent, amount=40)
+        response = self.client.get('/api/expenses/budgets/')
+        self.assertEqual(response.status_code, 200)
+        spent = {row['id']: row['spent'] for row in response.data}
+        self.assertEqual(spent, {self.budget.id: '45.00', category_budget.id: '15.00'})
+
+    def test_fields(self):
+        self.add_expense('30')
+        self.add_expense('15', 'Rent')
+        budget = self.get_budget()
+        self.assertEqual((budget['spent'], budget['remaining'], budget['percent']), ('45.00', '55.00', 45.0))
+        self.assertEqual((budget['period_start'], budget['period_end']), period_bounds('monthly', localdate()))
+
+        self.add_expense('70')
+        budget = self.get_budget()
+        self.assertEqual((budget['remaining'], budget['percent']), ('-15.00', 115.0))
+
+    def test_period_bounds(self):
+        # A Saturday in a leap year's February.
+        self.assertEqual(period_bounds('monthly', date(2024, 2, 10)), (date(2024, 2, 1), date(2024, 2, 29)))
+        self.assertEqual(period_bounds('weekly', date(2024, 2, 10)), (date(2024, 2, 5), date(2024, 2, 11)))
+        self.assertEqual(period_bounds('monthly', date(2024, 12, 31)), (date(2024, 12, 1), date(2024, 12, 31)))
+
+    def test_reads_create_no_counters(self):
+        self.client.get('/api/expenses/budgets/')
+        self.get_budget()
+        self.assertFalse(BudgetSpend.objects.exists())
+
+    def test_alerts(self):
+        expense = self.add_expense('50')
+        self.assertFalse(BudgetAlert.objects.exists())
+
+        self.add_expense('35')
+        self.assertEqual(list(BudgetAlert.objects.values_list('threshold', flat=True)), [80])
+
+        self.add_expense('20')
+        self.assertEqual(
+            sorted(BudgetAlert.objects.values_list('threshold', flat=True)), [80, 100])
+
+        # Dropping below and crossing again queues nothing new.
+        self.request('delete', f"/api/expenses/{expense['id']}/")
+        self.add_expense('60')
+        self.assertEqual(BudgetAlert.objects.count(), 2)
+        self.assertEqual(self.get_budget()['spent'], '115.00')
+
+        response = self.client.get('/api/expenses/budgets/alerts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+
+class RecurringTest(ExpenseTestCase):
+    """Materializing recurring expenses is idempotent and resumes where it stopped."""
+
+    def materialize(self, through, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('materialize_recurring_expenses', '--date', through, *args,
+                         stdout=StringIO())
+
+    def test_materialize(self):
+        response = self.request('post', '/api/expenses/recurring/', {
+            'amount': '9.99', 'category': 'Food', 'rule': 'FREQ=WEEKLY', 'start_date': '2024-01-01'})
+        self.assertEqual(response.status_code, 201, response.data)
+
+        self.materialize('2024-01-31')
+        self.materialize('2024-01-31')
+        self.assertEqual(
+            list(Expense.objects.order_by('date').values_list('date', flat=True)),
+            [date(2024, 1, day) for day in (1, 8, 15, 22, 29)])
+        schedule = RecurringExpense.objects.get()
+        self.assertEqual(schedule.next_date, date(2024, 2, 5))
+
+        self.materialize('2024-02-12')
+        self.assertEqual(Expense.objects.count(), 7)
+        self.assertRollupsMatch()
+
+    def add_schedule(self, rule):
+        return self.request('post', '/api/expenses/recurring/', {
+            'amount': '1', 'category': 'Food', 'rule': rule, 'start_date': '2024-01-01'})
+
+    def test_rules(self):
+        for rule in ('BYDAY=MO', 'FREQ=DAILY\nFREQ=WEEKLY', 'FREQ=MONTHLY;BYMONTHDAY=40'):
+            self.assertEqual(self.add_schedule(rule).status_code, 400, rule)
+
+    def test_sub_daily_rules(self):
+        # Each would create several identical expenses on one date.
+        for rule in ('FREQ=HOURLY', 'FREQ=MINUTELY', 'FREQ=DAILY;BYHOUR=1,2,3',
+                     'FREQ=WEEKLY;BYMINUTE=0,30', 'freq=daily;bysecond=5'):
+            response = self.add_schedule(rule)
+            self.assertEqual(response.status_code, 400, rule)
+            self.assertEqual(response.data['message'], "Rules can repeat at most daily")
+        self.assertFalse(RecurringExpense.objects.exists())
+
+    def test_missing_rate_is_skipped(self):
+        RecurringExpense.objects.create(
+            user=self.user, category=self.food, amount=5, currency='CHF', rule='FREQ=DAILY',
+            start_date=date(2024, 1, 1), next_date=date(2024, 1, 1))
+        RecurringExpense.objects.create(
+            user=self.user, category=self.rent, amount=5, rule='FREQ=DAILY',
+            start_date=date(2024, 1, 1), next_date=date(2024, 1, 1))
+
+        self.materialize('2024-01-03')
+        self.assertEqual(Expense.objects.filter(category=self.rent).count(), 3)
+        skipped = RecurringExpense.objects.get(currency='CHF')
+        self.assertEqual(skipped.next_date, date(2024, 1, 1))
+
+    def test_batches(self):
+        for currency in ('CHF', 'USD', 'CHF', 'USD'):
+            RecurringExpense.objects.create(
+                user=self.user, category=self.food, amount=5, currency=currency,
+                rule='FREQ=DAILY', start_date=date(2024, 1, 1), next_date=date(2024, 1, 1))
+
+        # Schedules more occurrences behind than a batch takes catch up in
+        # later passes, past the ones without a rate.
+        with mock.patch('expense.recurring.MAX_OCCURRENCES', 2):
+            self.materialize('2024-01-05', '--batch-size', '1')
+        self.assertEqual(Expense.objects.count(), 10)
+        self.assertEqual(
+            sorted(RecurringExpense.objects.values_list('currency', 'next_date')),
+            [('CHF', date(2024, 1, 1))] * 2 + [('USD', date(2024, 1, 6))] * 2)
+        self.assertRollupsMatch()
+
+
+class CurrencyTest(ExpenseTestCase):
+    """Expenses, rollups and budgets are kept in the user's base currency."""
+
+    def setUp(self):
+        super().setUp()
+        # Quoted per euro.
+        import_rates([
+            ('USD', date(2024, 1, 1), Decimal('1.10')),
+            ('GBP', date(2024, 1, 1), Decimal('0.85')),
+        ], 'EUR')
+
+    def test_conversion(self):
+        expense = self.add_expense('85', currency='GBP', day=date(2024, 2, 1))
+        self.assertEqual(expense['base_amount'], '110.00')
+        self.assertRollupsMatch()
+
+        response = self.request('post', '/api/expenses/', {
+            'amount': '1', 'currency': 'CHF', 'category': 'Food', 'date': '2024-02-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rate_import(self):
+        expense = self.add_expense('85', currency='GBP', day=date(2024, 2, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            import_rates([('GBP', date(2024, 1, 15), Decimal('1.10'))], 'EUR')
+        self.assertEqual(Expense.objects.get(pk=expense['id']).base_amount, Decimal('85.00'))
+        self.assertRollupsMatch()
+
+        # New writes see the imported rate.
+        expense = self.add_expense('11', currency='GBP', day=date(2024, 2, 1))
+        self.assertEqual(expense['base_amount'], '11.00')
+
+    def test_base_currency_change(self):
+        self.add_expense('110', day=date(2024, 2, 1))
+        budget = Budget.objects.create(user=self.user, amount=Decimal('220'))
+        self.add_expense('11')
+
+        response = self.request('patch', '/api/auth/profile/', {'currency': 'EUR'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            sorted(Expense.objects.values_list('base_amount', flat=True)),
+            [Decimal('10.00'), Decimal('100.00')])
+        self.assertRollupsMatch()
+        budget.refresh_from_db()
+        self.assertEqual(budget.amount, Decimal('200.00'))
+
+        expense = self.add_expense('5')
+        self.assertEqual(expense['currency'], 'EUR')
+
+    def test_base_currency_without_rate(self):
+        self.add_expense('10', day=date(2024, 2, 1))
+        response = self.request('patch', '/api/auth/profile/', {'currency': 'CHF'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(User.objects.get(pk=self.user.id).currency, 'USD')
+
+
+class ChangesTest(ExpenseTestCase):
+    """/changes returns what changed since a token, deletions included."""
+
+    def changes(self, since=None):
+        params = f'?since={since}' if since is not None else ''
+        return self.client.get(f'/api/expenses/changes{params}')
+
+    def test_changes(self):
+        kept = self.add_expense('1')
+        deleted = self.add_expense('2')
+        token = self.changes().data['token']
+
+        added = self.add_expense('3')
+        self.request('delete', f"/api/expenses/{deleted['id']}/")
+        self.bulk(action='delete', ids=[kept['id']])
+        self.request('delete', f'/api/expenses/categories/{self.rent.id}/')
+
+        response = self.changes(token)
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertIn(added['id'], [row['id'] for row in data['expenses']['updated']])
+        self.assertEqual(sorted(data['expenses']['deleted']), sorted([deleted['id'], kept['id']]))
+        self.assertEqual(data['categories']['deleted'], [self.rent.id])
+
+    def test_reconverted_expenses(self):
+        import_rates([('USD', date(2024, 1, 1), Decimal('1.10'))], 'EUR')
+        expense = self.add_expense('11', day=date(2024, 2, 1))
+        # Written before the sync overlap of the token.
+        Expense.objects.update(updated_at=now() - timedelta(hours=1))
+        token = self.changes().data['token']
+        self.assertEqual(self.changes(token).data['expenses']['updated'], [])
+
+        self.request('patch', '/api/auth/profile/', {'currency': 'EUR'})
+        response = self.changes(token)
+        self.assertEqual(
+            [(row['id'], row['base_amount']) for row in response.data['expenses']['updated']],
+            [(expense['id'], '10.00')])
+
+    def test_invalid_token(self):
+        self.assertEqual(self.changes('abc').status_code, 400)
+        self.assertEqual(self.changes('1').status_code, 410)
+
+    def test_too_many_changes(self):
+        token = self.changes().data['token']
+        for name in ('Travel', 'Gifts', 'Health'):
+            self.request('post', '/api/expenses/categories/', {'name': name})
+        with mock.patch.object(ExpenseChanges, 'max_changes', 2):
+            self.assertEqual(self.changes(token).status_code, 410)
+
+
+class RejectionTest(ExpenseTestCase):
+    """Malformed cursors and bulk selections are rejected before they touch data."""
+
+    def cursor(self, **params):
+        return base64.b64encode(urlencode(params).encode()).decode()
+
+    def test_malformed_cursor(self):
+        for day in range(1, 8):
+            self.add_expense(str(day), day=date(2024, 3, day))
+        response = self.client.get('/api/expenses/?pagination=cursor')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['next'])
+
+        for cursor in ('garbage', self.cursor(p='not-a-date,1'), self.cursor(p='2024-03-01,x'),
+                       self.cursor(p='2024-03-01')):
+            response = self.client.get(f'/api/expenses/?pagination=cursor&cursor={cursor}')
+            self.assertEqual(response.status_code, 404, cursor)
+
+    def test_bulk_selection(self):
+        self.add_expense('1')
+        self.add_expense('2', 'Rent')
+        for data in ({'filter': {'categroy': 'Rent'}}, {'filter': {}},
+                     {'filter': {'category': ''}}, {}, {'ids': [1], 'all': True}):
+            response = self.bulk(action='delete', **data)
+            self.assertEqual(response.status_code, 400, data)
+        self.assertEqual(Expense.objects.count(), 2)
+
+        response = self.bulk(action='delete', all=True)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertFalse(Expense.objects.exists())
+        self.assertRollupsMatch()
+
+
+class ImportTest(ExpenseTestCase):
+    """Imports keep the valid rows and report the invalid ones."""
+
+    def upload(self, body, name='expenses.csv'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                '/api/expenses/import', {'file': SimpleUploadedFile(name, body.encode())},
+                format='multipart')
+
+    def test_row_errors(self):
+        response = self.upload(
+            'amount,category,description,date\n'
+            '10.50,Food,lunch,2024-03-01\n'
+            'abc,Food,,2024-03-01\n'
+            '5,Travel,,2024-03-02\n'
+            '7,Rent,,\n')
+        self.assertEqual(response.status_code, 200)
+        report = response.data['data']
+        self.assertEqual((report['imported'], report['failed']), (2, 2))
+        self.assertEqual([error['line'] for error in report['errors']], [3, 4])
+        self.assertEqual(report['errors'][1]['errors'], {'category': ["Category doesn't exist"]})
+        self.assertRollupsMatch()
+
+        response = self.upload('{"amount": "3", "category": "Rent"}\nnot json\n', 'rows.ndjson')
+        self.assertEqual((response.data['data']['imported'], response.data['data']['failed']), (1, 1))
+
+    def test_errors_are_capped(self):
+        rows = ''.join(f'x{line},Food\n' for line in range(500))
+        response = self.upload('amount,category\n1,Food\n' + rows)
+        report = response.data['data']
+        self.assertEqual((report['imported'], report['failed']), (1, 500))
+        self.assertEqual(len(report['errors']), ExpenseImporter.max_errors)
+
+    def test_unsupported_format(self):
+        self.assertEqual(self.upload('amount,category\n1,Food\n', 'expenses.xls').status_code, 400)
+
+
+class ExportTest(ExpenseTestCase):
+    """Exports stream the user's filtered expenses chunk by chunk."""
+
+    def setUp(self):
+        super().setUp()
+        self.add_expense('12.50', day=date(2024, 3, 1), description='lunch, late')
+        self.add_expense('800', 'Rent', day=date(2024, 3, 2))
+        self.add_expense('3', day=date(2024, 3, 3))
+
+    def export(self, **params):
+        response = self.client.get('/api/expenses/export?' + urlencode(params))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    @mock.patch.object(ExpenseExportView, 'chunk_size', 2)
+    def test_csv(self):
+        lines = self.export(ordering='date').splitlines()
+        self.assertEqual(lines[0], 'id,date,category,amount,currency,description')
+        self.assertEqual([line.split(',')[1:4] for line in lines[1:]], [
+            ['2024-03-01', 'Food', '12.50'], ['2024-03-02', 'Rent', '800.00'],
+            ['2024-03-03', 'Food', '3.00']])
+        self.assertTrue(lines[1].endswith(',USD,"lunch, late"'))
+
+    @mock.patch.object(ExpenseExportView, 'chunk_size', 2)
+    def test_ndjson(self):
+        rows = [json.loads(line) for line in self.export(
+            file_format='ndjson', category='food', ordering='-amount').splitlines()]
+        self.assertEqual([(row['date'], row['amount']) for row in rows], [
+            ('2024-03-01', '12.50'), ('2024-03-03', '3.00')])
+
+    @skipUnless(parquet_available(), 'pyarrow is not installed')
+    def test_parquet(self):
+        import pyarrow.parquet as pq
+        response = self.client.get('/api/expenses/export?file_format=parquet')
+        table = pq.read_table(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(sorted(table.column('amount').to_pylist()), [
+            Decimal('3.00'), Decimal('12.50'), Decimal('800.00')])
+
+    @mock.patch('expense.views.parquet_available', return_value=False)
+    def test_parquet_unavailable(self, available):
+        response = self.client.get('/api/expenses/export?file_format=parquet')
+        self.assertEqual(response.status_code, 400)
+
+    def test_unsupported_format(self):
+        response = self.client.get('/api/expenses/export?file_format=xlsx')
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchTest(ExpenseTestCase):
+    """Search matches descriptions, category names and amount prefixes of the user's expenses."""
+
+    def setUp(self):
+        super().setUp()
+        for amount, description, category in [
+                ('12.50', 'Pizza lunch', 'Food'), ('120', 'pizza party', 'Food'),
+                ('12.99', None, 'Rent'), ('99', 'groceries', 'Food')]:
+            self.add_expense(amount, category, description=description)
+
+    def search(self, terms):
+        response = self.client.get('/api/expenses/', {'search': terms, 'ordering': 'amount'})
+        self.assertEqual(response.status_code, 200)
+        return [row['amount'] for row in response.data['results']]
+
+    def test_search(self):
+        self.assertEqual(self.search('pizza'), ['12.50', '120.00'])
+        self.assertEqual(self.search('piz lunch'), ['12.50'])
+        self.assertEqual(self.search('12'), ['12.50', '12.99'])
+        self.assertEqual(self.search('12.5'), ['12.50'])
+        self.assertEqual(self.search('rent'), ['12.99'])
+        self.assertEqual(self.search('"'), [])
+
+    def test_other_users_are_not_searched(self):
+        other = User.objects.create_user(email='john@example.com', password='Secret-pass-1')
+        Expense.objects.create(
+            user=other, category=Category.objects.create(user=other, name='Food'),
+            amount=5, base_amount=5, description='pizza')
+        self.assertEqual(self.search('pizza'), ['12.50', '120.00'])
+
+
+class CategoryNameTest(ExpenseTestCase):
+    """Category names resolve from the user's own categories only."""
+
+    def test_other_users_categories(self):
+        other = User.objects.create_user(email='john@example.com', password='Secret-pass-1')
+        secret = Category.objects.create(user=other, name='Secret')
+        names = get_category_names(self.user.id, {self.food.id, secret.id})
+        self.assertEqual(names.get(self.food.id), 'Food')
+        self.assertNotIn(secret.id, names)
+
+    def test_deleted_category(self):
+        self.add_expense('10', 'Rent')
+        dashboard = Dashboard(self.user.id, ('summary', 'by_category'), {})
+        rows = list(dashboard.get_rollups())
+        # Merged away after the rollups were read.
+        data = dashboard.build(rows, {self.food.id: 'Food'})
+        self.assertEqual(data['by_category'], [])
+
+
+class RendererTest(SimpleTestCase):
+    """The orjson renderer writes what DRF's would, with Decimals as strings."""
+    data = {'amount': Decimal('12.50'), 'total': Decimal('1E+2'), 'date': date(2024, 1, 31),
+            'names': ['Food', 'Café'], 'count': 3, 'rate': 1.5, 'none': None}
+    expected = {'amount': '12.50', 'total': '100', 'date': '2024-01-31',
+                'names': ['Food', 'Café'], 'count': 3, 'rate': 1.5, 'none': None}
+
+    def test_render(self):
+        content = renderers.ORJSONRenderer().render(self.data)
+        self.assertEqual(json.loads(content), self.expected)
+
+    def test_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            content = renderers.ORJSONRenderer().render(self.data)
+        self.assertEqual(json.loads(content), self.expected)
@@ -1,14 +1,39 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     ExpenseData,
+    ExpenseDashboard,
+    ExpenseStats,
+    ExpenseForecast,
+    ExpenseBulkView,
+    ExpenseChanges,
+    ExpenseImportView,
+    ExpenseExportView,
     DailyExpenseSummary,
     MonthlyExpenseTrend,
     ExpenseByDateRange,
     CategoryWiseExpenseDistribution
 )
 
+if settings.ASYNC_API:
+    from .async_views import (
+        AsyncExpenseData as ExpenseData,
+        AsyncExpenseDashboard as ExpenseDashboard,
+        AsyncDailyExpenseSummary as DailyExpenseSummary,
+        AsyncMonthlyExpenseTrend as MonthlyExpenseTrend,
+        AsyncExpenseByDateRange as ExpenseByDateRange,
+        AsyncCategoryWiseExpenseDistribution as CategoryWiseExpenseDistribution
+    )
+
 urlpatterns = [
+    path('bulk', ExpenseBulkView.as_view()),
+    path('changes', ExpenseChanges.as_view()),
+    path('import', ExpenseImportView.as_view()),
+    path('export', ExpenseExportView.as_view()),
     path('data', ExpenseData.as_view()),
+    path('data/dashboard', ExpenseDashboard.as_view()),
+    path('data/stats', ExpenseStats.as_view()),
+    path('data/forecast', ExpenseForecast.as_view()),
     path('data/daily', DailyExpenseSummary.as_view()),
     path('data/monthly', MonthlyExpenseTrend.as_view()),
     path('data/by-date', ExpenseByDateRange.as_view()),
@@ -1,25 +1,49 @@
 from rest_framework.response import Response
-from rest_framework import status, viewsets
+from rest_framework import generics, status, viewsets
 from rest_framework.views import APIView
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.parsers import MultiPartParser
+from rest_framework.filters import OrderingFilter
 from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Sum, Count
-from django.db.models.functions import TruncMonth, TruncDay
-from django.utils.dateparse import parse_date
-from datetime import datetime, timedelta
-from decimal import Decimal
+from django.utils.timezone import localdate, now
+from django.db import transaction
+from django.db.models import Count, DateField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from datetime import timedelta
+import csv
+import os
 from .permissions import IsOwner
-from .serializers import CategorySerializer, ExpenseSerializer
-from .models import Category, Expense
-from .filters import ExpenseFilter
-from .pagination import CustomPagination
+from .serializers import (
+    BudgetSerializer, CategorySerializer, RecurringExpenseSerializer, CategoryMergeSerializer, ExpenseSerializer, ExpenseBulkSerializer, ExpenseRowSerializer
+)
+from .models import (
+    Budget, BudgetAlert, Category, Expense, DailyExpenseRollup, RecurringExpense, Tombstone
+)
+from .derived import ExpenseDeltas, apply_deltas, merge_rollups
+from .caches import cached_response, get_base_currency, get_categories, invalidate_categories
+from .filters import ExpenseFilter, ExpenseSearchFilter
+from .pagination import CustomPagination, KeysetPagination
+from .imports import ExpenseImporter, READERS
+from .exports import EXPORTERS, EXPORT_FIELDS, parquet_available
+from .stats import load_columns, spending_stats
+from .currencies import converted
+from .forecasts import INTERVALS, build_forecast, get_models
+from .budgets import get_spends
+from .sync import (
+    SYNC_OVERLAP, SyncTokenExpired, make_token, parse_token, record_deletions
+)
+from .analytics import (
+    Dashboard, date_range, get_category_names, month_window, summarize_categories, year_window
+)
 
 
 class CategoryViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated, IsOwner]
+    query_budget = {'list': 1, 'retrieve': 1}
     serializer_class = CategorySerializer
 
     def create(self, request):
@@ -27,6 +51,7 @@ class CategoryViewSet(viewsets.ViewSet):
             data=request.data, context={'request': request})
         if serializer.is_valid(raise_exception=True):
             serializer.save()
+            invalidate_categories(request.user.id, request)
             response = {
                 "success": True,
                 "message": "Category added successfully",
@@ -37,21 +62,29 @@ class CategoryViewSet(viewsets.ViewSet):
             return Response(data=response, status=status.HTTP_201_CREATED)
 
     def list(self, request):
-        queryset = Category.objects.filter(user=request.user)
-        serializer = self.serializer_class(queryset, many=True)
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        data = [
+            {'id': id, 'name': name, 'user': request.user.id}
+            for id, name in get_categories(request.user.id, request)
+        ]
+        return Response(data=data, status=status.HTTP_200_OK)
 
     def retrieve(self, request, pk=None):
-        queryset = get_object_or_404(Category, pk=pk, user=request.user)
+        queryset = get_object_or_404(Category, pk=pk, user_id=request.user.id)
         serializer = self.serializer_class(queryset)
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
     def update(self, request, pk=None):
-        queryset = get_object_or_404(Category, pk=pk, user=request.user)
+        queryset = get_object_or_404(Category, pk=pk, user_id=request.user.id)
+        name = queryset.name
         serializer = self.serializer_class(
             queryset, data=request.data, partial=True)
         if serializer.is_valid(raise_exception=True):
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                if queryset.name != name:
+                    # Expenses carry the category name, so synced copies are stale.
+                    Expense.objects.filter(category_id=queryset.id).update(updated_at=now())
+            invalidate_categories(request.user.id, request)
             response = {
                 "success": True,
                 "message": "Category updated successfully",
@@ -62,43 +95,192 @@ class CategoryViewSet(viewsets.ViewSet):
             return Response(data=response, status=status.HTTP_200_OK)
 
     def destroy(self, request, pk=None):
-        category = get_object_or_404(Category, pk=pk, user=request.user)
+        category = get_object_or_404(Category, pk=pk, user_id=request.user.id)
         if Expense.objects.filter(category=category).exists():
             response = {
                 "message": "Category cannot be deleted because it has associated expenses."
             }
             return Response(data=response, status=status.HTTP_403_FORBIDDEN)
-        category.delete()
+        with transaction.atomic():
+            record_deletions(Category.objects.filter(pk=category.pk))
+            category.delete()
+        invalidate_categories(request.user.id, request)
         response = {
             "success": True,
             "message": "Category deleted successfully."
         }
         return Response(data=response, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['post'])
+    def merge(self, request, pk=None):
+        """
+        Move every expense of the given categories to this one, then
+        delete them. One UPDATE moves the expenses however many there are;
+        the rollups are merged day by day. The budgets of the sources move
+        to this category too, unless two of them would share a period.
+        """
+        serializer = CategoryMergeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        target = get_object_or_404(Category, pk=pk, user_id=request.user.id)
+        source_ids = set(serializer.validated_data['categories'])
+        if target.id in source_ids:
+            raise ValidationError("A category cannot be merged into itself")
+
+        with transaction.atomic():
+            # Locked so no expense is added to a source while it is merged.
+            locked = set(Category.objects.select_for_update().filter(
+                user_id=request.user.id, id__in=[target.id, *source_ids]
+            ).order_by('id').values_list('id', flat=True))
+            if locked != source_ids | {target.id}:
+                raise ValidationError("Categories not found")
+            budgets = Budget.objects.filter(category_id__in=locked)
+            clashing = sorted(budgets.order_by().values('period').annotate(
+                count=Count('id')).filter(count__gt=1).values_list('period', flat=True))
+            if clashing:
+                raise ValidationError(
+                    f"More than one of the categories has a {' and a '.join(clashing)} "
+                    "budget; delete the extra ones before merging")
+            budgets.filter(category_id__in=source_ids).update(category_id=target.id)
+            moved = Expense.objects.filter(
+                user_id=request.user.id, category_id__in=source_ids
+            ).update(category_id=target.id, updated_at=now())
+            merge_rollups(request.user.id, source_ids, target.id)
+            RecurringExpense.objects.filter(category_id__in=source_ids).update(category_id=target.id)
+            sources = Category.objects.filter(id__in=source_ids)
+            record_deletions(sources)
+            sources.delete()
+        invalidate_categories(request.user.id, request)
 
-class ExpenseViewSet(viewsets.ModelViewSet):
-    serializer_class = ExpenseSerializer
+        response = {
+            "success": True,
+            "message": f"Merged {len(source_ids)} categories into {target.name}",
+            "data": {
+                "category": self.serializer_class(target).data,
+                "moved_expenses": moved
+            }
+        }
+        return Response(data=response, status=status.HTTP_200_OK)
+
+
+class BudgetViewSet(viewsets.ModelViewSet):
+    """
+    Weekly or monthly budgets, overall or per category, each with what was
+    spent in its current period. The amounts are running counters kept by
+    the expense writes; see expense/budgets.py.
+    """
+    serializer_class = BudgetSerializer
     permission_classes = [IsAuthenticated, IsOwner]
-    pagination_class = CustomPagination
+    pagination_class = None
+    # Budgets and counters, plus a rollup sum for counters not created yet
+    # in this period.
+    query_budget = {'list': 3, 'retrieve': 3, 'alerts': 1}
+    max_alerts = 50
+
+    def get_queryset(self):
+        return Budget.objects.filter(user_id=self.request.user.id).select_related('category')
+
+    def list(self, request, *args, **kwargs):
+        budgets = list(self.get_queryset())
+        context = {**self.get_serializer_context(), 'spends': get_spends(budgets)}
+        serializer = self.serializer_class(budgets, many=True, context=context)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def perform_create(self, serializer):
+        serializer.save(user_id=self.request.user.id)
+
+    @action(detail=False)
+    def alerts(self, request):
+        """The latest threshold alerts, newest first."""
+        alerts = BudgetAlert.objects.filter(budget__user_id=request.user.id).values(
+            'id', 'budget_id', 'period_start', 'threshold', 'spent', 'created_at',
+            'notified_at', category=F('budget__category__name'), period=F('budget__period'),
+        ).order_by('-created_at', '-id')[:self.max_alerts]
+        return Response(list(alerts), status=status.HTTP_200_OK)
+
+
+class RecurringExpenseViewSet(viewsets.ModelViewSet):
+    """
+    Expenses repeated on an RRULE schedule, e.g. `FREQ=MONTHLY;BYMONTHDAY=1`
+    for rent. The `materialize_recurring_expenses` command creates the
+    occurrences as they fall due; deleting a schedule keeps them.
+    """
+    serializer_class = RecurringExpenseSerializer
+    permission_classes = [IsAuthenticated, IsOwner]
+    query_budget = {'list': 2}
+
+    def get_queryset(self):
+        return RecurringExpense.objects.filter(
+            user_id=self.request.user.id).select_related('category').order_by('id')
+
+    def perform_create(self, serializer):
+        serializer.save(user_id=self.request.user.id)
+
+
+class ExpenseQueryMixin:
+    """Per-user expense queryset with the list filters, search and ordering."""
     filter_backends = [
-        DjangoFilterBackend, SearchFilter, OrderingFilter
+        DjangoFilterBackend, ExpenseSearchFilter, OrderingFilter
     ]
     filterset_class = ExpenseFilter
     search_fields = ['category__name', 'amount', 'description']
     ordering_fields = ['amount', 'date']
 
     def get_queryset(self):
-        return Expense.objects.filter(user=self.request.user)
+        return Expense.objects.filter(user_id=self.request.user.id)
+
+
+class ExpenseViewSet(ExpenseQueryMixin, viewsets.ModelViewSet):
+    serializer_class = ExpenseSerializer
+    row_serializer_class = ExpenseRowSerializer
+    permission_classes = [IsAuthenticated, IsOwner]
+    pagination_class = CustomPagination
+    keyset_pagination_class = KeysetPagination
+    # Page and count, plus the category list on a cache miss.
+    query_budget = {'list': 3}
+    read_replica = {'list': True, 'retrieve': True}
+
+    @property
+    def paginator(self):
+        # Keyset pagination is opt-in with ?pagination=cursor; its links
+        # carry a `cursor` parameter that keeps later pages in that mode.
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_row_queryset(self):
+        """The filtered list as `row_serializer_class` rows."""
+        return self.filter_queryset(self.get_queryset()).values_list(
+            *self.row_serializer_class.fields, named=True)
+
+    def get_row_serializer(self, rows, categories):
+        return self.row_serializer_class(
+            rows, many=True, context={'categories': categories})
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_row_queryset())
+        categories = get_category_names(
+            request.user.id, {row.category_id for row in page}, request)
+        serializer = self.get_row_serializer(page, categories)
+        return self.get_paginated_response(serializer.data)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user_id=self.request.user.id)
 
     def perform_update(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user_id=self.request.user.id)
 
     def destroy(self, request, *args, **kwargs):
         expense = self.get_object()
-        expense.delete()
+        deltas = ExpenseDeltas()
+        deltas.add_expense(expense, sign=-1)
+        with transaction.atomic():
+            record_deletions(Expense.objects.filter(pk=expense.pk))
+            expense.delete()
+            apply_deltas(deltas)
         response = {
             "success": True,
             "message": "Expense deleted successfully"
@@ -106,157 +288,392 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         return Response(data=response, status=status.HTTP_200_OK)
 
 
-class ExpenseData(APIView):
-    permission_classes = [IsAuthenticated, IsOwner]
+class ExpenseBulkView(ExpenseQueryMixin, generics.GenericAPIView):
+    """
+    Delete, recategorize or date-shift many of the user's expenses at once.
+
+    The expenses are picked by `ids`, by `filter` or with `all` and
+    changed by a single UPDATE or DELETE scoped to the user. Rollup deltas come from one
+    GROUP BY over the same selection, taken in the same transaction.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ExpenseBulkSerializer
+
+    def get_bulk_queryset(self, data):
+        queryset = self.get_queryset()
+        if data['all']:
+            return queryset
+        if 'ids' in data:
+            return queryset.filter(id__in=data['ids'])
+        filterset = self.filterset_class(data['filter'], queryset=queryset)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return filterset.qs
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        action = data['action']
+
+        expenses = self.get_bulk_queryset(data)
+        deltas = ExpenseDeltas()
+        with transaction.atomic():
+            if action == 'delete':
+                deltas.add_queryset(expenses, sign=-1)
+                record_deletions(expenses)
+                affected, _ = expenses.delete()
+                message = f"Deleted {affected} expenses"
+            elif action == 'recategorize':
+                deltas.move_queryset(expenses, category_id=data['category_id'])
+                affected = expenses.update(
+                    category_id=data['category_id'], updated_at=now())
+                message = f"Moved {affected} expenses to {data['category']}"
+            else:
+                # Converted again at the new dates, or kept without a rate.
+                base_amount = Coalesce(converted(
+                    get_base_currency(request.user.id, request), data['days']), F('base_amount'))
+                deltas.move_queryset(expenses, days=data['days'], base_amount=base_amount)
+                affected = expenses.update(
+                    updated_at=now(), base_amount=base_amount, date=ExpressionWrapper(
+                        F('date') + timedelta(days=data['days']), output_field=DateField()))
+                message = f"Shifted {affected} expenses by {data['days']} days"
+            apply_deltas(deltas)
+
+        response = {
+            "success": True,
+            "message": message,
+            "data": {"action": action, "affected": affected}
+        }
+        return Response(data=response, status=status.HTTP_200_OK)
+
+
+class ExpenseChanges(APIView):
+    """
+    Expenses and categories created, updated or deleted since a token.
+
+    Call it without `since` to get a token before fetching everything,
+    then pass the `token` of each response as `since` to get the changes
+    made after it. A 410 response means the token is too old or too much
+    has changed; fetch everything again.
+    """
+    permission_classes = [IsAuthenticated]
+    # Expenses, categories and tombstones, plus the category list on a cache miss.
+    query_budget = 4
+    max_changes = 1000
 
     def get(self, request):
-        user = request.user
-        today = datetime.now()
-        start_of_month = today.replace(
-            day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        # Filter expenses once
-        expenses = Expense.objects.filter(user=user)
-
-        # Calculate total expenses and amount
-        total_expenses = expenses.count()
-        total_amount = expenses.aggregate(total=Sum('amount'))[
-            'total'] or Decimal('0.0')
-
-        # Filter expenses for the current month
-        expenses_month = expenses.filter(date__gte=start_of_month)
-        total_expenses_month = expenses_month.count()
-        total_amount_month = expenses_month.aggregate(
-            total=Sum('amount'))['total'] or Decimal('0.0')
-
-        # Calculate total expenses and amount by category for this month
-        category_data = expenses_month.values('category__name').annotate(
-            total_expenses=Sum('id'), total_amount=Sum('amount')
-        ).order_by('category__name')
+        token = make_token(now())
+        since = request.query_params.get('since')
+        if since is None:
+            return Response(self.format(token, [], [], []), status=status.HTTP_200_OK)
+        try:
+            window = parse_token(since) - SYNC_OVERLAP
+        except ValueError as exc:
+            raise ValidationError(str(exc))
+
+        user_id = request.user.id
+        expenses = list(Expense.objects.filter(
+            user_id=user_id, updated_at__gte=window
+        ).order_by().values_list(*ExpenseRowSerializer.fields)[:self.max_changes + 1])
+        tombstones = list(Tombstone.objects.filter(
+            user_id=user_id, deleted_at__gte=window
+        ).values_list('model', 'object_id')[:self.max_changes + 1])
+        categories = list(Category.objects.filter(
+            user_id=user_id, updated_at__gte=window
+        ).values('id', 'name', 'user')[:self.max_changes + 1])
+        if any(len(rows) > self.max_changes for rows in (expenses, tombstones, categories)):
+            raise SyncTokenExpired(
+                "Too many changes since this token. Fetch everything again.")
+
+        names = get_category_names(user_id, {row[1] for row in expenses}, request)
+        expenses = ExpenseRowSerializer(
+            expenses, many=True, context={'categories': names}).data
+        return Response(self.format(token, expenses, categories, tombstones),
+                        status=status.HTTP_200_OK)
+
+    def format(self, token, expenses, categories, tombstones):
+        deleted = {'expense': [], 'category': []}
+        for model, object_id in tombstones:
+            deleted[model].append(object_id)
+        return {
+            'token': token,
+            'expenses': {'updated': expenses, 'deleted': deleted['expense']},
+            'categories': {'updated': categories, 'deleted': deleted['category']},
+        }
 
-        # Transform category data
-        category_data = [
-            {
-                'category_name': category['category__name'],
-                'total_expenses': category['total_expenses'],
-                'total_amount': category['total_amount'] or Decimal('0.0')
-            }
-            for category in category_data if category['total_amount'] is not None
-        ]
 
-        # Build the response data
-        response_data = {
-            'total_expenses': total_expenses,
-            'total_amount': total_amount,
-            # 'total_expenses_month': total_expenses_month,
-            # 'total_amount_month': total_amount_month,
-            # 'total_expenses_by_category': category_data,
+class ExpenseImportView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError("Please upload a file in the 'file' field")
+
+        file_format = request.data.get('file_format') or \
+            os.path.splitext(upload.name)[1].lstrip('.').lower()
+        reader = READERS.get(file_format)
+        if reader is None:
+            raise ValidationError(
+                "Unsupported file format. Use csv or ndjson")
+
+        importer = ExpenseImporter(request.user.id)
+        try:
+            report = importer.run(reader(upload.file))
+        except (UnicodeDecodeError, csv.Error):
+            raise ValidationError(
+                f"Could not read the file after {importer.imported} imported "
+                "rows. Make sure it is UTF-8 encoded CSV or NDJSON")
+
+        response = {
+            "success": True,
+            "message": f"Imported {report['imported']} expenses",
+            "data": report
         }
+        return Response(data=response, status=status.HTTP_200_OK)
 
-        return Response(response_data, status=status.HTTP_200_OK)
 
+class ExpenseExportView(ExpenseQueryMixin, generics.GenericAPIView):
+    """
+    Stream the user's filtered expenses as CSV, NDJSON or Parquet.
 
-class DailyExpenseSummary(APIView):
+    Rows are read as tuples through a server-side cursor and written out
+    chunk by chunk, so memory use does not grow with the export size.
+    Parquet output needs the optional `pyarrow` package.
+    """
+    permission_classes = [IsAuthenticated]
+    chunk_size = 2000
+
+    def get(self, request):
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in EXPORTERS:
+            raise ValidationError(
+                "Unsupported file format. Use csv, ndjson or parquet")
+        if file_format == 'parquet' and not parquet_available():
+            raise ValidationError(
+                "Parquet export is not available on this server")
+
+        exporter, content_type = EXPORTERS[file_format]
+        rows = self.filter_queryset(self.get_queryset()).values_list(
+            *EXPORT_FIELDS).iterator(chunk_size=self.chunk_size)
+        response = StreamingHttpResponse(
+            exporter(rows, self.chunk_size), content_type=content_type)
+        response['Content-Disposition'] = \
+            f'attachment; filename="expenses.{file_format}"'
+        return response
+
+
+class ExpenseData(APIView):
     permission_classes = [IsAuthenticated, IsOwner]
+    query_budget = 1
+    read_replica = True
+
+    def get_category_totals(self, request):
+        start_of_month = localdate().replace(day=1)
+        this_month = Q(date__gte=start_of_month)
+
+        # All-time and current-month totals per category in one query
+        return DailyExpenseRollup.objects.filter(user_id=request.user.id).values(
+            'category__name'
+        ).annotate(
+            expenses=Sum('total_expenses'),
+            amount=Sum('total_amount'),
+            expenses_month=Sum('total_expenses', filter=this_month),
+            amount_month=Sum('total_amount', filter=this_month),
+        ).order_by('category__name')
 
+    @cached_response
     def get(self, request):
-        user = request.user
-        date_param = request.query_params.get('date')
+        category_data = self.get_category_totals(request)
+        return Response(summarize_categories(category_data), status=status.HTTP_200_OK)
+
+
+class ExpenseStats(APIView):
+    """
+    Spending statistics over the user's expenses, all time or between
+    `start_date` and `end_date`: per-category percentiles, trailing 7 and
+    30 day averages of daily totals, month-over-month changes and the
+    expenses more than `z` (default 3) standard deviations from their
+    category's mean. See expense/stats.py.
+    """
+    permission_classes = [IsAuthenticated, IsOwner]
+    # The expense columns, plus the category list on a cache miss.
+    query_budget = 2
+    read_replica = True
 
-        if date_param:
+    @cached_response
+    def get(self, request):
+        params = request.query_params
+        expenses = Expense.objects.filter(user_id=request.user.id)
+        if 'start_date' in params or 'end_date' in params:
             try:
-                date_value = parse_date(date_param)
-                if date_value:
-                    start_of_month = date_value.replace(day=1)
-                    end_of_month = (
-                        start_of_month + timedelta(days=32)
-                    ).replace(day=1) - timedelta(seconds=1)
-                else:
-                    start_of_month = datetime.strptime(
-                        date_param, '%Y-%m').replace(day=1)
-                    end_of_month = (
-                        start_of_month + timedelta(days=32)
-                    ).replace(day=1) - timedelta(seconds=1)
-
-            except ValueError:
-                raise ValidationError(
-                    "Invalid date format. Use YYYY-MM or YYYY-MM-DD")
-        else:
-            today = datetime.now()
-            start_of_month = today.replace(
-                day=1, hour=0, minute=0, second=0, microsecond=0)
-            end_of_month = (
-                start_of_month + timedelta(days=32)
-            ).replace(day=1) - timedelta(seconds=1)
+                start_date, end_date = date_range(
+                    params.get('start_date'), params.get('end_date'))
+            except ValueError as exc:
+                raise ValidationError(str(exc))
+            expenses = expenses.filter(date__gte=start_date, date__lte=end_date)
+        try:
+            z_threshold = float(params.get('z', 3))
+        except ValueError:
+            z_threshold = None
+        if z_threshold is None or not 1 <= z_threshold <= 10:
+            raise ValidationError("z must be a number between 1 and 10")
+
+        columns = load_columns(expenses)
+        names = get_category_names(
+            request.user.id, set(columns.categories.tolist()), request)
+        return Response(spending_stats(columns, names, z_threshold),
+                        status=status.HTTP_200_OK)
+
+
+class ExpenseForecast(APIView):
+    """
+    Projected spending per category and in total for the next `months`
+    (default 6, at most 24) months starting with the current one, with
+    `interval` (80, 90 or 95, default 80) percent prediction intervals.
+    See expense/forecasts.py.
+    """
+    permission_classes = [IsAuthenticated, IsOwner]
+    # Monthly totals when the cached models are stale, plus the category
+    # list on a cache miss.
+    query_budget = 2
+    read_replica = True
+    max_months = 24
 
-        expenses = Expense.objects.filter(
-            user=user, date__gte=start_of_month, date__lte=end_of_month)
-        daily_data = expenses.annotate(day=TruncDay('date')).values('day').annotate(
-            total_expenses=Count('id'), total_amount=Sum('amount')).order_by('day')
+    def get_int_param(self, name, default):
+        try:
+            return int(self.request.query_params.get(name, default))
+        except ValueError:
+            return None
 
-        return Response(daily_data, status=status.HTTP_200_OK)
+    @cached_response
+    def get(self, request):
+        horizon = self.get_int_param('months', 6)
+        if horizon is None or not 1 <= horizon <= self.max_months:
+            raise ValidationError(f"months must be a number between 1 and {self.max_months}")
+        interval = self.get_int_param('interval', 80)
+        if interval not in INTERVALS:
+            raise ValidationError("interval must be 80, 90 or 95")
+        start, models = get_models(request.user.id)
+        names = get_category_names(request.user.id, models.keys(), request)
+        return Response(build_forecast(start, models, names, horizon, interval),
+                        status=status.HTTP_200_OK)
 
 
-class MonthlyExpenseTrend(APIView):
+class DailyExpenseSummary(APIView):
     permission_classes = [IsAuthenticated, IsOwner]
+    query_budget = 1
+    read_replica = True
 
-    def get(self, request):
-        user = request.user
-        year_param = request.query_params.get('year')
+    def get_rollups(self, request):
+        try:
+            start_of_month, end_of_month = month_window(request.query_params.get('date'))
+        except ValueError as exc:
+            raise ValidationError(str(exc))
 
-        if year_param:
-            try:
-                year_value = int(year_param)
-                start_of_year = datetime(year_value, 1, 1)
-                end_of_year = datetime(year_value, 12, 31, 23, 59, 59)
-            except ValueError:
-                return Response({'error': 'Invalid year format. Use YYYY'}, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            today = datetime.now()
-            start_of_year = today.replace(
-                month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-            end_of_year = today.replace(
-                month=12, day=31, hour=23, minute=59, second=59, microsecond=999999)
-
-        expenses = Expense.objects.filter(
-            user=user, date__gte=start_of_year, date__lte=end_of_year)
-        monthly_data = expenses.annotate(month=TruncMonth('date')).values('month').annotate(
-            total_expenses=Count('id'), total_amount=Sum('amount')).order_by('month')
+        rollups = DailyExpenseRollup.objects.filter(
+            user_id=request.user.id, date__gte=start_of_month, date__lte=end_of_month)
+        return rollups.values(day=F('date')).annotate(
+            total_expenses=Sum('total_expenses'), total_amount=Sum('total_amount')).order_by('day')
 
-        return Response(monthly_data, status=status.HTTP_200_OK)
+    @cached_response
+    def get(self, request):
+        return Response(self.get_rollups(request), status=status.HTTP_200_OK)
 
 
-class ExpenseByDateRange(APIView):
+class MonthlyExpenseTrend(APIView):
     permission_classes = [IsAuthenticated, IsOwner]
+    query_budget = 1
+    read_replica = True
 
+    def get_rollups(self, request):
+        """Return the monthly totals queryset, or an error `Response`."""
+        try:
+            start_of_year, end_of_year = year_window(request.query_params.get('year'))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rollups = DailyExpenseRollup.objects.filter(
+            user_id=request.user.id, date__gte=start_of_year, date__lte=end_of_year)
+        return rollups.annotate(month=TruncMonth('date')).values('month').annotate(
+            total_expenses=Sum('total_expenses'), total_amount=Sum('total_amount')).order_by('month')
+
+    @cached_response
     def get(self, request):
-        user = request.user
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        if not start_date or not end_date:
-            return Response({'error': 'Please provide start_date and end_date'}, status=status.HTTP_400_BAD_REQUEST)
+        monthly_data = self.get_rollups(request)
+        if isinstance(monthly_data, Response):
+            return monthly_data
+        return Response(monthly_data, status=status.HTTP_200_OK)
 
-        try:
-            start_date = datetime.strptime(start_date, '%Y-%m-%d')
-            end_date = datetime.strptime(end_date, '%Y-%m-%d')
-        except ValueError:
-            return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
 
-        expenses = Expense.objects.filter(
-            user=user, date__gte=start_date, date__lte=end_date)
-        expense_data = expenses.values('date').annotate(
-            total_expenses=Count('id'), total_amount=Sum('amount')).order_by('date')
+class ExpenseByDateRange(APIView):
+    permission_classes = [IsAuthenticated, IsOwner]
+    query_budget = 1
+    read_replica = True
 
+    def get_rollups(self, request):
+        """Return the daily totals queryset, or an error `Response`."""
+        try:
+            start_date, end_date = date_range(
+                request.query_params.get('start_date'),
+                request.query_params.get('end_date'))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rollups = DailyExpenseRollup.objects.filter(
+            user_id=request.user.id, date__gte=start_date, date__lte=end_date)
+        return rollups.values('date').annotate(
+            total_expenses=Sum('total_expenses'), total_amount=Sum('total_amount')).order_by('date')
+
+    @cached_response
+    def get(self, request):
+        expense_data = self.get_rollups(request)
+        if isinstance(expense_data, Response):
+            return expense_data
         return Response(expense_data, status=status.HTTP_200_OK)
 
 
 class CategoryWiseExpenseDistribution(APIView):
     permission_classes = [IsAuthenticated, IsOwner]
+    query_budget = 1
+    read_replica = True
+
+    def get_rollups(self, request):
+        rollups = DailyExpenseRollup.objects.filter(user_id=request.user.id)
+        return rollups.values('category__name').annotate(
+            total_expenses=Sum('total_expenses'), total_amount=Sum('total_amount')).order_by('category__name')
 
+    @cached_response
     def get(self, request):
-        user = request.user
-        expenses = Expense.objects.filter(user=user)
-        category_data = expenses.values('category__name').annotate(
-            total_expenses=Count('id'), total_amount=Sum('amount')).order_by('category__name')
+        return Response(self.get_rollups(request), status=status.HTTP_200_OK)
+
 
-        return Response(category_data, status=status.HTTP_200_OK)
+class ExpenseDashboard(APIView):
+    """
+    Several analytics panels in one request, e.g.
+    `?panels=summary,daily,monthly&date=2024-05&year=2024`.
+
+    Takes the parameters of the standalone endpoints and computes every
+    panel from a single scan of the rollups.
+    """
+    permission_classes = [IsAuthenticated, IsOwner]
+    query_budget = 2
+    read_replica = True
+
+    def get_dashboard(self, request):
+        panels = [panel.strip() for value in request.query_params.getlist('panels')
+                  for panel in value.split(',') if panel.strip()]
+        try:
+            return Dashboard(request.user.id, panels, request.query_params)
+        except ValueError as exc:
+            raise ValidationError(str(exc))
+
+    @cached_response
+    def get(self, request):
+        dashboard = self.get_dashboard(request)
+        rows = list(dashboard.get_rollups())
+        categories = get_category_names(
+            request.user.id, {row[0] for row in rows}, request)
+        return Response(dashboard.build(rows, categories), status=status.HTTP_200_OK)
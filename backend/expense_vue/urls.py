@@ -1,15 +1,23 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from expense.views import ExpenseViewSet, CategoryViewSet
+from expense.views import BudgetViewSet, ExpenseViewSet, CategoryViewSet, RecurringExpenseViewSet
 from rest_framework.routers import DefaultRouter
+from utils.metrics import metrics_view
+
+if settings.ASYNC_API:
+    from expense.async_views import AsyncExpenseViewSet as ExpenseViewSet
 
 router = DefaultRouter()
 router.register('categories', CategoryViewSet, basename='categories')
+router.register('budgets', BudgetViewSet, basename='budgets')
+router.register('recurring', RecurringExpenseViewSet, basename='recurring')
 router.register('', ExpenseViewSet, basename='expenses')
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view),
     path('api/auth/', include('account.urls')),
     path('api/expenses/', include('expense.urls')),
     path('api/expenses/', include(router.urls))
@@ -0,0 +1,152 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+    """
+    Timings collected for a single request.
+
+    Installed as an `execute_wrapper` on every database connection, it
+    counts each SQL statement and the time spent in the database.
+    """
+
+    def __init__(self, view=None, budget=None):
+        self.view = view
+        self.budget = budget
+        # Queries allowed on top of the budget, e.g. by authentication.
+        self.allowance = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.total_time = 0.0
+        self.started = time.perf_counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.queries > self.budget + self.allowance
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+    def server_timing(self):
+        app_time = max(self.total_time - self.db_time - self.render_time, 0)
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'app;dur={app_time * 1000:.2f}',
+            f'total;dur={self.total_time * 1000:.2f}',
+        ])
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters aggregated per view, method and status.
+
+    Each worker process keeps its own registry; scrape every worker or
+    sum them upstream.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = defaultdict(int)
+            self.durations = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+            self.duration_sums = defaultdict(float)
+            self.queries = defaultdict(int)
+            self.db_time = defaultdict(float)
+            self.render_time = defaultdict(float)
+            self.over_budget = defaultdict(int)
+
+    def record(self, metrics: RequestMetrics, method, status):
+        view = metrics.view or 'unmatched'
+        with self.lock:
+            self.requests[(view, method, str(status))] += 1
+            self.durations[view][bisect.bisect_left(self.buckets, metrics.total_time)] += 1
+            self.duration_sums[view] += metrics.total_time
+            self.queries[view] += metrics.queries
+            self.db_time[view] += metrics.db_time
+            self.render_time[view] += metrics.render_time
+            if metrics.over_budget:
+                self.over_budget[view] += 1
+
+    def render(self):
+        """Serialize the registry in the Prometheus text exposition format."""
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def sample(name, labels, value):
+            label_text = ','.join(f'{key}="{escape_label(val)}"' for key, val in labels)
+            lines.append(f'{name}{{{label_text}}} {value}')
+
+        with self.lock:
+            header('http_requests_total', 'counter',
+                   'Requests handled, by view, method and status.')
+            for (view, method, status), count in sorted(self.requests.items()):
+                sample('http_requests_total',
+                       (('view', view), ('method', method), ('status', status)), count)
+
+            name = 'http_request_duration_seconds'
+            header(name, 'histogram', 'Total request time.')
+            for view, counts in sorted(self.durations.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, '+Inf'), counts):
+                    cumulative += count
+                    sample(f'{name}_bucket', (('view', view), ('le', bound)), cumulative)
+                sample(f'{name}_sum', (('view', view),), f'{self.duration_sums[view]:.6f}')
+                sample(f'{name}_count', (('view', view),), cumulative)
+
+            for name, help_text, values in (
+                ('db_queries_total', 'SQL statements executed.', self.queries),
+                ('db_query_duration_seconds_total', 'Time spent executing SQL.', self.db_time),
+                ('response_render_duration_seconds_total',
+                 'Time spent rendering response bodies.', self.render_time),
+                ('query_budget_exceeded_total',
+                 'Requests that ran more queries than their view allows.', self.over_budget),
+            ):
+                header(name, 'counter', help_text)
+                for view, value in sorted(values.items()):
+                    if isinstance(value, float):
+                        value = f'{value:.6f}'
+                    sample(name, (('view', view),), value)
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def metrics_view(request):
+    """Expose the registry to Prometheus from `METRICS_ALLOWED_IPS` only."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,159 @@
+import logging
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from .metrics import QueryBudgetExceeded, RequestMetrics, registry
+from .routers import ReplicaRouting, start_routing, stop_routing
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_view_option(view_func, method, name):
+    """
+    Return the option `name` declared on the view class, if any.
+
+    A dict option is keyed by viewset action or HTTP method, e.g.
+    {'list': 3} or {'get': 2}.
+    """
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    option = getattr(view_class, name, None)
+    if isinstance(option, dict):
+        method = method.lower()
+        action = getattr(view_func, 'actions', {}).get(method, method)
+        option = option.get(action)
+    return option
+
+
+def get_query_budget(view_func, method):
+    """Return the `query_budget` declared on the view class, if any."""
+    return get_view_option(view_func, method, 'query_budget')
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, DB time, render time and total time per request.
+
+    The numbers are sent back in a `Server-Timing` header, attached to the
+    response as `response.metrics` and aggregated in the registry served by
+    `utils.metrics.metrics_view`. Requests that exceed their view's
+    `query_budget` are logged, and raise `QueryBudgetExceeded` when
+    `QUERY_BUDGETS_ENFORCED` is on. Should be the first middleware so the
+    total covers the whole stack. Streaming bodies are not timed.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = request.metrics = RequestMetrics()
+        with self.instrument(metrics):
+            response = self.get_response(request)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        metrics = request.metrics = RequestMetrics()
+        # Connections are thread-local; async views query from the
+        # request's thread-sensitive worker thread, so hook that one.
+        stack = await sync_to_async(self.instrument)(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response)
+
+    def instrument(self, metrics):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        return stack
+
+    def finish(self, request, response):
+        metrics = request.metrics
+        metrics.finish()
+
+        response.metrics = metrics
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing()
+        registry.record(metrics, request.method, response.status_code)
+
+        if metrics.over_budget:
+            message = (f"{request.method} {request.path} ({metrics.view}) ran "
+                       f"{metrics.queries} queries, budget is {metrics.budget}")
+            if settings.QUERY_BUDGETS_ENFORCED:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics.view = request.resolver_match.view_name
+        request.metrics.budget = get_query_budget(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns.
+        metrics = request.metrics
+        started = time.perf_counter()
+
+        def rendered(response):
+            metrics.render_time += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Send the reads of views declaring `read_replica` to a read replica.
+
+    Like `query_budget`, the option may be keyed by action or method, e.g.
+    {'list': True}; only GET and HEAD requests use it. Users whose
+    requests wrote are kept on the primary for `REPLICA_STICKY_SECONDS`.
+    See `utils.routers`. Unused when no replicas are configured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing = request.replica_routing = ReplicaRouting(request)
+        token = start_routing(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_routing(token)
+        routing.finish()
+        return response
+
+    async def __acall__(self, request):
+        routing = request.replica_routing = ReplicaRouting(request)
+        token = start_routing(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_routing(token)
+        await sync_to_async(routing.finish)()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in ('GET', 'HEAD'):
+            request.replica_routing.read_replica = bool(
+                get_view_option(view_func, request.method, 'read_replica'))
@@ -0,0 +1,65 @@
+import json
+from decimal import Decimal
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONEncoder(encoders.JSONEncoder):
+    """
+    DRF's encoder with Decimals as strings, as `COERCE_DECIMAL_TO_STRING`
+    renders serializer fields, so money keeps its exact digits.
+    """
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return format(obj, 'f')
+        return super().default(obj)
+
+
+# Covers what orjson doesn't (Decimal, lazy strings, querysets) and formats
+# datetimes and times the way DRF always has.
+_encoder = JSONEncoder()
+
+if orjson is not None:
+    _options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def dumps(data, indent=None) -> bytes:
+    """
+    Serialize `data` to UTF-8 JSON, with orjson when it is installed.
+
+    Dates, strings, numbers and containers are encoded natively; anything
+    else falls back to `JSONEncoder`, so the output matches DRF's renderer
+    apart from insignificant whitespace and Decimals, which are strings.
+    """
+    if orjson is None:
+        return json.dumps(
+            data, cls=JSONEncoder, indent=indent, ensure_ascii=False,
+            separators=(',', ':') if indent is None else None).encode()
+    options = _options | orjson.OPT_INDENT_2 if indent else _options
+    return orjson.dumps(data, default=_encoder.default, option=options)
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    `JSONRenderer` built on orjson, falling back to the standard library
+    when orjson is not installed.
+
+    orjson only indents by two spaces, so any requested indent uses that.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        ret = dumps(data, indent)
+        # Keep the output safe to embed in a <script>, as DRF does.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,96 @@
+"""
+Read replica routing.
+
+Writes, and reads outside a request, always use the primary (`default`).
+Views opt their reads into the replicas listed in `DATABASE_REPLICAS` by
+declaring `read_replica`, which `ReplicaRoutingMiddleware` looks up for
+every request. Each request reads from one replica picked at random.
+
+A user who wrote recently reads from the primary for
+`REPLICA_STICKY_SECONDS`, so they see their own changes while the
+replicas catch up; the window must be longer than the replicas' lag.
+The marker lives in the cache, which settings require to be shared by
+every worker when replicas are configured.
+"""
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject
+
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+def sticky_key(user_id) -> str:
+    return f'db:sticky:{user_id}'
+
+
+def request_user_id(request):
+    """The id of the user DRF authenticated for `request`, if it did yet."""
+    user = getattr(request, 'user', None)
+    # The session user set by AuthenticationMiddleware may itself query.
+    if user is None or isinstance(user, SimpleLazyObject):
+        return None
+    return user.id
+
+
+class ReplicaRouting:
+    """Where one request's reads go, and whether it wrote."""
+
+    def __init__(self, request):
+        self.request = request
+        self.read_replica = False
+        self.wrote = False
+        self.alias = None
+
+    def db_for_read(self):
+        if not self.read_replica or self.wrote:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        if self.alias is None:
+            # Decided on the first query, once the view has authenticated.
+            user_id = request_user_id(self.request)
+            if user_id is None:
+                return None
+            if cache.get(sticky_key(user_id)):
+                self.alias = DEFAULT_DB_ALIAS
+            else:
+                self.alias = random.choice(settings.DATABASE_REPLICAS)
+        return self.alias
+
+    def finish(self):
+        """Keep the user on the primary for a while after a write."""
+        if self.wrote:
+            user_id = request_user_id(self.request)
+            if user_id is not None:
+                cache.set(sticky_key(user_id), 1, settings.REPLICA_STICKY_SECONDS)
+
+
+def start_routing(routing: ReplicaRouting):
+    """Route the current context's queries with `routing`; returns a reset token."""
+    return _routing.set(routing)
+
+
+def stop_routing(token):
+    _routing.reset(token)
+
+
+class ReplicaRouter:
+    """Database router sending opted-in request reads to a replica."""
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        return routing.db_for_read() if routing is not None else None
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
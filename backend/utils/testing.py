@@ -0,0 +1,24 @@
+from django.test import override_settings
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin that enforces view query budgets.
+
+    Any request made through the test client that runs more queries than
+    its view's `query_budget` raises `QueryBudgetExceeded` and fails the
+    test. `assertQueryBudget` checks a response against an explicit budget.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        override = override_settings(QUERY_BUDGETS_ENFORCED=True)
+        override.enable()
+        cls.addClassCleanup(override.disable)
+
+    def assertQueryBudget(self, response, budget):
+        metrics = response.metrics
+        self.assertLessEqual(
+            metrics.queries, budget,
+            f"{metrics.view} ran {metrics.queries} queries, budget is {budget}")
@@ -32,3 +32,15 @@ def validate_alpha(value: str):
     if not re.match("^[A-Za-z]+$", value):
         raise ValidationError(
             "This field must contain only alphabets (A-Z, a-z).")
+
+
+def validate_currency(value: str):
+    """
+    Validate that the given value looks like an ISO 4217 currency code.
+
+    :param value: The value to be validated
+    :raises ValidationError: If the value is not three uppercase letters
+    """
+    if not re.match("^[A-Z]{3}$", value):
+        raise ValidationError(
+            "Currency must be a three letter ISO 4217 code such as USD.")
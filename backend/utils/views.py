@@ -0,0 +1,45 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+
+class AsyncViewMixin:
+    """
+    Run a DRF view or viewset as a native async view.
+
+    Handlers declared with `async def` are awaited on the event loop; any
+    remaining sync handlers (e.g. `create` on a viewset) run in a worker
+    thread. Authentication, permissions and throttling run in a worker
+    thread too, since authentication reads the user's revocation state
+    from the database when it isn't cached.
+    """
+
+    view_is_async = True
+
+    @classmethod
+    def as_view(cls, *args, **kwargs):
+        view = super().as_view(*args, **kwargs)
+        # DRF's csrf_exempt wrapper hides that the view returns a coroutine.
+        return markcoroutinefunction(view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            method = request.method.lower()
+            if method in self.http_method_names:
+                handler = getattr(self, method, self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -18,7 +18,7 @@ const ExpenseDataChart = ({ data, chartType, dataType, dateValue }) => {
     const ctx = chartRef.current.getContext("2d");
 
     const labels = data.map(getDateLabel);
-    const totalAmounts = data.map((item) => item.total_amount);
+    const totalAmounts = data.map((item) => Number(item.total_amount));
 
     const titleText =
       dataType === "monthly"
@@ -4,13 +4,28 @@ import axios from "../../utils/axios";
 import handleErrors from "../../utils/errors";
 import ExpenseDataGrid from "../ExpenseDataGrid";
 
-const MonthlyExpenseSection = () => {
+const MonthlyExpenseSection = ({ initialData }) => {
   const [year, setYear] = useState(dayjs().format("YYYY"));
   const [expenseData, setExpenseData] = useState([]);
   const [totalExpenses, setTotalExpenses] = useState(0);
   const [totalAmount, setTotalAmount] = useState(0);
   const [dataAnimation, setDataAnimation] = useState("");
 
+  const showExpenseData = useCallback((data) => {
+    setExpenseData(data);
+    const result = data.reduce(
+      (acc, curr) => {
+        return {
+          totalExpenses: acc.totalExpenses + curr.total_expenses,
+          totalAmount: acc.totalAmount + Number(curr.total_amount),
+        };
+      },
+      { totalExpenses: 0, totalAmount: 0 }
+    );
+    setTotalExpenses(result.totalExpenses);
+    setTotalAmount(result.totalAmount);
+  }, []);
+
   const fetchMonthlyExpenseData = useCallback(async (year_param) => {
     setDataAnimation("animate-pulse");
     try {
@@ -22,24 +37,13 @@ const MonthlyExpenseSection = () => {
       } else {
         response = await axios.get("/api/expenses/data/monthly");
       }
-      setExpenseData(response.data);
-      const result = response.data.reduce(
-        (acc, curr) => {
-          return {
-            totalExpenses: acc.totalExpenses + curr.total_expenses,
-            totalAmount: acc.totalAmount + curr.total_amount,
-          };
-        },
-        { totalExpenses: 0, totalAmount: 0 }
-      );
-      setTotalExpenses(result.totalExpenses);
-      setTotalAmount(result.totalAmount);
+      showExpenseData(response.data);
     } catch (error) {
       handleErrors(error);
     } finally {
       setDataAnimation("");
     }
-  }, []);
+  }, [showExpenseData]);
 
   const handleDatePicker = (date, dateString) => {
     if (dateString) {
@@ -51,9 +55,12 @@ const MonthlyExpenseSection = () => {
     }
   };
 
+  // The first page load comes from the dashboard request.
   useEffect(() => {
-    fetchMonthlyExpenseData();
-  }, [fetchMonthlyExpenseData]);
+    if (initialData) {
+      showExpenseData(initialData);
+    }
+  }, [initialData, showExpenseData]);
 
   return (
     <ExpenseDataGrid
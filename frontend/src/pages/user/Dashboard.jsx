@@ -1,14 +1,35 @@
-import React, { useState } from "react";
+import React, { useEffect, useState } from "react";
 import { useSelector } from "react-redux";
+import axios from "../../utils/axios";
+import handleErrors from "../../utils/errors";
 import DailyExpenseSection from "../../components/sections/DailyExpenseSection";
 import MonthlyExpenseSection from "../../components/sections/MonthlyExpenseSection";
 
 const Dashboard = () => {
   const { user } = useSelector((state) => state.auth);
   const [activeTab, setActiveTab] = useState(0);
+  const [panels, setPanels] = useState({});
+
+  // One request for every section instead of one per section.
+  useEffect(() => {
+    const fetchDashboard = async () => {
+      try {
+        const response = await axios.get(
+          "/api/expenses/data/dashboard?panels=daily,monthly"
+        );
+        setPanels(response.data);
+      } catch (error) {
+        handleErrors(error);
+      }
+    };
+    fetchDashboard();
+  }, []);
 
   const tabs = ["Daily Expense", "Monthly Expense"];
-  const sections = [<DailyExpenseSection />, <MonthlyExpenseSection />];
+  const sections = [
+    <DailyExpenseSection initialData={panels.daily} />,
+    <MonthlyExpenseSection initialData={panels.monthly} />,
+  ];
 
   return (
     <div>